@@ -0,0 +1,74 @@
+"""
+Benchmark the rendering of job scripts for a large parameter sweep.
+
+Renders a script for every combination of node count and threads per
+task on a resource and prints the throughput in scripts per second,
+both for the whole job setup and for the rendering alone.
+
+Usage: python benchRender.py [number of scripts] [resource] [batch]
+"""
+import os
+import sys
+import time
+from boltresource import BoltResource as Resource
+from boltbatch import BoltBatch as Batch
+from boltjob import BoltJob as Job
+
+def makeJob(resource, batch, nodes, threads, index):
+    """Set up a parallel job in the same way as the bolt command"""
+    job = Job()
+    tpn = resource.numCoresPerNode() // threads
+    job.setTasks(nodes * tpn)
+    job.setTasksPerNode(tpn)
+    job.setThreads(threads)
+    job.setIsParallel(True)
+    job.setName("sweep{0}".format(index))
+    job.setAccountID("z01")
+    job.setWallTime("1:0:0")
+    if threads > 1:
+        job.setJobCommand(resource.hybridExecJobOptions + " ./a.out input{0}".format(index))
+        job.setParallelJobLauncher(resource.hybridJobLauncher)
+        job.setParallelScriptPreamble(resource.hybridScriptPreamble)
+        job.setParallelScriptPostamble(resource.hybridScriptPostamble)
+        job.setJobOptions(resource.hybridJobOptions)
+    else:
+        job.setJobCommand(resource.distribExecJobOptions + " ./a.out input{0}".format(index))
+        job.setParallelJobLauncher(resource.distribJobLauncher)
+        job.setParallelScriptPreamble(resource.distribScriptPreamble)
+        job.setParallelScriptPostamble(resource.distribScriptPostamble)
+        job.setJobOptions(resource.distribJobOptions)
+    job.setParallelDistribution(resource, batch)
+    return job
+
+def main(argv):
+    count = 20000
+    resourceName = "ARCHER2"
+    batchName = "Slurm"
+    if len(argv) > 0: count = int(argv[0])
+    if len(argv) > 1: resourceName = argv[1]
+    if len(argv) > 2: batchName = argv[2]
+
+    rootDir = os.environ['BOLT_DIR']
+    resource = Resource()
+    resource.readConfig(os.path.join(rootDir, "configuration", "resources", resourceName + ".resource"))
+    batch = Batch()
+    batch.readConfig(os.path.join(rootDir, "configuration", "batch", batchName + ".batch"))
+
+    threadsList = [t for t in (1, 2, 4, 8) if resource.numCoresPerNode() % t == 0]
+    start = time.time()
+    jobs = [makeJob(resource, batch, 1 + (i // len(threadsList)) % 256, threadsList[i % len(threadsList)], i) \
+            for i in range(count)]
+    setup = time.time() - start
+
+    start = time.time()
+    size = 0
+    for job in jobs:
+        size += len(job.renderScript(batch, resource, None))
+    render = time.time() - start
+
+    sys.stdout.write("Scripts rendered:     {0} ({1} on {2}, {3:.1f} MB)\n".format(count, resourceName, batchName, size / 1.0e6))
+    sys.stdout.write("Render only:          {0:10.0f} scripts/s\n".format(count / render))
+    sys.stdout.write("Job setup and render: {0:10.0f} scripts/s\n".format(count / (setup + render)))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
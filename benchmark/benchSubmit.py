@@ -0,0 +1,79 @@
+"""
+Benchmark job submission through the submit command and the REST API.
+
+Submits the same job script many times with a stand-in submit command
+(a shell script that reads the job script and prints a job ID) and to
+a local stand-in REST server, sequentially on one keep-alive
+connection and concurrently on a pool of connections. Prints the
+throughput of each in submissions per second. Runs offline.
+
+Usage: python benchSubmit.py [number of submissions] [connections]
+"""
+import os
+import stat
+import sys
+import tempfile
+import time
+sys.path.append(os.path.join(os.environ['BOLT_DIR'], "unittest"))
+import restServer
+import boltsubmit
+from boltrest import BoltRestClient as RestClient
+
+SCRIPT = "#!/bin/bash\n#SBATCH --nodes=1\n#SBATCH --time=0:10:0\nsrun ./a.out\n"
+
+class CommandBatch(object):
+    """Batch system submitted to with a stand-in submit command"""
+    def __init__(self, command):
+        self.submitCommand = command
+
+class RestBatch(object):
+    """Batch system submitted to with the stand-in REST server"""
+    restSocket = None
+    restTokenVariable = "BOLT_BENCH_TOKEN"
+    restTokenHeader = "X-SLURM-USER-TOKEN"
+    restUserHeader = None
+    restTimeout = 30.0
+    restJobIDField = "job_id"
+    def __init__(self, endpoint, connections):
+        self.restEndpoint = endpoint
+        self.restConnections = connections
+
+def main(argv):
+    count = 500
+    connections = 8
+    if len(argv) > 0: count = int(argv[0])
+    if len(argv) > 1: connections = int(argv[1])
+
+    command = os.path.join(tempfile.mkdtemp(), "sbatch")
+    with open(command, "w") as commandFile:
+        commandFile.write("#!/bin/sh\ncat > /dev/null\necho Submitted batch job 1\n")
+    os.chmod(command, stat.S_IRWXU)
+    os.environ["BOLT_BENCH_TOKEN"] = "token"
+    server = restServer.start("token")
+
+    start = time.time()
+    for i in range(count):
+        boltsubmit.submitStream(CommandBatch(command), SCRIPT)
+    process = time.time() - start
+
+    client = RestClient(RestBatch(server.url, 1))
+    start = time.time()
+    for i in range(count):
+        client.submit(SCRIPT)
+    sequential = time.time() - start
+    client.close()
+
+    client = RestClient(RestBatch(server.url, connections))
+    start = time.time()
+    client.submitMany([SCRIPT] * count)
+    pooled = time.time() - start
+    client.close()
+
+    server.shutdown()
+    sys.stdout.write("Submissions:          {0}\n".format(count))
+    sys.stdout.write("Submit command:       {0:10.0f} jobs/s\n".format(count / process))
+    sys.stdout.write("REST, 1 connection:   {0:10.0f} jobs/s\n".format(count / sequential))
+    sys.stdout.write("REST, {0} connections: {1:9.0f} jobs/s\n".format(connections, count / pooled))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
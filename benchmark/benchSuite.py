@@ -0,0 +1,259 @@
+"""
+Benchmark suite for the hot paths of bolt.
+
+Times reading the shipped configuration files, the task distribution
+over a grid of (tasks, tasks per node, threads) for every shipped
+resource, rendering job scripts and the start up of the bolt command.
+Only the configuration/ tree is used so the suite runs offline.
+
+Results are written as JSON. The compare command flags benchmarks
+whose best time is slower than a saved baseline by more than a
+threshold (default 20%, to allow for noise) and exits with status 1
+if there are any.
+
+Usage: python benchSuite.py run [-o results.json] [--quick] [--repeats n]
+       python benchSuite.py compare baseline.json results.json [--threshold 0.2]
+"""
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import bolterror
+from boltresource import BoltResource as Resource
+from boltbatch import BoltBatch as Batch
+from boltcode import BoltCode as Code
+from boltjob import BoltJob as Job
+from benchRender import makeJob
+
+def configFiles(rootDir, directory, pattern):
+    """The shipped configuration files in a directory"""
+    path = os.path.join(rootDir, "configuration", directory)
+    return [os.path.join(path, f) for f in sorted(os.listdir(path)) if fnmatch.fnmatch(f, pattern)]
+
+def readConfigs(rootDir):
+    """Read all the shipped resources, batch systems and codes.
+
+       Returns:
+          dict resources  - BoltResource objects keyed by name
+          dict batches    - BoltBatch objects keyed by name
+          int  files      - The number of files read
+    """
+    resources = {}
+    batches = {}
+    files = 0
+    for fileName in configFiles(rootDir, "batch", "*.batch"):
+        batch = Batch()
+        batch.readConfig(fileName)
+        batches[batch.name] = batch
+        files += 1
+    for fileName in configFiles(rootDir, "resources", "*.resource"):
+        resource = Resource()
+        resource.readConfig(fileName)
+        resources[resource.name] = resource
+        files += 1
+    for fileName in configFiles(rootDir, "codes", "*.code*"):
+        code = Code()
+        code.readConfig(fileName)
+        files += 1
+    return resources, batches, files
+
+def distributionGrid(resource, quick):
+    """The (tasks, tasks per node, threads) grid for a resource"""
+    cores = resource.numCoresPerNode()
+    threadsList = [t for t in (1, 2, 4, 8) if cores % t == 0]
+    tpnList = sorted(set([max(1, cores // d) for d in (1, 2, 4)]))
+    nodesList = (1, 2, 3, 8, 17, 64, 100, 256)
+    if quick: nodesList = (1, 3, 64)
+    grid = []
+    for threads in threadsList:
+        for tpn in tpnList:
+            if tpn * threads > cores: continue
+            for nodes in nodesList:
+                tasks = nodes * tpn
+                if tasks * threads > resource.maxTasks: continue
+                grid.append((tasks, tpn, threads))
+                # A partly filled last node
+                if nodes > 1: grid.append((tasks - tpn // 2, tpn, threads))
+    return grid
+
+def benchConfig(rootDir, quick):
+    """Read all the shipped configuration files"""
+    start = time.perf_counter()
+    resources, batches, files = readConfigs(rootDir)
+    return files, time.perf_counter() - start
+
+def benchDistribution(rootDir, quick):
+    """Distribute tasks over the grid for every shipped resource"""
+    resources, batches, files = readConfigs(rootDir)
+    count = 0
+    elapsed = 0.0
+    messages = []
+    bolterror.collectMessages(messages)
+    try:
+        for name in sorted(resources):
+            resource = resources[name]
+            if resource.batch not in batches: continue
+            batch = batches[resource.batch]
+            for tasks, tpn, threads in distributionGrid(resource, quick):
+                job = Job()
+                job.setTasks(tasks)
+                job.setTasksPerNode(tpn)
+                job.setThreads(threads)
+                job.setIsParallel(True)
+                if threads > 1:
+                    job.setParallelJobLauncher(resource.hybridJobLauncher)
+                else:
+                    job.setParallelJobLauncher(resource.distribJobLauncher)
+                start = time.perf_counter()
+                try:
+                    job.setParallelDistribution(resource, batch)
+                except bolterror.BoltError:
+                    # Combinations the resource does not support still
+                    # take time to reject
+                    pass
+                elapsed += time.perf_counter() - start
+                count += 1
+    finally:
+        bolterror.collectMessages(None)
+    return count, elapsed
+
+def benchRender(rootDir, quick):
+    """Render ARCHER2 job scripts for a sweep"""
+    resources, batches, files = readConfigs(rootDir)
+    resource = resources["ARCHER2"]
+    batch = batches[resource.batch]
+    count = 2000
+    if quick: count = 200
+    jobs = [makeJob(resource, batch, 1 + i % 256, (1, 2, 4, 8)[i % 4], i) for i in range(count)]
+    start = time.perf_counter()
+    for job in jobs:
+        job.renderScript(batch, resource, None)
+    return count, time.perf_counter() - start
+
+def runBolt(rootDir, args, workDir):
+    """Run the bolt command with a private history directory"""
+    env = dict(os.environ)
+    env["BOLT_DIR"] = rootDir
+    env["PYTHONPATH"] = os.path.join(rootDir, "modules")
+    env["HOME"] = workDir
+    result = subprocess.run([sys.executable, os.path.join(rootDir, "bin", "bolt")] + args, cwd=workDir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError("bolt {0} failed: {1}".format(" ".join(args), result.stderr))
+
+def benchStartup(rootDir, quick):
+    """Start bolt and list the resources"""
+    count = 5
+    if quick: count = 2
+    with tempfile.TemporaryDirectory() as workDir:
+        start = time.perf_counter()
+        for i in range(count):
+            runBolt(rootDir, ["-l"], workDir)
+        return count, time.perf_counter() - start
+
+def benchScript(rootDir, quick):
+    """Write a parallel job script with the bolt command"""
+    count = 5
+    if quick: count = 2
+    with tempfile.TemporaryDirectory() as workDir:
+        start = time.perf_counter()
+        for i in range(count):
+            runBolt(rootDir, ["-r", "ARCHER2", "-n", "512", "-A", "z01", "-t", "1:0:0", "-o", "bench.bolt", "./a.out"], workDir)
+        return count, time.perf_counter() - start
+
+# Benchmarks in the order they are run
+BENCHMARKS = [("config", benchConfig), ("distribution", benchDistribution), ("render", benchRender),
+              ("startup", benchStartup), ("script", benchScript)]
+
+def run(rootDir, quick, repeats):
+    """Run the benchmarks.
+
+       Returns:
+          dict results  - Metadata and, for each benchmark, the number of
+                          operations and the best and median time per
+                          operation in seconds
+    """
+    results = {}
+    for name, bench in BENCHMARKS:
+        times = []
+        for i in range(repeats):
+            ops, elapsed = bench(rootDir, quick)
+            times.append(elapsed / ops)
+        times.sort()
+        results[name] = {"description": bench.__doc__, "ops": ops, "best": times[0], "median": times[len(times) // 2]}
+        sys.stderr.write("{0:14s} {1:8d} ops {2:12.2f} us/op (best of {3})\n".format(name, ops, times[0] * 1.0e6, repeats))
+    meta = {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "quick": quick, "repeats": repeats}
+    return {"meta": meta, "results": results}
+
+def compare(baseline, current, threshold):
+    """Compare the best times of two sets of results.
+
+       Returns:
+          list regressions  - Names of benchmarks slower than the baseline
+                              by more than the threshold
+    """
+    regressions = []
+    for name in sorted(current["results"]):
+        if name not in baseline["results"]:
+            sys.stdout.write("{0:14s} new\n".format(name))
+            continue
+        ratio = current["results"][name]["best"] / baseline["results"][name]["best"]
+        flag = ""
+        if ratio > 1.0 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1.0 - threshold:
+            flag = "  faster"
+        sys.stdout.write("{0:14s} {1:12.2f} -> {2:12.2f} us/op {3:6.2f}x{4}\n".format(name, \
+                         baseline["results"][name]["best"] * 1.0e6, current["results"][name]["best"] * 1.0e6, ratio, flag))
+    return regressions
+
+def main(argv):
+    usage = __doc__[__doc__.index("Usage:"):]
+    if (len(argv) < 1) or (argv[0] not in ("run", "compare")):
+        sys.stderr.write(usage)
+        sys.exit(2)
+    rootDir = os.path.abspath(os.environ['BOLT_DIR'])
+    if argv[0] == "run":
+        outputFileName = "results.json"
+        quick = False
+        repeats = 3
+        args = argv[1:]
+        while len(args) > 0:
+            if (args[0] == "-o") and (len(args) > 1):
+                outputFileName = args[1]
+                args = args[2:]
+            elif (args[0] == "--repeats") and (len(args) > 1):
+                repeats = int(args[1])
+                args = args[2:]
+            elif args[0] == "--quick":
+                quick = True
+                args = args[1:]
+            else:
+                sys.stderr.write(usage)
+                sys.exit(2)
+        results = run(rootDir, quick, repeats)
+        with open(outputFileName, "w") as resultsFile:
+            json.dump(results, resultsFile, indent=1, sort_keys=True)
+        sys.stderr.write("Results written to {0}\n".format(outputFileName))
+    else:
+        threshold = 0.2
+        if (len(argv) == 5) and (argv[3] == "--threshold"):
+            threshold = float(argv[4])
+        elif len(argv) != 3:
+            sys.stderr.write(usage)
+            sys.exit(2)
+        with open(argv[1], "r") as baselineFile: baseline = json.load(baselineFile)
+        with open(argv[2], "r") as currentFile: current = json.load(currentFile)
+        regressions = compare(baseline, current, threshold)
+        if len(regressions) > 0:
+            sys.stdout.write("Regressions: {0}\n".format(", ".join(regressions)))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
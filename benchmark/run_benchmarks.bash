@@ -0,0 +1,10 @@
+#!/bin/bash
+#
+# Run the benchmarks
+#
+# This must be set to the path for the bolt top-level directory
+export BOLT_DIR=..
+export PYTHONPATH=$BOLT_DIR/modules
+python benchRender.py
+python benchSuite.py run -o results.json
+python benchSubmit.py
@@ -25,6 +25,9 @@ file that uses the [ConfigParser] module.
 """
 __author__ = "A. R. Turner, EPCC"
 
+import boltconfig
+import bolterror
+
 class BoltBatch(object):
     def __init__(self):
         """The default constructor - setup an empty batch system"""
@@ -46,12 +49,46 @@ class BoltBatch(object):
         self.__parallelOptions = None
         self.__parallelScriptPreamble = None
         self.__parallelScriptPostamble = None
+        self.__chunkFormat = None
+        self.__placeOption = None
+        self.__switchesOption = None
+        self.__coreSpecOption = None
 
         self.__serialTimeOption = None
         self.__serialOptions = None
         self.__serialScriptPreamble = None
         self.__serialScriptPostamble = None
 
+        self.__signalOption = None
+        self.__resubmitCommand = None
+
+        self.__restEndpoint = None
+        self.__restSocket = None
+        self.__restTokenVariable = None
+        self.__restTokenHeader = None
+        self.__restUserHeader = None
+        self.__restConnections = 4
+        self.__restTimeout = 30.0
+        self.__restJobIDField = "job_id"
+
+        self.__statusCommand = None
+        self.__statusJobSeparator = ","
+        self.__statusFormat = "delimited"
+        self.__statusDelimiter = "|"
+        self.__statusFields = [("id", "id"), ("state", "state")]
+        self.__queuedStates = []
+        self.__runningStates = []
+        self.__failedStates = []
+        self.__queueCommand = None
+        self.__queueFields = [("id", "id"), ("state", "state")]
+        self.__startCommand = None
+        self.__topologyCommand = None
+        self.__nodeCommand = None
+        self.__partitionCommand = None
+
+        # Option line fragments, built when first needed
+        self.__fragments = None
+
     # Properties
     # Batch system info
     @property
@@ -147,6 +184,31 @@ class BoltBatch(object):
     def parallelScriptPostamble(self):
         """Any script commands to run after a parallel application is finished"""
         return self.__parallelScriptPostamble
+    @property
+    def chunkFormat(self):
+        """The format of one chunk of the parallel option (e.g. PBS Pro
+        'select' chunks). '{chunks}', '{ncpus}', '{mpiprocs}' and
+        '{ompthreads}' are replaced. None if the parallel option is the
+        number of tasks or nodes."""
+        return self.__chunkFormat
+    @property
+    def placeOption(self):
+        """The option used to specify the placement of chunks. For example
+        '-l place=' for PBS Pro. None if placement is not set."""
+        return self.__placeOption
+    @property
+    def switchesOption(self):
+        """The option used to limit the network groups (switches) a job
+        spans. The value is the groups, followed by '@' and the longest
+        wait for them if there is one. For example '--switches=' for
+        Slurm. None if the batch system has no such option."""
+        return self.__switchesOption
+    @property
+    def coreSpecOption(self):
+        """The option used to reserve cores on each node for the system
+        (core specialisation). For example '--core-spec=' for Slurm. None
+        if the batch system has no such option."""
+        return self.__coreSpecOption
 
     @property
     def serialTimeOption(self):
@@ -170,6 +232,127 @@ class BoltBatch(object):
         """Any script commands to run after a parallel application is finished"""
         return self.__serialScriptPostamble
 
+    # Checkpoint options
+    @property
+    def signalOption(self):
+        """The option that asks the batch system to signal the job before
+        the walltime limit. '{signal}' and '{seconds}' are replaced. None
+        if not supported (the job script then sets its own timer)."""
+        return self.__signalOption
+    @property
+    def resubmitCommand(self):
+        """The command a job script uses to resubmit itself. '{script}'
+        and '{cycle}' are replaced; the cycle must be passed to the new
+        job in the BOLT_CYCLE environment variable. None if jobs cannot
+        resubmit themselves."""
+        return self.__resubmitCommand
+
+    # REST API options
+    @property
+    def restEndpoint(self):
+        """The URL that job scripts are posted to (the path if a UNIX
+        socket is used). None if jobs are submitted with the submit
+        command."""
+        return self.__restEndpoint
+    @property
+    def restSocket(self):
+        """The UNIX socket of the REST daemon (None to use the network)"""
+        return self.__restSocket
+    @property
+    def restTokenVariable(self):
+        """The environment variable that holds the access token (None if
+        no token is sent)"""
+        return self.__restTokenVariable
+    @property
+    def restTokenHeader(self):
+        """The HTTP header the access token is sent in"""
+        return self.__restTokenHeader
+    @property
+    def restUserHeader(self):
+        """The HTTP header the user name is sent in (None if not sent)"""
+        return self.__restUserHeader
+    @property
+    def restConnections(self):
+        """The number of pooled connections (and concurrent requests)"""
+        return self.__restConnections
+    @property
+    def restTimeout(self):
+        """The timeout for REST requests in seconds"""
+        return self.__restTimeout
+    @property
+    def restJobIDField(self):
+        """The field of the response that holds the job ID"""
+        return self.__restJobIDField
+
+    # Status options
+    @property
+    def statusCommand(self):
+        """The command that reports the status of a set of jobs. '{jobs}'
+        is replaced by the job IDs. None if job status cannot be found."""
+        return self.__statusCommand
+    @property
+    def statusJobSeparator(self):
+        """The separator between the job IDs in the status command"""
+        return self.__statusJobSeparator
+    @property
+    def statusFormat(self):
+        """The format of the status output: 'delimited' or 'keyvalue'"""
+        return self.__statusFormat
+    @property
+    def statusDelimiter(self):
+        """The delimiter between the fields of a line of status output"""
+        return self.__statusDelimiter
+    @property
+    def statusFields(self):
+        """List of (name, key) for the fields of the status output. Names
+        are id, state, elapsed, nodes and exit; the key is the name of the
+        field in keyvalue output."""
+        return self.__statusFields
+    @property
+    def queuedStates(self):
+        """List of the states of queued jobs"""
+        return self.__queuedStates
+    @property
+    def runningStates(self):
+        """List of the states of running jobs"""
+        return self.__runningStates
+    @property
+    def failedStates(self):
+        """List of the states of jobs that finished without success"""
+        return self.__failedStates
+    @property
+    def queueCommand(self):
+        """The command that lists the queued and running jobs of the user
+        (in the status format). '{user}' is replaced by the user name.
+        None if the queue cannot be listed."""
+        return self.__queueCommand
+    @property
+    def queueFields(self):
+        """List of (name, key) for the fields of the queue command output.
+        Names are id, state, qos and owner."""
+        return self.__queueFields
+    @property
+    def startCommand(self):
+        """The command that estimates when a job would start. '{queue}',
+        '{qos}', '{nodes}', '{time}' and '{account}' are replaced. None
+        if starts cannot be estimated."""
+        return self.__startCommand
+    @property
+    def topologyCommand(self):
+        """The command that prints the topology of a compute node (lscpu
+        or hwloc XML output). '{queue}' is replaced by the queue name.
+        None if not set."""
+        return self.__topologyCommand
+    @property
+    def nodeCommand(self):
+        """The command that lists the compute nodes. None if not set."""
+        return self.__nodeCommand
+    @property
+    def partitionCommand(self):
+        """The command that lists the partitions (queues) and their
+        limits. None if not set."""
+        return self.__partitionCommand
+
     # Methods
     def readConfig(self, fileName):
         """Read the batch system properties from a config file that uses the 
@@ -178,10 +361,10 @@ class BoltBatch(object):
         Arguments:
            str  fileName  - The file to read the batch configuration from
         """
-        import ConfigParser
+        import configparser
 
         # Set up the config for this object
-        batchConfig = ConfigParser.SafeConfigParser()
+        batchConfig = configparser.ConfigParser(inline_comment_prefixes=(";",))
         batchConfig.read(fileName)
 
         # Get the batch information options
@@ -193,7 +376,7 @@ class BoltBatch(object):
         self.__nameOption = batchConfig.get("basic options", "job name option")
         self.__accountOption = batchConfig.get("basic options", "account option")
         self.__queueOption = batchConfig.get("basic options", "queue option")
-        self.__qosOption = batchConfig.get("basic options", "qos option")
+        self.__qosOption = batchConfig.get("basic options", "qos option", fallback="")
 
         # Get the parallel options
         self.__parallelOption = batchConfig.get("parallel options", "parallel option")
@@ -204,6 +387,10 @@ class BoltBatch(object):
         self.__parallelOptions = batchConfig.get("parallel options", "additional options")
         self.__parallelScriptPreamble = batchConfig.get("parallel options", "script preamble")
         self.__parallelScriptPostamble = batchConfig.get("parallel options", "script postamble")
+        self.__chunkFormat = boltconfig.getOptional(batchConfig, "parallel options", "chunk format", None)
+        self.__placeOption = boltconfig.getOptional(batchConfig, "parallel options", "place option", None)
+        self.__switchesOption = boltconfig.getOptional(batchConfig, "parallel options", "switches option", None)
+        self.__coreSpecOption = boltconfig.getOptional(batchConfig, "parallel options", "core spec option", None)
 
         # Get the serial options
         self.__serialTimeOption = batchConfig.get("serial options", "time option")
@@ -211,6 +398,43 @@ class BoltBatch(object):
         self.__serialScriptPreamble = batchConfig.get("serial options", "script preamble")
         self.__serialScriptPostamble = batchConfig.get("serial options", "script postamble")
 
+        self.__fragments = None
+
+        # Get the checkpoint options (optional)
+        self.__signalOption = boltconfig.getOptional(batchConfig, "checkpoint options", "signal option", None)
+        self.__resubmitCommand = boltconfig.getOptional(batchConfig, "checkpoint options", "resubmit command", None)
+
+        # Get the REST API options (optional)
+        self.__restEndpoint = boltconfig.getOptional(batchConfig, "rest api", "endpoint", None)
+        self.__restSocket = boltconfig.getOptional(batchConfig, "rest api", "socket", None)
+        self.__restTokenVariable = boltconfig.getOptional(batchConfig, "rest api", "token variable", None)
+        self.__restTokenHeader = boltconfig.getOptional(batchConfig, "rest api", "token header", "Authorization")
+        self.__restUserHeader = boltconfig.getOptional(batchConfig, "rest api", "user header", None)
+        self.__restConnections = boltconfig.getOptionalInt(batchConfig, "rest api", "connections", 4)
+        self.__restTimeout = boltconfig.getOptionalFloat(batchConfig, "rest api", "timeout", 30.0)
+        self.__restJobIDField = boltconfig.getOptional(batchConfig, "rest api", "job id field", "job_id")
+
+        # Get the status options (optional)
+        self.__statusCommand = boltconfig.getOptional(batchConfig, "status", "status command", None)
+        self.__statusJobSeparator = boltconfig.getOptional(batchConfig, "status", "job separator", ",")
+        if self.__statusJobSeparator == "space": self.__statusJobSeparator = " "
+        self.__statusFormat = boltconfig.getOptional(batchConfig, "status", "status format", "delimited")
+        if self.__statusFormat not in ("delimited", "keyvalue"):
+            bolterror.handleError("Status format must be delimited or keyvalue, not '{0}'.".format(self.__statusFormat))
+        self.__statusDelimiter = boltconfig.getOptional(batchConfig, "status", "status delimiter", "|")
+        self.__statusFields = fieldList(boltconfig.getOptional(batchConfig, "status", "status fields", "id, state"))
+        self.__queuedStates = stateList(boltconfig.getOptional(batchConfig, "status", "queued states"))
+        self.__runningStates = stateList(boltconfig.getOptional(batchConfig, "status", "running states"))
+        self.__failedStates = stateList(boltconfig.getOptional(batchConfig, "status", "failed states"))
+        self.__queueCommand = boltconfig.getOptional(batchConfig, "status", "queue command", None)
+        self.__queueFields = fieldList(boltconfig.getOptional(batchConfig, "status", "queue fields", "id, state"))
+        self.__startCommand = boltconfig.getOptional(batchConfig, "status", "start command", None)
+
+        # Get the resource discovery commands (optional)
+        self.__topologyCommand = boltconfig.getOptional(batchConfig, "discovery", "topology command", None)
+        self.__nodeCommand = boltconfig.getOptional(batchConfig, "discovery", "node command", None)
+        self.__partitionCommand = boltconfig.getOptional(batchConfig, "discovery", "partition command", None)
+
     def getOptionLines(self, isParallel, jobName, queueName, qosName, runtime, accountID):
         """Generate the batch submission option lines so they can be
            written to a job script
@@ -225,43 +449,63 @@ class BoltBatch(object):
 
            Returns:
               str  options    - A string containing the correctly
-                                formatted serial job options.
+                                formatted job options.
         """
+        if self.__fragments is None: self.__compileFragments()
+        fragments = self.__fragments
+        text = ""
 
         # Common options
-        if (self.nameOption != "") and (self.nameOption is not None) \
-           and (jobName != "") and (jobName is not None):
-            text = "{0} {1}{2}\n".format(self.optionID, self.nameOption, jobName)
-        if (accountID != "") and (accountID is not None):
-            text = "{0}{1} {2}{3}\n".format(text, self.optionID, self.accountOption, accountID)
-        if (queueName != "") and (queueName is not None):
-            text = "{0}{1} {2}{3}\n".format(text, self.optionID, self.queueOption, queueName)
-        if (qosName != "") and (qosName is not None):
-            text = "{0}{1} {2}{3}\n".format(text, self.optionID, self.qosOption, qosName)
+        if ("name" in fragments) and not isBlank(jobName):
+            text += fragments["name"] + jobName + "\n"
+        if ("account" in fragments) and not isBlank(accountID):
+            text += fragments["account"] + accountID + "\n"
+        if ("queue" in fragments) and not isBlank(queueName):
+            text += fragments["queue"] + queueName + "\n"
+        if ("qos" in fragments) and not isBlank(qosName):
+            text += fragments["qos"] + qosName + "\n"
 
         if isParallel:
             # Parallel options
-            if (self.parallelTimeOption != "") and (self.parallelTimeOption is not None) \
-               and (runtime != "") and (runtime is not None):
-                    text = "{0}{1} {2}{3}\n".format(text, self.optionID, self.parallelTimeOption, runtime)
-            if (self.parallelOptions != "") and (self.parallelOptions is not None):
-                # Split out the parallel options
-                options = self.parallelOptions.split(";")
-                for option in options:
-                    text = "{0}{1} {2}\n".format(test, self.optionID, option)
+            if ("parallelTime" in fragments) and not isBlank(runtime):
+                text += fragments["parallelTime"] + runtime + "\n"
+            text += fragments["parallelOptions"]
         else:
             # Serial options
-            if (self.serialTimeOption != "") and (self.serialTimeOption is not None) \
-               and (runtime != "") and (runtime is not None):
-                    text = "{0}{1} {2}{3}\n".format(text, self.optionID, self.serialTimeOption, runtime)
-            if (self.serialOptions != "") and (self.serialOptions is not None):
-                # Split out the parallel options
-                options = self.serialOptions.split(";")
-                for option in options:
-                    text = "{0}{1} {2}\n".format(test, self.optionID, option)
-
-        text = text + "\n"
-        return text
+            if ("serialTime" in fragments) and not isBlank(runtime):
+                text += fragments["serialTime"] + runtime + "\n"
+            text += fragments["serialOptions"]
+
+        return text + "\n"
+
+    def optionLine(self, option, value=""):
+        """Format a single batch option line.
+
+           Arguments:
+              str  option  - The option (without the option identifier)
+              str  value   - The value appended to the option
+
+           Returns:
+              str  line    - The option line
+        """
+        return "{0} {1}{2}\n".format(self.optionID, option, value)
+
+    def __compileFragments(self):
+        """Build the fixed parts of the option lines once so that each
+           script only has to append the values."""
+        fragments = {}
+        for key, option in (("name", self.nameOption), ("account", self.accountOption), \
+                            ("queue", self.queueOption), ("qos", self.qosOption), \
+                            ("parallelTime", self.parallelTimeOption), ("serialTime", self.serialTimeOption)):
+            if not isBlank(option):
+                fragments[key] = "{0} {1}".format(self.optionID, option)
+        for key, options in (("parallelOptions", self.parallelOptions), ("serialOptions", self.serialOptions)):
+            fragments[key] = ""
+            if not isBlank(options):
+                for option in options.split(";"):
+                    if option.strip() != "":
+                        fragments[key] += self.optionLine(option.strip())
+        self.__fragments = fragments
 
     def summaryString(self):
         """Return a string summarising the batch system.
@@ -270,3 +514,21 @@ class BoltBatch(object):
               str  output  - The string summarising the batch system
         """
         return "| {0:<10} |".format(self.name)
+
+def fieldList(value):
+    """The (name, key) pairs in a comma-separated list of fields. Each
+       field is a name or name=key; the key defaults to the name."""
+    fields = []
+    for field in value.split(","):
+        name, sep, key = field.strip().partition("=")
+        if sep == "": key = name
+        fields.append((name.strip(), key.strip()))
+    return fields
+
+def stateList(value):
+    """The job states in a comma-separated list"""
+    return [state.strip().upper() for state in value.split(",") if state.strip() != ""]
+
+def isBlank(value):
+    """Is an option or value missing (None or empty)?"""
+    return (value is None) or (str(value).strip() == "")
@@ -0,0 +1,110 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent the broadcast of an executable to nodes
+
+This class is part of the bolt job submission script generation
+tool. When thousands of processes load an executable, its shared
+libraries or a container image from the parallel filesystem at the
+same time, the job can spend minutes starting up. Instead, the
+script copies the file to node-local storage once per node with the
+broadcast command of the resource (e.g. sbcast) and the job command
+is rewritten to use the local copy.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import os
+
+class BoltBroadcast(object):
+    """This class represents the broadcast of the files a job launches."""
+    def __init__(self, resource, jobCommand):
+        """Setup the broadcast for a job command. Container images in the
+           command are broadcast if there are any; otherwise the executable
+           (the first word of the command that is not a launcher option)
+           is broadcast.
+
+           Arguments:
+              BoltResource resource   - The resource the job is for
+              str          jobCommand - The job command to rewrite
+        """
+        words = jobCommand.split()
+        images = [i for i, w in enumerate(words) \
+                  if os.path.splitext(w)[1] in resource.containerExtensions]
+        self.__isContainer = len(images) > 0
+        if not self.__isContainer:
+            images = [i for i, w in enumerate(words) if not w.startswith("-")][:1]
+        self.__files = []
+        for i in images:
+            target = os.path.join(resource.broadcastDir, os.path.basename(words[i]))
+            self.__files.append((words[i], target))
+            words[i] = target
+        self.__jobCommand = " ".join(words)
+
+    # Properties ==============================================================
+    @property
+    def files(self):
+        """List of (source, node-local copy) for the files broadcast"""
+        return self.__files
+    @property
+    def jobCommand(self):
+        """The job command rewritten to use the node-local copies"""
+        return self.__jobCommand
+    @property
+    def isContainer(self):
+        """Are container images being broadcast (rather than the
+        executable)?"""
+        return self.__isContainer
+
+    # Methods ==============================================================
+    def broadcastLines(self, job, resource):
+        """The script lines that broadcast the files to the nodes.
+
+           Arguments:
+              BoltJob      job      - The job being written
+              BoltResource resource - The resource the job is for
+
+           Returns:
+              str  text  - The script lines
+        """
+        csh = "csh" in resource.shell
+        text = ""
+        for source, target in self.__files:
+            # Executables are usually found on the PATH
+            if (not self.__isContainer) and ("/" not in source):
+                if csh:
+                    source = "`which {0}`".format(source)
+                else:
+                    source = "$(command -v {0})".format(source)
+            command = resource.broadcastCommand
+            if self.__isContainer: command = resource.containerCommand
+            text += command.format(source=source, target=target) + "\n"
+            if (resource.broadcastLibDir is not None) and (not self.__isContainer):
+                libDir = resource.broadcastLibDir.format(target=target)
+                # An empty entry would add the current directory to the
+                # library search path
+                if csh:
+                    text += "if ( ! $?LD_LIBRARY_PATH ) setenv LD_LIBRARY_PATH\n"
+                    text += "if ( \"$LD_LIBRARY_PATH\" == \"\" ) then\n"
+                    text += "    setenv LD_LIBRARY_PATH {0}\n".format(libDir)
+                    text += "else\n"
+                    text += "    setenv LD_LIBRARY_PATH {0}:${{LD_LIBRARY_PATH}}\n".format(libDir)
+                    text += "endif\n"
+                else:
+                    text += "export LD_LIBRARY_PATH={0}${{LD_LIBRARY_PATH:+:${{LD_LIBRARY_PATH}}}}\n".format(libDir)
+        return text
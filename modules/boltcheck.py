@@ -0,0 +1,439 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent the check of an existing job script
+
+This class is part of the bolt job submission script generation
+tool. Job scripts are often kept and edited by hand long after bolt
+wrote them. The check reads the batch options from a script using
+the option identifier and option names of the batch system, rebuilds
+the job shape and walltime, and runs them through the same checks
+bolt uses when it writes a script (BoltJob.checkTasks and checkTime).
+Errors and warnings are collected instead of stopping bolt, together
+with an estimate of the node hours wasted by cores left idle on the
+allocated nodes.
+
+Scripts are checked in parallel and the results are reported as
+JSON.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import multiprocessing
+import os
+import re
+import bolterror
+from boltjob import BoltJob
+
+# Only the start of large files is read: batch options are at the top
+MAX_READ = 1048576
+
+class BoltCheck(object):
+    """This class represents the check of an existing job script."""
+    def __init__(self, fileName, text, resource, batch):
+        """Parse the batch options in a script and check the job.
+
+           Arguments:
+              str          fileName - The script file name (for the report)
+              str          text     - The script text
+              BoltResource resource - The resource the script is for
+              BoltBatch    batch    - The batch system the script is for
+        """
+        self.__fileName = fileName
+        self.__resource = resource
+        self.__batch = batch
+        # bolt scripts say what type of job they are
+        isParallel = None
+        match = re.search(r"^# (Parallel|Serial) script produced by bolt", text, re.MULTILINE)
+        if match is not None: isParallel = (match.group(1) == "Parallel")
+        self.__options = parseOptions(text, batch, isParallel)
+        # Scripts for another class of node name its queue or QoS
+        self.__resource = nodeClassFor(resource, self.__options)
+        self.__messages = []
+        self.__job = None
+        self.__nodes = 0
+        self.__threads = 1
+        match = re.search(r"OMP_NUM_THREADS[= ]\s*([0-9]+)", text)
+        if match is not None: self.__threads = max(1, int(match.group(1)))
+        # Serial scripts have no parallel option
+        self.__isParallel = "units" in self.__options
+        if isParallel is not None: self.__isParallel = isParallel
+        self.__check()
+
+    # Properties ==============================================================
+    @property
+    def fileName(self):
+        """The script file name"""
+        return self.__fileName
+    @property
+    def options(self):
+        """Dictionary of the batch option values found in the script"""
+        return self.__options
+    @property
+    def messages(self):
+        """List of (level, message) from the checks, level is 'error'
+        or 'warning'"""
+        return self.__messages
+    @property
+    def nodes(self):
+        """The number of nodes requested (0 if not known)"""
+        return self.__nodes
+    @property
+    def wallTime(self):
+        """The walltime requested in hours (None if not known)"""
+        if self.__job is None: return None
+        return self.__job.wallTime
+    @property
+    def idleCores(self):
+        """Cores on the allocated nodes that the job does not use"""
+        if (self.__job is None) or (not self.__isParallel) or (not self.__resource.nodeExclusive): return 0
+        return max(0, self.__nodes * self.__resource.numCoresPerNode() - self.__job.pTasks * self.__job.threads)
+    @property
+    def nodeHours(self):
+        """Node hours requested by the script"""
+        if self.wallTime is None: return 0.0
+        return self.__nodes * self.wallTime
+    @property
+    def wastedNodeHours(self):
+        """Node hours requested but left idle"""
+        if self.wallTime is None: return 0.0
+        return float(self.idleCores) / self.__resource.numCoresPerNode() * self.wallTime
+
+    # Methods ==============================================================
+    def __check(self):
+        """Rebuild the job from the options and run the checks. The
+           walltime is checked even if the job shape has errors."""
+        resource = self.__resource
+        job = BoltJob()
+        job.setIsParallel(self.__isParallel)
+        previous = bolterror.collectMessages(self.__messages)
+        try:
+            try:
+                if self.__isParallel:
+                    self.__setShape(job)
+                else:
+                    job.setTasks(1)
+                    job.setTasksPerNode(1)
+                self.__nodes = job.numNodes()
+                self.__job = job
+            except bolterror.BoltError:
+                return
+            try:
+                if self.__isParallel:
+                    job.checkTasks(resource, None)
+                    self.__nodes = job.numNodes()
+            except bolterror.BoltError:
+                pass
+            try:
+                if "time" not in self.__options:
+                    bolterror.handleError("No walltime option ({0}) found.".format(self.__timeOption().strip()))
+                job.setWallTime(hmsString(self.__options["time"], self.__timeFormat()))
+                job.checkTime(resource)
+            except bolterror.BoltError:
+                pass
+        finally:
+            bolterror.collectMessages(previous)
+
+    def __setShape(self, job):
+        """Set the tasks, tasks per node and threads of the job from the
+           parallel options."""
+        resource = self.__resource
+        chunks = parseChunks(self.__options["units"])
+        if chunks is not None:
+            self.__setChunkShape(job, chunks)
+            return
+        units = self.__intOption("units")
+        if units < 1:
+            bolterror.handleError("No parallel resources requested ({0}{1}).".format(self.__batch.parallelOption, units))
+        tpn = 0
+        if "tpn" in self.__options: tpn = self.__intOption("tpn")
+        job.setThreads(self.__threads)
+        if resource.parallelBatchUnit == "nodes":
+            if tpn == 0: tpn = max(1, resource.numCoresPerNode() // self.__threads)
+            job.setTasks(units * tpn)
+        else:
+            # Allocated by tasks (whole nodes of tasks if node exclusive)
+            if tpn == 0: tpn = min(units, max(1, resource.numCoresPerNode() // self.__threads))
+            job.setTasks(units)
+        job.setTasksPerNode(tpn)
+        self.__nodes = job.numNodes()
+
+    def __setChunkShape(self, job, chunks):
+        """Set the tasks, tasks per node and threads of the job from the
+           chunks of a chunked parallel option (e.g. PBS Pro 'select')."""
+        resource = self.__resource
+        threads = int(chunks[0][1].get("ompthreads", self.__threads))
+        tasks = sum([count * int(values.get("mpiprocs", 1)) for count, values in chunks])
+        if tasks < 1:
+            bolterror.handleError("No parallel resources requested ({0}{1}).".format(self.__batch.parallelOption, self.__options["units"]))
+        tpn = max([int(values.get("mpiprocs", 1)) for count, values in chunks])
+        # Chunks per die: the tasks per node are those of all the dies
+        if resource.chunkUnit == "die":
+            tpn *= resource.socketsPerNode * resource.diesPerSocket
+        job.setThreads(threads)
+        job.setTasks(tasks)
+        job.setTasksPerNode(min(tpn, tasks))
+        self.__nodes = job.numNodes()
+
+    def __intOption(self, name):
+        value = self.__options[name]
+        if not value.isdigit():
+            bolterror.handleError("Option value '{0}' is not a whole number.".format(value))
+        return int(value)
+
+    def __timeOption(self):
+        if self.__isParallel: return self.__batch.parallelTimeOption
+        return self.__batch.serialTimeOption
+
+    def __timeFormat(self):
+        if self.__isParallel: return self.__resource.parallelTimeFormat
+        return self.__resource.serialTimeFormat
+
+    def report(self):
+        """The result of the check as a dictionary (for the JSON report)"""
+        report = {}
+        report["file"] = self.fileName
+        report["resource"] = self.__resource.name
+        if self.__resource.nodeClass is not None: report["class"] = self.__resource.nodeClass
+        report["batch"] = self.__batch.name
+        report["parallel"] = self.__isParallel
+        report["nodes"] = self.nodes
+        report["tasks"] = 0
+        report["tpn"] = 0
+        if self.__job is not None:
+            report["tasks"] = self.__job.pTasks
+            report["tpn"] = self.__job.pTasksPerNode
+        report["threads"] = self.__threads
+        report["walltime"] = self.wallTime
+        report["nodeHours"] = round(self.nodeHours, 3)
+        report["idleCores"] = self.idleCores
+        report["wastedNodeHours"] = round(self.wastedNodeHours, 3)
+        report["violations"] = [{"level": level, "message": message} for level, message in self.messages]
+        return report
+
+def parseOptions(text, batch, isParallel=None):
+    """Read the batch options from the text of a job script. The last
+       value of an option is used. Options may be followed by a space
+       or written next to their value (e.g. '-Nname').
+
+       Arguments:
+          str       text       - The script text
+          BoltBatch batch      - The batch system the script is for
+          boolean   isParallel - Is it a parallel job script (None to
+                                 decide from the parallel option)
+
+       Returns:
+          dict  options  - Option values keyed by name, tpn, tpd,
+                           stride, units, time, account, queue and qos
+    """
+    names = [("name", batch.nameOption), ("account", batch.accountOption),
+             ("queue", batch.queueOption), ("qos", batch.qosOption),
+             ("units", batch.parallelOption), ("tpn", batch.taskPerNodeOption),
+             ("tpd", batch.taskPerDieOption), ("stride", batch.taskStrideOption)]
+    parallelOption = (batch.parallelOption or "").strip()
+    optionLines = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line.startswith(batch.optionID): continue
+        optionLines.append(line[len(batch.optionID):].strip())
+    if isParallel is None:
+        isParallel = (parallelOption != "") and \
+                     (len([rest for rest in optionLines if rest.startswith(parallelOption)]) > 0)
+    if not isParallel:
+        names = [n for n in names if n[0] not in ("units", "tpn", "tpd", "stride")]
+    # The time option depends on the type of job
+    if isParallel:
+        names.append(("time", batch.parallelTimeOption))
+    else:
+        names.append(("time", batch.serialTimeOption))
+    names = [(key, option.strip()) for key, option in names if (option is not None) and (option.strip() != "")]
+    names.sort(key=lambda n: len(n[1]), reverse=True)
+    options = {}
+    for rest in optionLines:
+        for key, option in names:
+            if not rest.startswith(option): continue
+            options[key] = rest[len(option):].strip()
+            break
+    return options
+
+def nodeClassFor(resource, options):
+    """The node class of a resource that a script runs on: the first
+       class other than the default whose queue or QoS the script
+       requests, otherwise the default class.
+
+       Arguments:
+          BoltResource resource - The resource the script is for
+          dict         options  - The options found in the script (from
+                                  parseOptions)
+
+       Returns:
+          BoltResource resource  - The resource as seen by the node class
+    """
+    if len(resource.nodeClasses) < 2: return resource
+    for name in resource.nodeClasses[1:]:
+        nodeClass = resource.getNodeClass(name)
+        for key, queue, default in (("queue", nodeClass.parallelQueue, resource.parallelQueue),
+                                    ("queue", nodeClass.serialQueue, resource.serialQueue),
+                                    ("qos", nodeClass.parallelQos, resource.parallelQos),
+                                    ("qos", nodeClass.serialQos, resource.serialQos)):
+            if (queue is not None) and (queue != default) and (options.get(key) == queue):
+                return nodeClass
+    return resource.getNodeClass(resource.nodeClasses[0])
+
+def parseChunks(value):
+    """Read the chunks of a chunked parallel option, e.g. PBS Pro
+       '2:ncpus=24:mpiprocs=24+1:ncpus=24:mpiprocs=4'.
+
+       Arguments:
+          str  value  - The option value
+
+       Returns:
+          list chunks  - (count, dict of resources) for each chunk (None if
+                         the value is a plain count)
+    """
+    if value.isdigit(): return None
+    chunks = []
+    for chunk in value.split("+"):
+        fields = chunk.strip().split(":")
+        count = 1
+        if fields[0].isdigit(): count = int(fields.pop(0))
+        values = {}
+        for field in fields:
+            key, equals, setting = field.partition("=")
+            if (equals == "") or ((key in ("mpiprocs", "ompthreads", "ncpus")) and not setting.isdigit()):
+                bolterror.handleError("Chunk '{0}' is not in the form count:resource=value:...".format(chunk))
+            values[key] = setting
+        chunks.append((count, values))
+    return chunks
+
+def hmsString(value, timeFormat):
+    """Convert a walltime in the time format of a resource to hh:mm:ss.
+       Times in 'hms' format may have a number of days (d-hh:mm:ss).
+
+       Arguments:
+          str  value       - The walltime from the script
+          str  timeFormat  - 'hms', 'hours' or 'seconds'
+    """
+    if timeFormat == "hms":
+        match = re.search(r"^(?:([0-9]+)-)?([0-9]+):([0-9]+)(?::([0-9]+))?$", value)
+        if match is not None:
+            days, hours, minutes, seconds = [int(v or 0) for v in match.groups()]
+            return "{0}:{1}:{2}".format(days * 24 + hours, minutes, seconds)
+    elif (timeFormat == "hours") and re.search(r"^[0-9]+(\.[0-9]+)?$", value):
+        return value
+    elif (timeFormat == "seconds") and value.isdigit():
+        seconds = int(value)
+        return "{0}:{1}:{2}".format(seconds // 3600, (seconds % 3600) // 60, seconds % 60)
+    bolterror.handleError("Walltime '{0}' is not in the '{1}' format of the resource.".format(value, timeFormat))
+
+def findScripts(paths):
+    """List the files to check. Directories are searched recursively.
+
+       Arguments:
+          list paths  - File and directory names
+
+       Returns:
+          list files  - The file names, sorted
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirPath, dirNames, fileNames in os.walk(path):
+                dirNames[:] = [d for d in dirNames if not d.startswith(".")]
+                files.extend([os.path.join(dirPath, f) for f in fileNames])
+        else:
+            files.append(path)
+    return sorted(files)
+
+# The resources and batch systems used by the check processes
+_resources = None
+_batches = None
+_defaultResource = None
+
+def _setup(resources, batches, defaultResource):
+    global _resources, _batches, _defaultResource
+    _resources = resources
+    _batches = batches
+    _defaultResource = defaultResource
+
+def checkFile(fileName):
+    """Check a single file. The resource and batch system named in the
+       header of a bolt script are used if they are known, otherwise
+       the default resource and its batch system.
+
+       Arguments:
+          str  fileName  - The file to check
+
+       Returns:
+          dict report  - The report from BoltCheck.report (None if the
+                         file is not a job script)
+    """
+    try:
+        with open(fileName, "r", errors="replace") as scriptFile:
+            text = scriptFile.read(MAX_READ)
+    except (IOError, OSError):
+        return None
+    if not text.startswith("#!"): return None
+    resource = _resources[_defaultResource]
+    match = re.search(r"^#\s+Resource: (\S+)", text, re.MULTILINE)
+    if (match is not None) and (match.group(1) in _resources): resource = _resources[match.group(1)]
+    batch = _batches[resource.batch]
+    match = re.search(r"^#\s+Batch system: (\S+)", text, re.MULTILINE)
+    if (match is not None) and (match.group(1) in _batches): batch = _batches[match.group(1)]
+    if re.search("^\\s*" + re.escape(batch.optionID), text, re.MULTILINE) is None: return None
+    return BoltCheck(fileName, text, resource, batch).report()
+
+def checkScripts(fileNames, resources, batches, defaultResource, processes=None):
+    """Check job scripts in parallel.
+
+       Arguments:
+          list fileNames       - The files to check
+          dict resources       - BoltResource objects keyed by name
+          dict batches         - BoltBatch objects keyed by name
+          str  defaultResource - Resource for scripts that do not name one
+          int  processes       - Number of processes (None for one per core)
+
+       Returns:
+          list reports  - Reports for the job scripts, in file name order
+    """
+    if (processes == 1) or (len(fileNames) < 2):
+        _setup(resources, batches, defaultResource)
+        reports = [checkFile(f) for f in fileNames]
+    else:
+        pool = multiprocessing.Pool(processes, _setup, (resources, batches, defaultResource))
+        try:
+            reports = pool.map(checkFile, fileNames, chunksize=max(1, len(fileNames) // 64))
+        finally:
+            pool.close()
+            pool.join()
+    return [r for r in reports if r is not None]
+
+def summary(reports):
+    """Summarise the reports.
+
+       Returns:
+          dict summary  - Counts of scripts, errors and warnings and the
+                          total and wasted node hours
+    """
+    summary = {}
+    summary["scripts"] = len(reports)
+    summary["withErrors"] = len([r for r in reports if "error" in [v["level"] for v in r["violations"]]])
+    summary["withWarnings"] = len([r for r in reports if "warning" in [v["level"] for v in r["violations"]]])
+    summary["nodeHours"] = round(sum([r["nodeHours"] for r in reports]), 3)
+    summary["wastedNodeHours"] = round(sum([r["wastedNodeHours"] for r in reports]), 3)
+    return summary
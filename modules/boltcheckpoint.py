@@ -0,0 +1,153 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent checkpoint and restart for a job
+
+This class is part of the bolt job submission script generation
+tool. For codes that can write a checkpoint when they receive a
+signal, the job script asks the batch system to send the signal
+shortly before the walltime limit (or sets its own timer if the
+batch system cannot), passes it on to the running code and, if the
+calculation has not completed, resubmits itself with the restart
+arguments of the code. The cycle number is passed to the next job
+in the BOLT_CYCLE environment variable.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import os
+import bolterror
+
+class BoltCheckpoint(object):
+    """This class represents the checkpoint/resubmission loop of a job."""
+    def __init__(self, code, args, scriptPath, maxCycles):
+        """Setup the checkpointing for a job.
+
+           Arguments:
+              BoltCode  code       - The code being run
+              list      args       - The code arguments used in the job command
+              str       scriptPath - The job script (resubmitted by the job)
+              int       maxCycles  - Maximum number of runs, including the first
+        """
+        self.__signal = code.checkpointSignal
+        self.__leadTime = code.signalLeadTime
+        self.__arguments = code.argFormat.format(*args)
+        self.__restartArguments = code.restartFormat.format(*args)
+        self.__completionCheck = None
+        if code.completionCheck is not None:
+            self.__completionCheck = code.completionCheck.format(*args)
+        self.__scriptPath = os.path.abspath(scriptPath)
+        self.__maxCycles = maxCycles
+
+    # Properties ==============================================================
+    @property
+    def signal(self):
+        """The checkpoint signal (without the SIG prefix)"""
+        return self.__signal
+    @property
+    def leadTime(self):
+        """The time (seconds) before the walltime limit the signal is sent"""
+        return self.__leadTime
+    @property
+    def maxCycles(self):
+        """The maximum number of runs, including the first"""
+        return self.__maxCycles
+
+    # Methods ==============================================================
+    def optionLines(self, batch):
+        """The batch option that asks for the checkpoint signal (empty if
+           the batch system does not support it)."""
+        if batch.signalOption is None: return ""
+        return "{0} {1}\n".format(batch.optionID, batch.signalOption.format(signal=self.signal, seconds=self.leadTime))
+
+    def restartLine(self, runLine):
+        """The run line used to restart the code from a checkpoint"""
+        if runLine.endswith(self.__arguments):
+            return runLine[:len(runLine) - len(self.__arguments)] + self.__restartArguments
+        return runLine
+
+    def runLines(self, job, batch, resource, runLine):
+        """Wrap the run line with the commands that pass the checkpoint
+           signal on to the code. The code is run in the background so that
+           the shell can handle the signal while it runs. The exit status
+           of the lines is the exit status of the code.
+
+           Arguments:
+              BoltJob      job      - The job being written
+              BoltBatch    batch    - The batch system the job is for
+              BoltResource resource - The resource the job is for
+              str          runLine  - The complete run line for the job
+
+           Returns:
+              str  text  - The script lines (without a final newline)
+        """
+        if "csh" in resource.shell:
+            bolterror.handleError("Checkpointing needs a Bourne-type job script shell; resource {0} uses {1}.".format(resource.name, resource.shell))
+        text = "BOLT_CYCLE=${BOLT_CYCLE:-1}\n"
+        text += "BOLT_SIGNALLED=0\n"
+        text += "trap 'BOLT_SIGNALLED=1; kill -{0} ${{BOLT_PID}} 2>/dev/null' {0}\n".format(self.signal)
+        if batch.signalOption is None:
+            # Set our own timer to send the signal before the walltime limit
+            seconds = max(60, int(job.wallTime * 3600) - self.leadTime)
+            text += "(sleep {0}; kill -{1} $$) &\n".format(seconds, self.signal)
+            text += "BOLT_TIMER=$!\n"
+        text += "echo \"bolt: run ${{BOLT_CYCLE}} of {0}\"\n".format(self.maxCycles)
+        if self.restartLine(runLine) == runLine:
+            text += "{0} &\n".format(runLine)
+        else:
+            text += "if [ ${BOLT_CYCLE} -gt 1 ]; then\n"
+            text += "    {0} &\n".format(self.restartLine(runLine))
+            text += "else\n"
+            text += "    {0} &\n".format(runLine)
+            text += "fi\n"
+        text += "BOLT_PID=$!\n"
+        text += "wait ${BOLT_PID}\n"
+        text += "BOLT_RUN_STATUS=$?\n"
+        text += "# wait returns early when the checkpoint signal arrives\n"
+        text += "while kill -0 ${BOLT_PID} 2>/dev/null; do wait ${BOLT_PID}; BOLT_RUN_STATUS=$?; done\n"
+        if batch.signalOption is None:
+            text += "kill ${BOLT_TIMER} 2>/dev/null\n"
+        text += "(exit ${BOLT_RUN_STATUS})"
+        return text
+
+    def resubmitLines(self, batch, resource):
+        """The script lines that resubmit the job if the calculation has
+           not completed.
+
+           Arguments:
+              BoltBatch    batch    - The batch system the job is for
+              BoltResource resource - The resource the job is for
+
+           Returns:
+              str  text  - The script lines
+        """
+        if self.__completionCheck is not None:
+            complete = self.__completionCheck
+        else:
+            complete = "[ ${BOLT_SIGNALLED} -eq 0 ]"
+        resubmit = batch.resubmitCommand.format(script=self.__scriptPath, cycle="$((BOLT_CYCLE + 1))")
+        text = "# Resubmit to continue from the checkpoint\n"
+        text += "if {0}; then\n".format(complete)
+        text += "    echo \"bolt: calculation complete after ${BOLT_CYCLE} runs\"\n"
+        text += "elif [ ${{BOLT_CYCLE}} -lt {0} ]; then\n".format(self.maxCycles)
+        text += "    echo \"bolt: resubmitting to continue from the checkpoint\"\n"
+        text += "    {0}\n".format(resubmit)
+        text += "else\n"
+        text += "    echo \"bolt: calculation not complete after {0} runs\" >&2\n".format(self.maxCycles)
+        text += "fi\n"
+        return text
@@ -25,6 +25,10 @@ file that uses the [ConfigParser] module.
 """
 __author__ = "A. R. Turner, EPCC"
 
+import bolterror
+import boltconfig
+import boltcorespec
+
 class BoltCode(object):
     def __init__(self):
         """The default constructor - setup an simulation code system"""
@@ -44,6 +48,29 @@ class BoltCode(object):
         self.__preamble = None
         self.__postamble = None
 
+        self.__bound = None
+        self.__tasksPerDie = 0
+        self.__threadsPerTask = 0
+        self.__memoryPerTask = 0.0
+        self.__scalingCeiling = 0
+        self.__reservedCores = None
+
+        self.__stageInputArgs = []
+        self.__stageOutputArgs = []
+        self.__stageInputFiles = []
+        self.__stageOutputFiles = []
+        self.__stageTier = None
+
+        self.__outputDir = None
+        self.__outputSize = 0.0
+        self.__outputPattern = "shared"
+
+        self.__checkpointSignal = None
+        self.__signalLeadTime = 0
+        self.__restartFormat = None
+        self.__completionCheck = None
+        self.__maxCycles = 0
+
     # Properties ==============================================================
     # Code info
     @property
@@ -103,6 +130,111 @@ class BoltCode(object):
     def postamble(self):
         """Any commands to be run in the script after the job runs."""
         return self.__postamble
+    # Performance profile
+    @property
+    def bound(self):
+        """What limits the performance of the code: 'memory', 'compute'
+           or None if not known."""
+        return self.__bound
+    @property
+    def memoryBound(self):
+        """Is the performance of the code limited by memory bandwidth?"""
+        return self.__bound == "memory"
+    @property
+    def tasksPerDie(self):
+        """The preferred number of parallel tasks per die (NUMA region).
+           0 if there is no preference."""
+        return self.__tasksPerDie
+    @property
+    def threadsPerTask(self):
+        """The best number of shared-memory threads per task for hybrid
+           jobs. 0 if there is no preference."""
+        return self.__threadsPerTask
+    @property
+    def memoryPerTask(self):
+        """The memory needed by each parallel task in GB. 0 if not known."""
+        return self.__memoryPerTask
+    @property
+    def scalingCeiling(self):
+        """The number of parallel tasks beyond which the code does not
+           run any faster. 0 if not known."""
+        return self.__scalingCeiling
+    @property
+    def reservedCores(self):
+        """The cores to keep free of tasks on each node ('2') or die
+           ('1/die'), e.g. for MPI progress threads. None if none."""
+        return self.__reservedCores
+    # Data staging
+    @property
+    def stageInputArgs(self):
+        """The indices of the code arguments that are input files"""
+        return self.__stageInputArgs
+    @property
+    def stageOutputArgs(self):
+        """The indices of the code arguments that are output files"""
+        return self.__stageOutputArgs
+    @property
+    def stageInputFiles(self):
+        """Other input files (or shell patterns) read by the code, relative
+           to the job directory"""
+        return self.__stageInputFiles
+    @property
+    def stageOutputFiles(self):
+        """Other output files (or shell patterns) written by the code"""
+        return self.__stageOutputFiles
+    @property
+    def stageTier(self):
+        """The preferred storage tier to stage data to (None for the first
+           tier defined by the resource)"""
+        return self.__stageTier
+    # Output
+    @property
+    def outputDir(self):
+        """The directory the code writes its output to, relative to the
+           job directory (None if not known)"""
+        return self.__outputDir
+    @property
+    def outputSize(self):
+        """The expected size of the output written per job (GB). 0 if
+           not known."""
+        return self.__outputSize
+    @property
+    def outputPattern(self):
+        """How the output is written: 'shared' (all tasks write to shared
+           files) or 'per process' (one file per task)"""
+        return self.__outputPattern
+    # Checkpointing
+    @property
+    def checkpointSignal(self):
+        """The signal that makes the code write a checkpoint and stop
+           (e.g. 'USR1'). None if the code cannot be restarted."""
+        return self.__checkpointSignal
+    @property
+    def signalLeadTime(self):
+        """The time (seconds) before the end of the job that the
+           checkpoint signal must be sent"""
+        return self.__signalLeadTime
+    @property
+    def restartFormat(self):
+        """Format string for the command line arguments used to restart
+           the code from a checkpoint"""
+        return self.__restartFormat
+    @property
+    def completionCheck(self):
+        """Command (format string with the code arguments) that succeeds
+           when the calculation has completed. None to treat the run as
+           complete if the checkpoint signal was not sent."""
+        return self.__completionCheck
+    @property
+    def maxCycles(self):
+        """The default maximum number of times the job is run (including
+           the first run)"""
+        return self.__maxCycles
+    @property
+    def hasStaging(self):
+        """Does the code declare any files to stage?"""
+        return (len(self.__stageInputArgs) + len(self.__stageOutputArgs) + \
+                len(self.__stageInputFiles) + len(self.__stageOutputFiles)) > 0
 
     # Methods ==============================================================
     def readConfig(self, fileName):
@@ -112,10 +244,10 @@ class BoltCode(object):
         Arguments:
            str  fileName  - The file to read the code configuration from
         """
-        import ConfigParser
+        import configparser
 
         # Set up the config for this object
-        codeConfig = ConfigParser.SafeConfigParser()
+        codeConfig = configparser.ConfigParser(inline_comment_prefixes=(";",))
         codeConfig.read(fileName)
 
         # Get the boltbatch information options
@@ -135,10 +267,92 @@ class BoltCode(object):
         self.__preamble = codeConfig.get("script commands", "preamble")
         self.__postamble = codeConfig.get("script commands", "postamble")
 
+        # The performance profile is optional
+        self.__bound = boltconfig.getOptional(codeConfig, "performance profile", "bound", None)
+        if self.__bound not in (None, "memory", "compute"):
+            bolterror.handleError("Unknown bound ({0}) in performance profile for code {1}. Use 'memory' or 'compute'.".format(self.__bound, self.__name))
+        self.__tasksPerDie = boltconfig.getOptionalInt(codeConfig, "performance profile", "tasks per die")
+        self.__threadsPerTask = boltconfig.getOptionalInt(codeConfig, "performance profile", "threads per task")
+        self.__memoryPerTask = boltconfig.getOptionalFloat(codeConfig, "performance profile", "memory per task")
+        self.__scalingCeiling = boltconfig.getOptionalInt(codeConfig, "performance profile", "scaling ceiling")
+        self.__reservedCores = boltconfig.getOptional(codeConfig, "performance profile", "reserved cores", None)
+        if self.__reservedCores is not None: boltcorespec.parseSpec(self.__reservedCores)
+
+        # The data staging is optional
+        self.__stageInputArgs = self.__readArgIndices(codeConfig, "input arguments")
+        self.__stageOutputArgs = self.__readArgIndices(codeConfig, "output arguments")
+        self.__stageInputFiles = boltconfig.getOptional(codeConfig, "data staging", "input files").split()
+        self.__stageOutputFiles = boltconfig.getOptional(codeConfig, "data staging", "output files").split()
+        self.__stageTier = boltconfig.getOptional(codeConfig, "data staging", "storage tier", None)
+
+        # The output description is optional
+        self.__outputDir = boltconfig.getOptional(codeConfig, "output", "output directory", None)
+        self.__outputSize = boltconfig.getOptionalFloat(codeConfig, "output", "expected output size")
+        self.__outputPattern = boltconfig.getOptional(codeConfig, "output", "output pattern", "shared")
+        if self.__outputPattern not in ("shared", "per process"):
+            bolterror.handleError("Unknown output pattern ({0}) for code {1}. Use 'shared' or 'per process'.".format(self.__outputPattern, self.__name))
+
+        # Checkpoint and restart is optional
+        self.__checkpointSignal = boltconfig.getOptional(codeConfig, "checkpointing", "checkpoint signal", None)
+        self.__signalLeadTime = boltconfig.getOptionalInt(codeConfig, "checkpointing", "signal lead time", 300)
+        self.__restartFormat = boltconfig.getOptional(codeConfig, "checkpointing", "restart argument format", self.__argFormat)
+        self.__completionCheck = boltconfig.getOptional(codeConfig, "checkpointing", "completion check", None)
+        self.__maxCycles = boltconfig.getOptionalInt(codeConfig, "checkpointing", "maximum cycles", 10)
+        if self.__checkpointSignal is not None:
+            # Signals are used without the SIG prefix (e.g. USR1)
+            self.__checkpointSignal = self.__checkpointSignal.upper()
+            if self.__checkpointSignal.startswith("SIG"): self.__checkpointSignal = self.__checkpointSignal[3:]
+
+    def __readArgIndices(self, codeConfig, option):
+        """Read a list of argument indices from the data staging section"""
+        indices = []
+        for item in boltconfig.getOptional(codeConfig, "data staging", option).replace(",", " ").split():
+            if (not item.isdigit()) or (int(item) >= self.__nargs):
+                bolterror.handleError("Invalid argument index ({0}) in '{1}' for code {2}. Arguments are numbered from 0 to {3}.".format(item, option, self.__name, self.__nargs - 1))
+            indices.append(int(item))
+        return indices
+
+    def preferredTasksPerNode(self, resource, threads):
+        """Return the number of parallel tasks per node preferred by the
+           performance profile of the code. Memory-bound codes with no
+           preferred number of tasks per die leave half of each die empty
+           to keep the memory bandwidth per task. If the memory per task
+           is known the tasks must also fit in the node memory.
+
+           Arguments:
+              BoltResource resource - The resource the job will run on
+              int          threads  - The number of threads per task
+
+           Returns:
+              int  tasks  - Tasks per node (0 if no preference)
+        """
+        dies = resource.socketsPerNode * resource.diesPerSocket
+        tasks = 0
+        tasksPerDie = self.tasksPerDie
+        if (tasksPerDie == 0) and self.memoryBound:
+            tasksPerDie = max(1, resource.coresPerDie // (2 * threads))
+        if tasksPerDie > 0:
+            tasks = min(tasksPerDie, max(1, resource.coresPerDie // threads)) * dies
+        if (self.memoryPerTask > 0) and (resource.memoryPerNode > 0):
+            memoryTasks = int(resource.memoryPerNode // self.memoryPerTask)
+            if memoryTasks < 1:
+                bolterror.handleError("Memory per task for code {0} ({1} GB) is more than the memory per node on resource {2} ({3} GB).".format(self.name, self.memoryPerTask, resource.name, resource.memoryPerNode))
+            if tasks == 0: tasks = max(1, resource.numCoresPerNode() // threads)
+            tasks = min(tasks, memoryTasks)
+        return tasks
+
     def summaryString(self):
         """Return a string summarising the code.
 
            Return:
               str  output  - The string summarising the code
         """
-        return "*{0}*\n\n{1}\n\n{2}".format(self.name,self.desc,self.message)
+        output = "*{0}*\n\n{1}\n\n{2}".format(self.name,self.desc,self.message)
+        profile = []
+        if self.bound is not None: profile.append("{0}-bound".format(self.bound))
+        if self.tasksPerDie > 0: profile.append("{0} tasks per die".format(self.tasksPerDie))
+        if self.threadsPerTask > 0: profile.append("{0} threads per task".format(self.threadsPerTask))
+        if self.memoryPerTask > 0: profile.append("{0} GB per task".format(self.memoryPerTask))
+        if self.scalingCeiling > 0: profile.append("scales to {0} tasks".format(self.scalingCeiling))
+        if len(profile) > 0: output += "\n\nProfile: " + ", ".join(profile)
+        return output
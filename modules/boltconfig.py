@@ -0,0 +1,65 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+Module for reading optional configuration options.
+
+Options added to the configuration files after the first release
+are optional so that existing configuration files still work. A
+missing or blank option takes the default value.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import bolterror
+
+def getOptional(config, section, option, default=""):
+    """Read an optional string option.
+
+       Arguments:
+          ConfigParser config  - The configuration to read from
+          str          section - The section name
+          str          option  - The option name
+          str          default - Value if the option is missing or blank
+    """
+    value = config.get(section, option, fallback="").strip()
+    if value == "": return default
+    return value
+
+def getOptionalInt(config, section, option, default=0):
+    """Read an optional integer option."""
+    return _convert(config, section, option, default, int, "an integer")
+
+def getOptionalFloat(config, section, option, default=0.0):
+    """Read an optional floating point option."""
+    return _convert(config, section, option, default, float, "a number")
+
+def getOptionalBoolean(config, section, option, default=False):
+    """Read an optional boolean option (yes/no, true/false, on/off, 1/0)."""
+    value = getOptional(config, section, option)
+    if value == "": return default
+    if value.lower() in ("yes", "true", "on", "1"): return True
+    if value.lower() in ("no", "false", "off", "0"): return False
+    bolterror.handleError("Option '{0}' in section [{1}] must be yes or no, not '{2}'.".format(option, section, value))
+
+def _convert(config, section, option, default, convert, description):
+    value = getOptional(config, section, option)
+    if value == "": return default
+    try:
+        return convert(value)
+    except ValueError:
+        bolterror.handleError("Option '{0}' in section [{1}] must be {2}, not '{3}'.".format(option, section, description, value))
@@ -0,0 +1,160 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent the cores reserved on the nodes of a job
+
+This class is part of the bolt job submission script generation
+tool. Cores can be kept free of tasks on each node (or each die) to
+absorb operating system noise or to run asynchronous MPI progress and
+I/O helper threads. The reserved cores are taken from the dies with
+the most cores left idle by the tasks, so that the tasks are not
+crowded onto fewer dies. They are left free either by binding the
+tasks to the other cores or with the core specialisation option of
+the batch system.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import re
+import bolterror
+
+def parseSpec(spec):
+    """Read a core reservation: a number of cores per node ('2') or per
+       die ('1/die').
+
+       Returns:
+          tuple reservation  - (cores, perDie)
+    """
+    match = re.search(r"^\s*([0-9]+)\s*(?:/\s*(node|die))?\s*$", str(spec))
+    if match is None:
+        bolterror.handleError("Reserved cores ({0}) must be a number of cores per node, or per die as '<n>/die'.".format(spec))
+    return int(match.group(1)), match.group(2) == "die"
+
+class BoltCoreSpec(object):
+    """This class represents the cores reserved on each node of a job."""
+    def __init__(self, spec):
+        """Read the reservation.
+
+           Arguments:
+              str  spec  - Cores per node ('2') or per die ('1/die')
+        """
+        self.__cores, self.__perDie = parseSpec(spec)
+
+    # Properties ==============================================================
+    @property
+    def cores(self):
+        """The number of cores reserved on each node or die"""
+        return self.__cores
+    @property
+    def perDie(self):
+        """Are the cores reserved on each die (rather than each node)?"""
+        return self.__perDie
+
+    # Methods ==============================================================
+    def reservedPerNode(self, resource):
+        """The number of cores reserved on each node"""
+        if self.__perDie: return self.__cores * resource.socketsPerNode * resource.diesPerSocket
+        return self.__cores
+
+    def availableCores(self, resource):
+        """The number of physical cores per node left for tasks"""
+        return max(0, resource.numCoresPerNode() - self.reservedPerNode(resource))
+
+    def availableLogicalCores(self, resource):
+        """The number of logical cores (hyperthreads) per node left for
+        tasks. All the hyperthreads of a reserved core are reserved."""
+        return self.availableCores(resource) * max(1, resource.threadsPerCore)
+
+    def reservedPlan(self, resource, tasksPerNode, threads):
+        """The number of cores reserved on each die of a node. Cores
+           reserved per node go, one at a time, to the die with the most
+           cores left idle by the tasks (the last such die on a tie,
+           where core specialisation also takes them).
+
+           Arguments:
+              BoltResource resource     - The resource the job runs on
+              int          tasksPerNode - Tasks on each node
+              int          threads      - Threads per task
+
+           Returns:
+              list reserved  - Cores reserved on each die
+        """
+        dies = resource.socketsPerNode * resource.diesPerSocket
+        if self.__perDie: return [min(self.__cores, resource.coresPerDie)] * dies
+        # Tasks spread evenly over the dies, the first dies taking any
+        # extra tasks
+        spare = []
+        for die in range(dies):
+            tasks = tasksPerNode // dies
+            if die < tasksPerNode % dies: tasks += 1
+            spare.append(resource.coresPerDie - tasks * threads)
+        reserved = [0] * dies
+        for core in range(min(self.__cores, resource.numCoresPerNode())):
+            die = max(range(dies), key=lambda d: (spare[d], d))
+            reserved[die] += 1
+            spare[die] -= 1
+        return reserved
+
+    def taskCores(self, resource, tasksPerNode, threads):
+        """The cores each task on a node is bound to, leaving the reserved
+           cores (the last cores of each die) free. Tasks are placed in
+           blocks on each die, balanced between the dies. Cores are
+           numbered die by die.
+
+           Returns:
+              list cores  - List of the cores of each task (None if the
+                            tasks do not fit on the physical cores)
+        """
+        dies = resource.socketsPerNode * resource.diesPerSocket
+        reserved = self.reservedPlan(resource, tasksPerNode, threads)
+        capacity = [(resource.coresPerDie - reserved[d]) // threads for d in range(dies)]
+        if sum(capacity) < tasksPerNode: return None
+        counts = [0] * dies
+        for task in range(tasksPerNode):
+            die = min([d for d in range(dies) if counts[d] < capacity[d]], key=lambda d: (counts[d], d))
+            counts[die] += 1
+        cores = []
+        for die in range(dies):
+            first = die * resource.coresPerDie
+            for task in range(counts[die]):
+                cores.append(list(range(first + task * threads, first + (task + 1) * threads)))
+        return cores
+
+    def bindingOption(self, resource, tasksPerNode, threads):
+        """The option to the parallel job launcher that binds the tasks to
+           the cores that are not reserved: a map of one core per task
+           ('cpu map option') for single threaded tasks, otherwise a mask
+           of the cores of each task ('cpu mask option').
+
+           Returns:
+              str  option  - The option (None if the launcher cannot bind
+                             the tasks or they do not fit)
+        """
+        cores = self.taskCores(resource, tasksPerNode, threads)
+        if cores is None: return None
+        if (threads == 1) and (resource.cpuMapOption is not None):
+            return resource.cpuMapOption + ",".join([str(c[0]) for c in cores])
+        if resource.cpuMaskOption is not None:
+            return resource.cpuMaskOption + ",".join([hex(sum([1 << core for core in c])) for c in cores])
+        return None
+
+    def summaryString(self, resource):
+        """Return a string describing the reservation"""
+        if self.__perDie:
+            return "{0} cores per die ({1} per node)".format(self.__cores, self.reservedPerNode(resource))
+        return "{0} cores per node".format(self.__cores)
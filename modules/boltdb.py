@@ -0,0 +1,231 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent the database of jobs generated by bolt
+
+This class is part of the bolt job submission script generation
+tool. Each job script bolt generates is added to an SQLite database
+in the bolt history directory with its resolved parameters (resource,
+batch system, code, nodes, tasks per node, threads, walltime and
+cost in node hours), the hash of the job, the script file, and the
+submit time and job ID if it was submitted. The table is indexed on
+(resource, code, nodes) so that queries such as all CP2K jobs on
+ARCHER2 above 16 nodes do not scan the table.
+
+The database uses write-ahead logging so that several bolt processes
+can add jobs at the same time, and rows are inserted in batches with
+one transaction per batch.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import os
+import sqlite3
+import time
+import bolterror
+
+# Version of the database schema (stored in user_version)
+SCHEMA_VERSION = 1
+
+# Columns of the jobs table and their types
+COLUMNS = [("created", "REAL"), ("resource", "TEXT"), ("batch", "TEXT"), ("code", "TEXT"),
+           ("parallel", "INTEGER"), ("tasks", "INTEGER"), ("nodes", "INTEGER"), ("tpn", "INTEGER"),
+           ("threads", "INTEGER"), ("stride", "INTEGER"), ("walltime", "REAL"), ("cost", "REAL"),
+           ("name", "TEXT"), ("tag", "TEXT"), ("key", "TEXT"), ("path", "TEXT"),
+           ("submitted", "REAL"), ("jobid", "TEXT")]
+COLUMN_NAMES = [c[0] for c in COLUMNS]
+
+# Comparisons allowed in query conditions
+OPERATORS = ("<=", ">=", "!=", "=", "<", ">")
+
+# Number of rows added before they are written
+BATCH_SIZE = 1000
+
+class BoltDatabase(object):
+    """This class represents the database of jobs generated by bolt."""
+    def __init__(self, fileName):
+        """Open (and create, if needed) the database.
+
+           Arguments:
+              str  fileName  - The database file
+        """
+        self.__fileName = os.path.expanduser(fileName)
+        self.__pending = []
+        try:
+            if not os.path.isdir(os.path.dirname(self.__fileName)):
+                os.makedirs(os.path.dirname(self.__fileName))
+            # Wait for other bolt processes rather than failing
+            self.__connection = sqlite3.connect(self.__fileName, timeout=30.0)
+            self.__connection.row_factory = sqlite3.Row
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            self.__connection.execute("PRAGMA synchronous=NORMAL")
+            self.__createSchema()
+        except (sqlite3.Error, OSError) as strerror:
+            bolterror.handleError("Opening job database: {0}; {1}".format(self.__fileName, strerror))
+
+    # Properties ==============================================================
+    @property
+    def fileName(self):
+        """The database file"""
+        return self.__fileName
+    @property
+    def pending(self):
+        """The number of rows added but not yet written"""
+        return len(self.__pending)
+
+    # Methods ==============================================================
+    def addJob(self, job, resource, batch, code=None, path=None, jobID=None, submitted=None):
+        """Add a generated job. Rows are written in batches: call flush
+           (or close) to write the remaining rows.
+
+           Arguments:
+              BoltJob      job       - The job
+              BoltResource resource  - The resource the job is for
+              BoltBatch    batch     - The batch system the job is for
+              BoltCode     code      - The code (None if no code specified)
+              str          path      - The job script (None if streamed)
+              str          jobID     - The job ID (None if not submitted)
+              float        submitted - The submit time (None if not submitted)
+        """
+        nodes = job.numNodes()
+        row = {"created": time.time(), "resource": resource.name, "batch": batch.name, "code": None,
+               "parallel": int(job.isParallel), "tasks": job.pTasks, "nodes": nodes, "tpn": job.pTasksPerNode,
+               "threads": job.threads, "stride": job.pStride, "walltime": job.wallTime, "cost": None,
+               "name": job.name, "tag": job.recordTag, "key": job.scriptKey, "path": None,
+               "submitted": submitted, "jobid": jobID}
+        if code is not None: row["code"] = code.name
+        if job.wallTime is not None: row["cost"] = nodes * job.wallTime
+        if path is not None: row["path"] = os.path.abspath(path)
+        self.addRow(row)
+
+    def addRow(self, row):
+        """Add a row given as a dictionary of column values (missing
+           columns are null)."""
+        self.__pending.append(tuple([row.get(name) for name in COLUMN_NAMES]))
+        if len(self.__pending) >= BATCH_SIZE: self.flush()
+
+    def flush(self):
+        """Write the pending rows in a single transaction."""
+        if len(self.__pending) == 0: return
+        sql = "INSERT INTO jobs ({0}) VALUES ({1})".format(", ".join(COLUMN_NAMES), ", ".join(["?"] * len(COLUMN_NAMES)))
+        try:
+            with self.__connection:
+                self.__connection.executemany(sql, self.__pending)
+        except sqlite3.Error as strerror:
+            bolterror.handleError("Writing to job database: {0}; {1}".format(self.__fileName, strerror))
+        self.__pending = []
+
+    def setJobID(self, key, jobID, submitted=None):
+        """Record the submission of the latest job with a hash.
+
+           Arguments:
+              str    key        - The hash of the job
+              str    jobID      - The job ID
+              float  submitted  - The submit time (default now)
+        """
+        self.flush()
+        if submitted is None: submitted = time.time()
+        try:
+            with self.__connection:
+                self.__connection.execute("UPDATE jobs SET jobid = ?, submitted = ? WHERE id = "
+                                          "(SELECT MAX(id) FROM jobs WHERE key = ?)", (jobID, submitted, key))
+        except sqlite3.Error as strerror:
+            bolterror.handleError("Writing to job database: {0}; {1}".format(self.__fileName, strerror))
+
+    def query(self, resourceName=None, codeName=None, tag=None, conditions=None, limit=None):
+        """Select jobs, newest last.
+
+           Arguments:
+              str  resourceName - Only jobs for this resource
+              str  codeName     - Only jobs for this code
+              str  tag          - Only jobs with this record tag
+              list conditions   - Conditions such as 'nodes>16' on the
+                                  columns of the table
+              int  limit        - Only the latest jobs
+
+           Returns:
+              list jobs         - List of dictionaries, one per job
+        """
+        self.flush()
+        where = []
+        values = []
+        if resourceName is not None: conditions = ["resource=" + resourceName] + (conditions or [])
+        if codeName is not None: conditions = ["code=" + codeName] + (conditions or [])
+        if tag is not None: conditions = ["tag=" + tag] + (conditions or [])
+        for condition in conditions or []:
+            column, operator, value = parseCondition(condition)
+            where.append("{0} {1} ?".format(column, operator))
+            values.append(value)
+        sql = "SELECT * FROM jobs"
+        if len(where) > 0: sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql = "SELECT * FROM ({0} DESC LIMIT {1:d}) ORDER BY id".format(sql, limit)
+        try:
+            return [dict(row) for row in self.__connection.execute(sql, values)]
+        except sqlite3.Error as strerror:
+            bolterror.handleError("Reading job database: {0}; {1}".format(self.__fileName, strerror))
+
+    def queryPlan(self, sql, values=()):
+        """The SQLite query plan for a statement (used to check that
+           queries use the indexes)."""
+        return " ".join([row[-1] for row in self.__connection.execute("EXPLAIN QUERY PLAN " + sql, values)])
+
+    def close(self):
+        """Write any pending rows and close the database."""
+        self.flush()
+        self.__connection.close()
+
+    def __createSchema(self):
+        version = self.__connection.execute("PRAGMA user_version").fetchone()[0]
+        if version == SCHEMA_VERSION: return
+        with self.__connection:
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, {0})".format(
+                                      ", ".join(["{0} {1}".format(name, kind) for name, kind in COLUMNS])))
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS jobs_shape ON jobs (resource, code, nodes)")
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key)")
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS jobs_jobid ON jobs (jobid)")
+            self.__connection.execute("CREATE INDEX IF NOT EXISTS jobs_tag ON jobs (tag)")
+            self.__connection.execute("PRAGMA user_version = {0:d}".format(SCHEMA_VERSION))
+
+def parseCondition(condition):
+    """Parse a query condition such as 'nodes>16' or 'code=CP2K'.
+
+       Returns:
+          str column   - The column
+          str operator - The comparison
+          value        - The value (a number for numeric columns)
+    """
+    for operator in OPERATORS:
+        column, sep, value = condition.partition(operator)
+        if sep == "": continue
+        column = column.strip()
+        if column not in COLUMN_NAMES:
+            bolterror.handleError("Unknown job database column: {0}. Columns are {1}.".format(column, ", ".join(COLUMN_NAMES)))
+        value = value.strip()
+        if dict(COLUMNS)[column] in ("INTEGER", "REAL"):
+            try:
+                value = float(value)
+            except ValueError:
+                bolterror.handleError("Value of {0} must be a number, not '{1}'.".format(column, value))
+        return column, operator, value
+    bolterror.handleError("Could not parse condition '{0}': use <column><op><value>, e.g. 'nodes>16'.".format(condition))
+
+def databaseFileName(historyDir):
+    """The job database in a bolt history directory"""
+    return os.path.join(os.path.expanduser(historyDir), "jobs.db")
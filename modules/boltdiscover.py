@@ -0,0 +1,491 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent the hardware and scheduler layout of a
+resource discovered from the system
+
+This class is part of the bolt job submission script generation
+tool. The node geometry (sockets, NUMA regions, cores and hardware
+threads) is read from the output of 'lscpu', 'lscpu -p' or hwloc
+('lstopo --of xml') run on a compute node, and the number of nodes,
+memory and walltime limits from the node and partition (queue)
+listings of the batch system ('scontrol show node', 'scontrol show
+partition', 'pbsnodes -a' and 'qstat -Qf'). The output is read from
+text so that saved output can be used.
+
+The values use the names of the options of the resource
+configuration, so they can be compared with an existing resource and
+written into a copy of its configuration file. Values from the node
+topology take precedence over those from the batch system.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import re
+import shlex
+import xml.etree.ElementTree as ElementTree
+import bolterror
+import boltstatus
+
+# Options that can be discovered, with their configuration section
+SECTIONS = {"total nodes": "system info", "sockets per node": "node info", "dies per socket": "node info",
+            "cores per die": "node info", "threads per core": "node info", "memory per node": "node info",
+            "maximum job duration": "general parallel jobs"}
+
+# Fractional difference in memory per node that is not reported (the
+# batch system keeps some memory back for the operating system)
+MEMORY_TOLERANCE = 0.05
+
+# Rank of the sources: lower ranks take precedence
+TOPOLOGY = 0
+SCHEDULER = 1
+
+class BoltDiscovery(object):
+    """This class represents the layout of a resource discovered from
+    the output of system commands."""
+    def __init__(self, queueName=None):
+        """The default constructor.
+
+           Arguments:
+              str  queueName  - The queue (partition) whose nodes and
+                                limits are used (default the default
+                                partition, or all the nodes)
+        """
+        self.__queueName = queueName
+        self.__values = {}
+        self.__sources = {}
+        self.__ranks = {}
+        self.__coresPerNode = None
+        self.__notes = []
+
+    # Properties ==============================================================
+    @property
+    def queueName(self):
+        """The queue (partition) whose nodes and limits are used"""
+        return self.__queueName
+    @property
+    def values(self):
+        """The discovered values, keyed by resource configuration option"""
+        return self.__values
+    @property
+    def sources(self):
+        """The name of the output each value was read from"""
+        return self.__sources
+    @property
+    def coresPerNode(self):
+        """The number of cores per node reported by the batch system
+        (None if not known)"""
+        return self.__coresPerNode
+    @property
+    def notes(self):
+        """List of notes on the output read (e.g. sources that disagree
+        or nodes of a different shape)"""
+        return self.__notes
+
+    # Methods ==============================================================
+    def addOutput(self, text, name):
+        """Read the output of a topology or batch system command. The type
+           of output is found from its contents.
+
+           Arguments:
+              str  text  - The output
+              str  name  - Name of the output (e.g. the file), used in
+                           reports
+        """
+        kind = outputType(text)
+        if kind is None:
+            bolterror.handleError("Unknown output in {0}: expected lscpu, hwloc XML, scontrol show node/partition, pbsnodes or qstat -Qf output.".format(name))
+        if kind == "lscpu":
+            self.__setGeometry(parseLscpu(text), name)
+        elif kind == "lscpu parse":
+            self.__setGeometry(parseLscpuParse(text), name)
+        elif kind == "hwloc":
+            self.__setGeometry(parseHwloc(text, name), name)
+        elif kind in ("slurm nodes", "pbs nodes"):
+            if kind == "slurm nodes": nodes = parseSlurmNodes(text)
+            else: nodes = parsePbsNodes(text)
+            self.__setNodes(nodes, name)
+        else:
+            if kind == "slurm partitions": partitions = parseSlurmPartitions(text)
+            else: partitions = parsePbsQueues(text)
+            self.__setPartition(partitions, name)
+        return kind
+
+    def runCommands(self, batch):
+        """Run the discovery commands of a batch system and read their
+           output.
+
+           Arguments:
+              BoltBatch  batch  - The batch system
+
+           Returns:
+              int  count  - The number of commands run
+        """
+        count = 0
+        for command, description in ((batch.topologyCommand, "Topology"), (batch.nodeCommand, "Node"),
+                                     (batch.partitionCommand, "Partition")):
+            if command is None: continue
+            command = command.replace("{queue}", shlex.quote(self.__queueName or ""))
+            self.addOutput(boltstatus.runCommand(command, description), command.split()[0])
+            count += 1
+        return count
+
+    def differences(self, resource):
+        """Compare the discovered values with a resource.
+
+           Arguments:
+              BoltResource resource - The resource
+
+           Returns:
+              list differences  - List of (option, configured value,
+                                  discovered value, source)
+        """
+        configured = {"total nodes": resource.nodes, "sockets per node": resource.socketsPerNode,
+                      "dies per socket": resource.diesPerSocket, "cores per die": resource.coresPerDie,
+                      "threads per core": resource.threadsPerCore, "memory per node": resource.memoryPerNode,
+                      "maximum job duration": maxHours(resource.maxJobTime)}
+        differences = []
+        for option in sorted(self.__values, key=lambda o: list(SECTIONS).index(o)):
+            value = self.__values[option]
+            current = configured[option]
+            if option == "memory per node":
+                if (current > 0) and (abs(current - value) <= MEMORY_TOLERANCE * current): continue
+            elif current == value:
+                continue
+            if option == "memory per node":
+                if current == 0: current = "not set"
+                elif current == int(current): current = int(current)
+            differences.append((option, current, value, self.__sources[option]))
+        if (self.__coresPerNode is not None) and \
+           (self.__coresPerNode not in (resource.numCoresPerNode(), resource.numLogicalCoresPerNode())):
+            differences.append(("cores per node", resource.numCoresPerNode(), self.__coresPerNode,
+                                self.__sources["cores per node"]))
+        return differences
+
+    def updateConfig(self, text):
+        """Write the discovered values into the text of a resource
+           configuration file, keeping its comments. A walltime limit
+           that depends on the number of nodes is kept.
+
+           Arguments:
+              str  text  - The resource configuration
+
+           Returns:
+              str  text  - The updated configuration
+        """
+        for option in SECTIONS:
+            if option not in self.__values: continue
+            value = self.__values[option]
+            if option == "maximum job duration":
+                current = configValue(text, SECTIONS[option], option)
+                if (current is not None) and (":" in current):
+                    if maxHours(current) != value:
+                        self.__notes.append("Kept the walltime limits by number of nodes ({0}); the discovered limit is {1} hours.".format(current, value))
+                    continue
+            text = setConfigValue(text, SECTIONS[option], option, str(value))
+        return text
+
+    def __set(self, option, value, source, rank):
+        """Set a value unless a source of a lower rank has set it"""
+        if option in self.__values:
+            if self.__ranks[option] < rank: return
+            if (self.__ranks[option] == rank) and (self.__values[option] != value):
+                self.__notes.append("{0}: {1} from {2} but {3} from {4}; using {3}.".format(option, self.__values[option],
+                                    self.__sources[option], value, source))
+        self.__values[option] = value
+        self.__sources[option] = source
+        self.__ranks[option] = rank
+
+    def __setGeometry(self, geometry, source):
+        """Set the node geometry from a topology"""
+        for option in ("sockets per node", "dies per socket", "cores per die", "threads per core", "memory per node"):
+            if geometry.get(option) is not None:
+                self.__set(option, geometry[option], source, TOPOLOGY)
+
+    def __setNodes(self, nodes, source):
+        """Set the number of nodes, sockets, threads and memory from a
+           node listing. Only the nodes in the queue are used (all the
+           nodes if none are); nodes of the most common shape give the
+           values."""
+        if len(nodes) == 0:
+            bolterror.handleError("No nodes found in {0}.".format(source))
+        if self.__queueName is not None:
+            inQueue = [n for n in nodes if self.__queueName in n["queues"]]
+            if len(inQueue) > 0: nodes = inQueue
+        keys = ("sockets", "cores", "threads", "cpus", "memory")
+        shapes = {}
+        for node in nodes:
+            shape = tuple([node.get(k) for k in keys])
+            shapes[shape] = shapes.get(shape, 0) + 1
+        shape = max(sorted(shapes, key=str), key=lambda s: shapes[s])
+        if len(shapes) > 1:
+            self.__notes.append("{0} of {1} nodes in {2} have a different shape (the most common is used).".format(
+                                len(nodes) - shapes[shape], len(nodes), source))
+        node = dict(zip(keys, shape))
+        self.__set("total nodes", len(nodes), source, SCHEDULER)
+        # The batch system does not know the NUMA regions, so only the
+        # number of cores per node is checked
+        if (node["sockets"] is not None) and (node["cores"] is not None):
+            self.__set("sockets per node", node["sockets"], source, SCHEDULER)
+            self.__set("threads per core", node["threads"], source, SCHEDULER)
+            self.__coresPerNode = node["sockets"] * node["cores"]
+        else:
+            self.__coresPerNode = node["cpus"]
+        self.__sources["cores per node"] = source
+        if node["memory"] is not None:
+            self.__set("memory per node", node["memory"], source, SCHEDULER)
+
+    def __setPartition(self, partitions, source):
+        """Set the walltime limit (and number of nodes, if not known from
+           a node listing) from the queue, or the default queue"""
+        if len(partitions) == 0:
+            bolterror.handleError("No partitions or queues found in {0}.".format(source))
+        partition = None
+        if self.__queueName is not None:
+            partition = partitions.get(self.__queueName)
+            if partition is None:
+                self.__notes.append("Queue {0} not found in {1}.".format(self.__queueName, source))
+        if partition is None:
+            defaults = [p for p in partitions.values() if p.get("default")]
+            if len(defaults) == 0: return
+            partition = defaults[0]
+        if partition.get("hours") is not None:
+            self.__set("maximum job duration", partition["hours"], source, SCHEDULER)
+        if (partition.get("nodes") is not None) and ("total nodes" not in self.__values):
+            self.__set("total nodes", partition["nodes"], source, SCHEDULER)
+
+def summaryString(discovery, differences, resourceName):
+    """A report of the discovered values and where they differ from the
+       configuration of a resource"""
+    text = ""
+    for option in SECTIONS:
+        if option not in discovery.values: continue
+        text += "{0:22s} {1:>8}  ({2})\n".format(option + ":", discovery.values[option], discovery.sources[option])
+    if discovery.coresPerNode is not None:
+        text += "{0:22s} {1:>8}  ({2})\n".format("cores per node:", discovery.coresPerNode, discovery.sources["cores per node"])
+    for note in discovery.notes:
+        text += "Note: " + note + "\n"
+    if len(differences) == 0:
+        return text + "The configuration of {0} agrees with the system.\n".format(resourceName)
+    text += "The configuration of {0} differs from the system:\n".format(resourceName)
+    for option, current, value, source in differences:
+        text += "  {0}: configured {1}, discovered {2} ({3})\n".format(option, current, value, source)
+    return text
+
+def outputType(text):
+    """The type of a command output: lscpu, lscpu parse, hwloc, slurm
+       nodes, slurm partitions, pbs nodes or pbs queues (None if not
+       known)"""
+    if "<topology" in text: return "hwloc"
+    if re.search(r"^\s*NodeName=", text, re.MULTILINE): return "slurm nodes"
+    if re.search(r"^\s*PartitionName=", text, re.MULTILINE): return "slurm partitions"
+    if "resources_available.ncpus" in text: return "pbs nodes"
+    if re.search(r"^Queue: ", text, re.MULTILINE): return "pbs queues"
+    if re.search(r"^Socket\(s\):", text, re.MULTILINE): return "lscpu"
+    if re.search(r"^#\s*CPU,", text, re.MULTILINE): return "lscpu parse"
+    return None
+
+def geometryFromCounts(sockets, numa, cores, pus):
+    """The node geometry from the numbers of sockets, NUMA regions,
+       cores and hardware threads in a node"""
+    if (sockets < 1) or (cores < 1): return {}
+    dies = 1
+    if (numa >= sockets) and (numa % sockets == 0): dies = numa // sockets
+    return {"sockets per node": sockets, "dies per socket": dies, "cores per die": cores // (sockets * dies),
+            "threads per core": max(1, pus // cores)}
+
+def parseLscpu(text):
+    """The node geometry from 'lscpu' output"""
+    items = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(":")
+        if sep != "": items[key.strip()] = value.strip()
+    try:
+        sockets = int(items["Socket(s)"])
+        cores = sockets * int(items["Core(s) per socket"])
+        pus = cores * int(items["Thread(s) per core"])
+        numa = int(items.get("NUMA node(s)", "1"))
+    except (KeyError, ValueError):
+        bolterror.handleError("Cannot read the sockets, cores and threads from the lscpu output.")
+    return geometryFromCounts(sockets, numa, cores, pus)
+
+def parseLscpuParse(text):
+    """The node geometry from 'lscpu -p' output (one line per hardware
+       thread, with the columns named in the last comment line)"""
+    columns = []
+    rows = []
+    for line in text.splitlines():
+        if line.startswith("#"):
+            columns = [c.strip().lower() for c in line.lstrip("#").split(",")]
+        elif line.strip() != "":
+            rows.append(dict(zip(columns, line.split(","))))
+    if ("core" not in columns) or ("socket" not in columns):
+        bolterror.handleError("The lscpu output must have the Core and Socket columns ('lscpu -p').")
+    sockets = set([r["socket"] for r in rows])
+    cores = set([(r["socket"], r["core"]) for r in rows])
+    numa = set([(r["socket"], r.get("node", "")) for r in rows])
+    return geometryFromCounts(len(sockets), len(numa), len(cores), len(rows))
+
+def parseHwloc(text, name):
+    """The node geometry and memory from hwloc XML output"""
+    try:
+        root = ElementTree.fromstring(text)
+    except ElementTree.ParseError as strerror:
+        bolterror.handleError("Reading hwloc XML: {0}; {1}".format(name, strerror))
+    counts = {"Package": 0, "NUMANode": 0, "Core": 0, "PU": 0}
+    memory = 0
+    for item in root.iter("object"):
+        kind = item.get("type")
+        if kind in counts: counts[kind] += 1
+        if kind == "NUMANode": memory += int(item.get("local_memory", "0"))
+    geometry = geometryFromCounts(counts["Package"], counts["NUMANode"], counts["Core"], counts["PU"])
+    if memory > 0: geometry["memory per node"] = int(memory // 1024**3)
+    return geometry
+
+def keyValues(text, start):
+    """Split 'key=value key=value ...' output into records, each starting
+       at the key 'start'"""
+    records = []
+    for token in text.split():
+        key, sep, value = token.partition("=")
+        if sep == "": continue
+        if key == start: records.append({})
+        if len(records) > 0: records[-1][key] = value
+    return records
+
+def parseSlurmNodes(text):
+    """The nodes in 'scontrol show node' output"""
+    nodes = []
+    for record in keyValues(text, "NodeName"):
+        node = {"name": record["NodeName"], "queues": record.get("Partitions", "").split(","), "memory": None,
+                "sockets": None, "cores": None, "threads": None, "cpus": None}
+        for key, field in (("sockets", "Sockets"), ("cores", "CoresPerSocket"), ("threads", "ThreadsPerCore"),
+                           ("cpus", "CPUTot")):
+            if record.get(field, "").isdigit(): node[key] = int(record[field])
+        # RealMemory is in MB
+        if record.get("RealMemory", "").isdigit(): node["memory"] = int(record["RealMemory"]) // 1024
+        nodes.append(node)
+    return nodes
+
+def parseSlurmPartitions(text):
+    """The partitions in 'scontrol show partition' output, keyed by name.
+       Each has the walltime limit in hours, the number of nodes and
+       whether it is the default."""
+    partitions = {}
+    for record in keyValues(text, "PartitionName"):
+        partition = {"hours": slurmHours(record.get("MaxTime", "UNLIMITED")), "nodes": None,
+                     "default": record.get("Default", "NO") == "YES"}
+        if record.get("TotalNodes", "").isdigit(): partition["nodes"] = int(record["TotalNodes"])
+        partitions[record["PartitionName"]] = partition
+    return partitions
+
+def parsePbsNodes(text):
+    """The nodes in 'pbsnodes -a' output"""
+    nodes = []
+    for line in text.splitlines():
+        if line.strip() == "": continue
+        if not line[0].isspace():
+            nodes.append({"name": line.strip(), "queues": [], "memory": None, "sockets": None, "cores": None,
+                          "threads": None, "cpus": None})
+            continue
+        if len(nodes) == 0: continue
+        key, sep, value = line.partition("=")
+        key = key.strip()
+        value = value.strip()
+        if (key == "resources_available.ncpus") and value.isdigit(): nodes[-1]["cpus"] = int(value)
+        if key == "resources_available.mem": nodes[-1]["memory"] = pbsGigabytes(value)
+        if key == "resources_available.Qlist": nodes[-1]["queues"] = value.split(",")
+    return nodes
+
+def parsePbsQueues(text):
+    """The queues in 'qstat -Qf' output, keyed by name (as
+       parseSlurmPartitions)"""
+    queues = {}
+    queue = None
+    for line in text.splitlines():
+        if line.startswith("Queue: "):
+            queue = {"hours": None, "nodes": None, "default": False}
+            queues[line.split(":", 1)[1].strip()] = queue
+            continue
+        if queue is None: continue
+        key, sep, value = line.partition("=")
+        if key.strip() == "resources_max.walltime": queue["hours"] = slurmHours(value.strip())
+        if (key.strip() == "resources_max.nodect") and value.strip().isdigit(): queue["nodes"] = int(value)
+    return queues
+
+def slurmHours(value):
+    """Whole hours in a [d-]hh:mm:ss time limit (None if unlimited)"""
+    match = re.match(r"^(?:(\d+)-)?(\d+)(?::(\d+))?(?::(\d+))?$", value.strip())
+    if match is None: return None
+    days = int(match.group(1) or 0)
+    if (match.group(1) is not None) or (match.group(3) is not None):
+        hours = int(match.group(2))
+    else:
+        # A single number is minutes
+        hours = int(match.group(2)) // 60
+    return days * 24 + hours
+
+def pbsGigabytes(value):
+    """Whole gigabytes in a PBS memory size (e.g. 263168kb)"""
+    match = re.match(r"^(\d+)([kmgt]?)b?$", value.strip().lower())
+    if match is None: return None
+    scale = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}[match.group(2)]
+    return int(int(match.group(1)) * scale // 1024**3)
+
+def maxHours(maxJobTime):
+    """The longest walltime (hours) in a 'maximum job duration' value"""
+    if ":" not in maxJobTime: return int(maxJobTime)
+    return max([int(item.split(":")[1]) for item in maxJobTime.split(",")])
+
+def configValue(text, section, option):
+    """The value of an option in the text of a configuration file (None
+       if it is not set)"""
+    current = None
+    for line in text.splitlines():
+        header = re.match(r"^\[(.*)\]\s*$", line)
+        if header is not None:
+            current = header.group(1).strip().lower()
+            continue
+        match = re.match(r"^{0}\s*:(.*)$".format(re.escape(option)), line)
+        if (current == section) and (match is not None):
+            return match.group(1).split(";")[0].strip()
+    return None
+
+def setConfigValue(text, section, option, value):
+    """Set the value of an option in the text of a configuration file,
+       keeping the layout and any inline comment. Options that are not
+       set are added at the end of the section."""
+    lines = text.split("\n")
+    current = None
+    last = None
+    for i, line in enumerate(lines):
+        header = re.match(r"^\[(.*)\]\s*$", line)
+        if header is not None:
+            if current == section: break
+            current = header.group(1).strip().lower()
+            continue
+        if current != section: continue
+        match = re.match(r"^({0}\s*:\s*)([^;]*?)(\s*;.*)?$".format(re.escape(option)), line)
+        if match is not None:
+            lines[i] = match.group(1) + value + (match.group(3) or "")
+            return "\n".join(lines)
+        if (line.strip() != "") and (not line.startswith("#")): last = i
+    if last is None:
+        bolterror.handleError("Section [{0}] not found in the resource configuration.".format(section))
+    lines.insert(last + 1, "{0}: {1}".format(option, value))
+    return "\n".join(lines)
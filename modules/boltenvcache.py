@@ -0,0 +1,146 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent a cache of job environments
+
+This class is part of the bolt job submission script generation
+tool. The script preambles from the resource, batch system and code
+usually load modules, which reads many files from the shared
+filesystem at the start of every job. With the cache switched on, the
+first job to run a given preamble saves the environment variables and
+shell functions its module commands set (and the variables they unset)
+to a file in the bolt history directory; later jobs with the same
+preamble on the same resource source that file instead of running the
+module commands. The other preamble lines are always run. The file name
+contains a hash of the preamble text so that any change to the preamble
+uses a new cache file. If the cache file is missing, too old or cannot
+be sourced the module commands are run as normal.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import hashlib
+import os
+
+# Variables that belong to the working directory or the job and are never
+# saved to the cache (an extended regular expression)
+UNCACHED_VARIABLES = "PWD|OLDPWD|PBS_[A-Za-z0-9_]*|SLURM_[A-Za-z0-9_]*"
+
+def isModuleLine(line):
+    """Is a preamble line a module command (the commands that are cached)?"""
+    words = line.split()
+    return (len(words) > 0) and (words[0] in ("module", "ml"))
+
+class BoltEnvCache(object):
+    """This class represents the cache of job environments."""
+    def __init__(self, directory, lifetime=7):
+        """Setup the cache.
+
+           Arguments:
+              str  directory  - The directory to keep the cache files in
+              int  lifetime   - Days after which a cache file is refreshed
+        """
+        self.__directory = os.path.expanduser(directory)
+        self.__lifetime = lifetime
+
+    # Properties ==============================================================
+    @property
+    def directory(self):
+        """The directory the cache files are kept in"""
+        return self.__directory
+    @property
+    def lifetime(self):
+        """The number of days after which a cache file is refreshed"""
+        return self.__lifetime
+
+    # Methods ==============================================================
+    def fileName(self, resource, preamble):
+        """The cache file for a preamble on a resource. The name includes
+           a hash of the preamble text and the shell.
+
+           Arguments:
+              BoltResource resource - The resource the job is for
+              str          preamble - The combined preamble text
+        """
+        # The saved variables are in the syntax of the job script shell
+        key = hashlib.sha1((resource.name + "\n" + resource.shell + "\n" + preamble).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.__directory, "{0}.{1}.env".format(resource.name, key))
+
+    def preambleLines(self, resource, preamble):
+        """Wrap the module commands in the preamble with the commands that
+           use the cache. Each run of consecutive module commands has its
+           own cache file; the other preamble lines (such as changing to
+           the working directory) are always run.
+
+           Arguments:
+              BoltResource resource - The resource the job is for
+              str          preamble - The combined preamble text
+
+           Returns:
+              str  text  - The script lines (the preamble unchanged if the
+                           shell cannot use the cache)
+        """
+        if (preamble.strip() == "") or ("bash" not in resource.shell):
+            return preamble
+        text = ""
+        done = ""
+        block = []
+        for line in preamble.rstrip("\n").split("\n") + [None]:
+            if (line is not None) and isModuleLine(line):
+                block.append(line)
+                done += line + "\n"
+                continue
+            if len(block) > 0:
+                text += self.blockLines(self.fileName(resource, done), block)
+                block = []
+            if line is not None:
+                text += line + "\n"
+                done += line + "\n"
+        return text
+
+    def blockLines(self, cacheFile, commands):
+        """The script lines that load the environment set by a block of
+           module commands from a cache file, or run the commands and save
+           the environment they set. Variables of the working directory
+           and of the job are not saved.
+
+           Arguments:
+              str  cacheFile - The cache file for the block
+              list commands  - The module commands
+        """
+        text = "# Load the module environment from the cache if it is valid\n"
+        text += "BOLT_ENV_CACHE={0}\n".format(cacheFile)
+        text += "if [ -n \"$(find ${{BOLT_ENV_CACHE}} -mmin -{0} 2>/dev/null)\" ] && . ${{BOLT_ENV_CACHE}}; then\n".format(self.__lifetime * 24 * 60)
+        text += "    echo \"bolt: environment loaded from ${BOLT_ENV_CACHE}\"\n"
+        text += "else\n"
+        text += "    mkdir -p {0}\n".format(self.__directory)
+        text += "    export -p > ${BOLT_ENV_CACHE}.$$\n"
+        text += "    compgen -e | sort > ${BOLT_ENV_CACHE}.names.$$\n"
+        text += "    compgen -A function | sort > ${BOLT_ENV_CACHE}.functions.$$\n"
+        for line in commands:
+            text += "    {0}\n".format(line.strip())
+        text += "    # Save the variables and functions the commands set and unset the\n"
+        text += "    # variables they removed\n"
+        text += "    {\n"
+        text += "        export -p | grep -vxF -f ${{BOLT_ENV_CACHE}}.$$ | grep -vE '^(declare -x|export) ({0})(=|$)'\n".format(UNCACHED_VARIABLES)
+        text += "        compgen -e | sort | comm -23 ${{BOLT_ENV_CACHE}}.names.$$ - | grep -vE '^({0})$' | sed 's/^/unset /'\n".format(UNCACHED_VARIABLES)
+        text += "        for f in $(compgen -A function | sort | comm -13 ${BOLT_ENV_CACHE}.functions.$$ -); do declare -f $f; done\n"
+        text += "    } > ${BOLT_ENV_CACHE}.new.$$ && mv -f ${BOLT_ENV_CACHE}.new.$$ ${BOLT_ENV_CACHE}\n"
+        text += "    rm -f ${BOLT_ENV_CACHE}.$$ ${BOLT_ENV_CACHE}.names.$$ ${BOLT_ENV_CACHE}.functions.$$ ${BOLT_ENV_CACHE}.new.$$\n"
+        text += "fi\n"
+        return text
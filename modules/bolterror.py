@@ -25,7 +25,37 @@ __author__ = "A. R. Turner, EPCC"
 
 from textwrap import fill
 import sys
+
+# List that errors and warnings are collected in instead of being
+# printed (None to print them)
+_collected = None
+
+class BoltError(Exception):
+    """Raised by handleError when messages are being collected"""
+    pass
+
+def collectMessages(messages):
+    """Collect errors and warnings instead of printing them. Errors
+       append ("error", message) and raise BoltError instead of exiting;
+       warnings append ("warning", message). Used to run the job checks
+       on many jobs without stopping at the first error.
+
+       Arguments:
+          list messages - The list to collect in (None to print again)
+
+       Returns:
+          list previous - The list that was being collected in, so that
+                          nested callers can restore it
+    """
+    global _collected
+    previous = _collected
+    _collected = messages
+    return previous
+
 def handleError(errMsg, errCode = 1):
+    if _collected is not None:
+        _collected.append(("error", errMsg.strip()))
+        raise BoltError(errMsg)
     printError(errMsg)
     sys.exit(errCode)
 
@@ -33,5 +63,8 @@ def printError(errMsg):
     sys.stderr.write(fill("**ERROR** " + errMsg) + "\n\n")
 
 def printWarning(warnMsg):
+    if _collected is not None:
+        _collected.append(("warning", warnMsg.strip()))
+        return
     sys.stderr.write(fill("++Warning++ " + warnMsg) + "\n")
 
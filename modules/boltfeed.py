@@ -0,0 +1,236 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent a drip-feed queue of job scripts
+
+This class is part of the bolt job submission script generation
+tool. Sites limit the number of jobs each user may have queued or
+running (e.g. MaxSubmitJobs in Slurm), so submitting a large campaign
+at once fails part way through. Job scripts are instead added to a
+local queue for the resource, which is kept in the bolt history
+directory. Each round lists the jobs of the user with one run of the
+queue command of the batch system, then submits pending scripts (in
+the order they were added) until the limits of the resource, in
+total and for each QoS, are reached. Rounds are repeated as jobs
+finish. The queue file is rewritten after each submission, so the
+submitter can be stopped and restarted at any time.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import fcntl
+import os
+import time
+import bolterror
+import boltcheck
+import boltstatus
+import boltsubmit
+
+# States of the scripts in the queue
+PENDING = "pending"
+SUBMITTED = "submitted"
+
+class BoltFeed(object):
+    """This class represents the drip-feed queue of a resource."""
+    def __init__(self, directory, resource, batch):
+        """Setup the queue.
+
+           Arguments:
+              str          directory - The bolt history directory
+              BoltResource resource  - The resource the jobs are for
+              BoltBatch    batch     - The batch system of the resource
+        """
+        self.__directory = os.path.join(os.path.expanduser(directory), "feed")
+        self.__resource = resource
+        self.__batch = batch
+        self.__entries = []
+
+    # Properties ==============================================================
+    @property
+    def fileName(self):
+        """The file the queue is kept in"""
+        return os.path.join(self.__directory, self.__resource.name + ".feed")
+    @property
+    def entries(self):
+        """List of scripts in the queue, in the order they were added.
+        Each is a dictionary with keys state, id (the job ID once
+        submitted), qos and script."""
+        return self.__entries
+    @property
+    def pending(self):
+        """List of the scripts that have not been submitted"""
+        return [e for e in self.__entries if e["state"] == PENDING]
+
+    # Methods ==============================================================
+    def add(self, fileNames):
+        """Add job scripts to the queue. The QoS (or, if there is no QoS
+           option, the queue) of each script is read from its batch
+           options. Scripts that are already pending are not added again.
+
+           Arguments:
+              list fileNames  - The job scripts
+
+           Returns:
+              int  added  - The number of scripts added
+        """
+        added = 0
+        with self.__lock():
+            self.read()
+            pending = set([e["script"] for e in self.pending])
+            for fileName in fileNames:
+                fileName = os.path.abspath(fileName)
+                if fileName in pending: continue
+                try:
+                    with open(fileName, "r", errors="replace") as scriptFile:
+                        text = scriptFile.read(boltcheck.MAX_READ)
+                except (IOError, OSError) as strerror:
+                    bolterror.handleError("Reading job script: {0}; {1}".format(fileName, strerror))
+                options = boltcheck.parseOptions(text, self.__batch)
+                qos = options.get("qos", options.get("queue", "-")) or "-"
+                self.__entries.append({"state": PENDING, "id": "-", "qos": qos, "script": fileName})
+                pending.add(fileName)
+                added += 1
+            self.write()
+        return added
+
+    def read(self):
+        """Read the queue from its file."""
+        self.__entries = []
+        if not os.path.isfile(self.fileName): return
+        with open(self.fileName, "r") as feedFile:
+            for line in feedFile:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 4: continue
+                self.__entries.append(dict(zip(("state", "id", "qos", "script"), fields)))
+
+    def write(self):
+        """Write the queue to its file (atomically, so a stopped submitter
+           never leaves a partial file)."""
+        tmpName = "{0}.{1}".format(self.fileName, os.getpid())
+        try:
+            os.makedirs(self.__directory, exist_ok=True)
+            with open(tmpName, "w") as feedFile:
+                for entry in self.__entries:
+                    feedFile.write("\t".join([entry["state"], entry["id"], entry["qos"], entry["script"]]) + "\n")
+            os.replace(tmpName, self.fileName)
+        except (IOError, OSError) as strerror:
+            bolterror.handleError("Writing drip-feed queue: {0}; {1}".format(self.fileName, strerror))
+
+    def submitRound(self, tracker=None):
+        """Submit pending scripts up to the queue limits of the resource.
+
+           Arguments:
+              BoltStatus tracker - Tracker the submitted jobs are added to
+
+           Returns:
+              list  submitted  - The entries submitted in this round
+        """
+        submitted = []
+        with self.__lock():
+            self.read()
+            if len(self.pending) == 0: return submitted
+            counts = {}
+            jobs = boltstatus.queuedJobs(self.__batch)
+            for job in jobs:
+                counts[job.get("qos", "-")] = counts.get(job.get("qos", "-"), 0) + 1
+            total = len(jobs)
+            for entry in self.pending:
+                if (self.__resource.maxQueuedJobs > 0) and (total >= self.__resource.maxQueuedJobs): break
+                limit = self.__resource.qosJobLimits.get(entry["qos"])
+                # Scripts for other QoS may still fit
+                if (limit is not None) and (counts.get(entry["qos"], 0) >= limit): continue
+                jobID = self.__submit(entry["script"])
+                if jobID is None: break
+                entry["state"] = SUBMITTED
+                entry["id"] = jobID
+                self.write()
+                submitted.append(entry)
+                total += 1
+                counts[entry["qos"]] = counts.get(entry["qos"], 0) + 1
+                if tracker is not None:
+                    tracker.addLine("time={0} id={1} resource={2} batch={3} script={4}".format(int(time.time()), jobID,
+                                    self.__resource.name, self.__batch.name, entry["script"]))
+        return submitted
+
+    def run(self, interval, tracker=None, report=None):
+        """Submit rounds until all the scripts have been submitted.
+
+           Arguments:
+              int        interval - Seconds between rounds
+              BoltStatus tracker  - Tracker the submitted jobs are added to
+              function   report   - Called with the entries submitted
+                                    after each round
+        """
+        while True:
+            submitted = self.submitRound(tracker)
+            if report is not None: report(submitted)
+            if len(self.pending) == 0: return
+            time.sleep(max(interval, 1))
+
+    def __submit(self, fileName):
+        """Submit a script. A submission the batch system rejects (e.g.
+           because a limit not known to bolt has been reached) ends the
+           round and the script stays pending.
+
+           Returns:
+              str  jobID  - The job ID (None if the submission failed)
+        """
+        messages = []
+        bolterror.collectMessages(messages)
+        try:
+            if self.__batch.restEndpoint is not None:
+                with open(fileName, "r") as scriptFile:
+                    return boltsubmit.submitRest(self.__batch, scriptFile.read())
+            return boltsubmit.jobID(boltsubmit.submitFile(self.__batch, fileName))
+        except bolterror.BoltError:
+            pass
+        except IOError as strerror:
+            messages.append(("error", str(strerror)))
+        finally:
+            bolterror.collectMessages(None)
+        bolterror.printWarning("Submitting {0} failed: {1}".format(fileName, "; ".join([m[1] for m in messages if m[0] == "error"])))
+        return None
+
+    def __lock(self):
+        """Lock the queue for the duration of a with block, so that
+           several bolt processes can use the queue."""
+        os.makedirs(self.__directory, exist_ok=True)
+        return _Lock(self.fileName + ".lock")
+
+class _Lock(object):
+    """An exclusive lock on a lock file (for use in a with statement)"""
+    def __init__(self, fileName):
+        self.__fileName = fileName
+        self.__file = None
+    def __enter__(self):
+        self.__file = open(self.__fileName, "w")
+        fcntl.flock(self.__file, fcntl.LOCK_EX)
+        return self
+    def __exit__(self, *args):
+        self.__file.close()
+        return False
+
+def summaryString(feed):
+    """The number of scripts pending and submitted in a queue"""
+    counts = {}
+    for entry in feed.pending:
+        counts[entry["qos"]] = counts.get(entry["qos"], 0) + 1
+    text = "{0}: {1} pending, {2} submitted".format(feed.fileName, len(feed.pending), len(feed.entries) - len(feed.pending))
+    if len(counts) > 0:
+        text += " (pending " + ", ".join(["{0} {1}".format(counts[q], q) for q in sorted(counts)]) + ")"
+    return text + "\n"
@@ -29,6 +29,7 @@ import re
 import math
 import bolterror
 import sys
+from boltscript import BoltScript
 
 class BoltJob(object):
     """This class represents a batch job."""
@@ -46,6 +47,8 @@ class BoltJob(object):
         self.__pTasksPerNode = 0
         self.__pTasksPerDie = 0
         self.__threads = 1
+        self.__stride = 0
+        self.__pStride = 1
         self.__runLine = None
         self.__pBatchOptions = None
         self.__batchOptions = None
@@ -56,6 +59,16 @@ class BoltJob(object):
         self.__parallelJobLauncher = None 
         self.__jobCommand = None
         self.__accountID = None
+        self.__records = None
+        self.__recordTag = None
+        self.__staging = None
+        self.__broadcast = None
+        self.__striping = None
+        self.__checkpoint = None
+        self.__envCache = None
+        self.__scriptKey = None
+        self.__networkGroups = None
+        self.__coreSpec = None
 
     #======================================================================
     # Properties getters and setters
@@ -253,6 +266,27 @@ class BoltJob(object):
             # Something elsethrow an bolterror
            bolterror.handleError("Non-numeric number of threads per task specified ({0}).\n".format(threads))
     @property
+    def stride(self):
+        """int The requested stride between parallel tasks (0 = chosen
+                  automatically)"""
+        return self.__stride
+    def setStride(self, stride):
+        """Set the stride between parallel tasks rather than computing it
+        from the resource. Checks that an integer stride is requested and
+        exits with an error if not.
+
+        Arguments:
+           int stride  The stride between parallel tasks.
+        """
+        if re.search("^[0-9]+$", str(stride)) is not None:
+            self.__stride = int(stride)
+        else:
+            bolterror.handleError("Non-numeric task stride specified ({0}).\n".format(stride))
+    @property
+    def pStride(self):
+        """int The stride between parallel tasks used for the job."""
+        return self.__pStride
+    @property
     def runLine(self):
         """str The command used to launch the application. For example,
                   'mpiexec'"""
@@ -262,7 +296,7 @@ class BoltJob(object):
         """str Any parallel batch options needed to run the job."""
         return self.__pBatchOptions
 
-    def setParallelDistribution(self, resource, batch):
+    def setParallelDistribution(self, resource, batch, code=None):
         """This method distributes the tasks optimally for the specified
            resource. If any errors are encountered then an error message
            is printed and the program stops.
@@ -276,6 +310,9 @@ class BoltJob(object):
                                   distribution
               Batch    batch      The batch system to use for the task
                                   distribution
+              Code     code       The code specified (None if no code
+                                  specified). Memory-bound codes have their
+                                  tasks spread evenly across the node.
         """
 
         # Make sure the job run line is empty
@@ -283,13 +320,19 @@ class BoltJob(object):
 
         # First compute all the values we might need
         # Number of nodes needed
-        nodesUsed = self.pTasks / self.pTasksPerNode
+        nodesUsed = self.pTasks // self.pTasksPerNode
         if (self.pTasks % self.pTasksPerNode) > 0:
             nodesUsed += 1
+        # Cores per die and node left for tasks
+        coresPerDie = resource.coresPerDie
+        coresPerNode = resource.numCoresPerNode()
+        if self.coreSpec is not None:
+            coresPerNode = self.coreSpec.availableCores(resource)
+            if self.coreSpec.perDie: coresPerDie = max(1, coresPerDie - self.coreSpec.cores)
         # Number of cores used per die
-        coresPerDieUsed = min(self.pTasksPerNode, resource.coresPerDie)
+        coresPerDieUsed = min(self.pTasksPerNode, coresPerDie)
         if (self.pTasksPerNode % (resource.diesPerSocket*resource.socketsPerNode)) == 0:
-            coresPerDieUsed = self.pTasksPerNode / (resource.socketsPerNode*resource.diesPerSocket)
+            coresPerDieUsed = self.pTasksPerNode // (resource.socketsPerNode*resource.diesPerSocket)
         else:
             # If we cannot divide this up then we just need to ignore this option
             coresPerDieUsed = 0
@@ -304,16 +347,24 @@ class BoltJob(object):
                 runLine = "setenv OMP_NUM_THREADS " + str(self.threads) + "\n"
             else:
                 runLine = "export OMP_NUM_THREADS=" + str(self.threads) + "\n"
+        elif (coresPerDieUsed == 0) and (code is not None) and code.memoryBound:
+            # Tasks cannot be divided evenly between dies so spread them
+            # as far apart as possible to share out the memory bandwidth
+            strideUsed = max(1, coresPerNode // self.pTasksPerNode)
         elif coresPerDieUsed == 0:
             # This is if we need to ignore the tasks per die option
-            if (resource.numCoresPerNode() / self.pTasksPerNode) > resource.preferredStride:
+            if (coresPerNode // self.pTasksPerNode) > resource.preferredStride:
                 strideUsed = min(self.pTasksPerNode, resource.preferredStride)
         elif (resource.useStrideOptionForUnderpop):
-            if ( ((resource.coresPerDie / coresPerDieUsed) > 1) 
-               and (( resource.coresPerDie % coresPerDieUsed ) == 0) ):
-                strideUsed = resource.coresPerDie / coresPerDieUsed
-        elif (resource.coresPerDie / coresPerDieUsed) >= resource.preferredStride:
+            if ( ((coresPerDie // coresPerDieUsed) > 1) 
+               and (( coresPerDie % coresPerDieUsed ) == 0) ):
+                strideUsed = coresPerDie // coresPerDieUsed
+        elif (coresPerDie // coresPerDieUsed) >= resource.preferredStride:
             strideUsed = min(coresPerDieUsed, resource.preferredStride)
+        # A requested stride overrides the computed one
+        if self.stride > 0:
+            strideUsed = self.stride
+        self.__pStride = strideUsed
             
         # Test to see if we have a parallel run command
         runCommand = self.parallelJobLauncher
@@ -372,6 +423,12 @@ class BoltJob(object):
             
             self.__runLine = runline
 
+        # Bind the tasks to leave the reserved cores free
+        coreBinding = None
+        if (self.coreSpec is not None) and useRunCommand and (batch.name != 'TorqueStokes'):
+            coreBinding = self.coreSpec.bindingOption(resource, self.pTasksPerNode, self.threads)
+            if coreBinding is not None: self.__runLine += " " + coreBinding
+
         #-------------------------------------------------------------------------------------------
         # Settings for using parallel boltbatch options
         # Most basic is just the parallel option and number of tasks/nodes. All jobs use this.
@@ -396,8 +453,34 @@ class BoltJob(object):
             pUnits = nodesUsed
         else:
             bolterror.handleError("Unit of resource: {0} is not defined (use 'tasks' or 'nodes') in resource configuration file for resource: {1}.\n".format(resource.parallelBatchUnit, resource.name))
+        # Chunked options (e.g. PBS Pro 'select') describe the tasks and
+        # threads on each node (or die) rather than a count
+        if batch.chunkFormat is not None:
+            chunks = []
+            for count, ncpus, mpiprocs in self.selectChunks(resource, coresPerDieUsed):
+                chunk = batch.chunkFormat.replace("{chunks}", str(count)).replace("{ncpus}", str(ncpus))
+                chunks.append(chunk.replace("{mpiprocs}", str(mpiprocs)).replace("{ompthreads}", str(self.threads)))
+            pUnits = "+".join(chunks)
         # Set the option
         pBatchOptions = "{0} {1}{2}\n".format(batch.optionID, option, pUnits)
+        if (batch.chunkFormat is not None) and (batch.placeOption is not None):
+            pBatchOptions += "{0} {1}{2}\n".format(batch.optionID, batch.placeOption, self.placement(resource, coresPerDieUsed))
+        # Keep large jobs within a few groups of the network
+        self.__networkGroups = self.networkGroups(resource, nodesUsed)
+        if (self.__networkGroups is not None) and (batch.switchesOption is not None):
+            groups, wait = self.__networkGroups
+            if wait is not None: groups = "{0}@{1}".format(groups, wait)
+            pBatchOptions += "{0} {1}{2}\n".format(batch.optionID, batch.switchesOption, groups)
+        # Otherwise ask the batch system to reserve the cores. It chooses
+        # which cores (Slurm takes the highest numbered, alternating between
+        # sockets), so cores cannot be reserved on each die.
+        if (self.coreSpec is not None) and (coreBinding is None) and (self.coreSpec.reservedPerNode(resource) > 0):
+            if self.coreSpec.perDie:
+                bolterror.handleError("Resource {0} cannot bind tasks to cores, so cores cannot be reserved on each die. Reserve {1} cores per node instead.".format(resource.name, self.coreSpec.reservedPerNode(resource)))
+            if batch.coreSpecOption is not None:
+                pBatchOptions += "{0} {1}{2}\n".format(batch.optionID, batch.coreSpecOption, self.coreSpec.reservedPerNode(resource))
+            else:
+                bolterror.printWarning("Resource {0} cannot bind tasks and batch system {1} has no core specialisation option: the reserved cores are only left free by the number of tasks per node.".format(resource.name, batch.name))
         # Additional options if we need them
         if resource.useBatchParallelOpts:
             # Can we control the number of tasks per node?
@@ -483,6 +566,217 @@ class BoltJob(object):
              str account  The account ID
         """
         self.__accountID = account
+    @property
+    def records(self):
+        """BoltRecords The run records the job appends to (None if the
+                  run is not recorded)"""
+        return self.__records
+    def setRecords(self, records):
+        """Record the runtime of the job when it runs.
+
+           Arguments:
+             BoltRecords records  The run records to append to
+        """
+        self.__records = records
+    @property
+    def recordTag(self):
+        """str A tag added to the run record to identify the run (None if
+                  no tag)"""
+        return self.__recordTag
+    def setRecordTag(self, tag):
+        """Set the tag added to the run record.
+
+           Arguments:
+             str tag  The tag (must not contain spaces)
+        """
+        if re.search("^[A-Za-z0-9_.:-]+$", str(tag)) is None:
+            bolterror.handleError("Record tag ({0}) may only contain letters, digits and '_.:-'.\n".format(tag))
+        self.__recordTag = tag
+    @property
+    def staging(self):
+        """BoltStaging The data staging for the job (None if the data
+                  is not staged)"""
+        return self.__staging
+    def setStaging(self, staging):
+        """Stage the job data to fast storage.
+
+           Arguments:
+             BoltStaging staging  The data staging for the job
+        """
+        self.__staging = staging
+    @property
+    def broadcast(self):
+        """BoltBroadcast The broadcast of the executable to the nodes
+                  (None if the executable is not broadcast)"""
+        return self.__broadcast
+    def setBroadcast(self, broadcast):
+        """Broadcast the executable (or container image) to the nodes
+           before the run and use the node-local copy in the job command.
+
+           Arguments:
+             BoltBroadcast broadcast  The broadcast for the job
+        """
+        self.__broadcast = broadcast
+        self.__jobCommand = broadcast.jobCommand
+    @property
+    def striping(self):
+        """BoltStriping The filesystem layout for the job output (None
+                  if the layout is not set)"""
+        return self.__striping
+    def setStriping(self, striping):
+        """Set the filesystem layout of the job output in the script.
+
+           Arguments:
+             BoltStriping striping  The layout for the job
+        """
+        self.__striping = striping
+    @property
+    def coreSpec(self):
+        """BoltCoreSpec The cores reserved on each node (None if none)"""
+        return self.__coreSpec
+    def setCoreSpec(self, coreSpec):
+        """Reserve cores on each node of the job.
+
+           Arguments:
+             BoltCoreSpec coreSpec  The reservation (None for none)
+        """
+        self.__coreSpec = coreSpec
+    @property
+    def checkpoint(self):
+        """BoltCheckpoint The checkpoint/resubmission loop for the job
+                  (None if the job is not resubmitted)"""
+        return self.__checkpoint
+    def setCheckpoint(self, checkpoint):
+        """Checkpoint the code before the walltime limit and resubmit
+           the job until the calculation is complete.
+
+           Arguments:
+             BoltCheckpoint checkpoint  The checkpointing for the job
+        """
+        self.__checkpoint = checkpoint
+    @property
+    def envCache(self):
+        """BoltEnvCache The cache used for the environment set by the
+                  script preambles (None if not cached)"""
+        return self.__envCache
+    def setEnvCache(self, envCache):
+        """Load the environment set by the script preambles from a cache.
+
+           Arguments:
+             BoltEnvCache envCache  The environment cache
+        """
+        self.__envCache = envCache
+    @property
+    def scriptKey(self):
+        """str The hash that identifies the job script, added to the run
+                  record (None if not computed)"""
+        return self.__scriptKey
+    def setScriptKey(self, key):
+        """Set the hash that identifies the job script.
+
+           Arguments:
+             str key  The hash from boltstore.jobKey
+        """
+        self.__scriptKey = key
+
+    def numNodes(self):
+        """Return the number of compute nodes needed for the job.
+
+           Returns:
+              int  nodes  - Number of nodes
+        """
+        if self.pTasksPerNode < 1: return 1
+        nodes = self.pTasks // self.pTasksPerNode
+        if (self.pTasks % self.pTasksPerNode) > 0:
+            nodes += 1
+        return max(nodes, 1)
+
+    def selectChunks(self, resource, coresPerDieUsed):
+        """Return the chunks of a chunked parallel option (e.g. PBS Pro
+           'select'): one chunk per node, or per die if the resource
+           allocates dies and the tasks divide evenly between them. A
+           partly filled last node (or die) is a chunk of its own.
+
+           Arguments:
+             Resource resource        The resource the job runs on
+             int      coresPerDieUsed Tasks per die (0 if uneven)
+
+           Returns:
+              list chunks  - (count, ncpus, mpiprocs) for each type of
+                             chunk
+        """
+        perChunk = self.pTasksPerNode
+        cores = resource.numCoresPerNode()
+        logicalCores = resource.numLogicalCoresPerNode()
+        if (resource.chunkUnit == "die") and (coresPerDieUsed > 0):
+            perChunk = coresPerDieUsed
+            dies = resource.socketsPerNode * resource.diesPerSocket
+            cores = cores // dies
+            logicalCores = logicalCores // dies
+        chunks = []
+        for count, mpiprocs in ((self.pTasks // perChunk, perChunk), (1, self.pTasks % perChunk)):
+            if (count == 0) or (mpiprocs == 0): continue
+            ncpus = mpiprocs * self.threads
+            # Exclusive jobs take all the cores (including hyperthreads
+            # if they are used)
+            if resource.nodeExclusive:
+                if ncpus <= cores:
+                    ncpus = cores
+                else:
+                    ncpus = logicalCores
+            chunks.append((count, ncpus, mpiprocs))
+        return chunks
+
+    def networkGroups(self, resource, nodes):
+        """Return the network topology constraint for the job from the
+           policy of the resource for its size. A job is never limited to
+           fewer groups than it needs.
+
+           Arguments:
+             Resource resource The resource the job runs on
+             int      nodes    The number of nodes the job uses
+
+           Returns:
+              tuple constraint  - (groups, wait) as Resource.networkPolicy
+                                  (None if there is no policy)
+        """
+        policy = resource.networkPolicy(nodes)
+        if policy is None: return None
+        groups, wait = policy
+        needed = (nodes + resource.nodesPerGroup - 1) // resource.nodesPerGroup
+        if groups < needed:
+            bolterror.printWarning("Job on {0} nodes needs {1} network {2}s: the policy of resource {3} allows {4}.".format(nodes, needed, resource.constraintLevel, resource.name, groups))
+            groups = needed
+        return (groups, wait)
+
+    def groupsUsedLines(self, resource):
+        """The script lines that report the network groups the job uses."""
+        if (not self.isParallel) or (resource.groupsUsedCommand is None) or (resource.nodesPerGroup == 0) or \
+           ("csh" in resource.shell):
+            return ""
+        command = resource.groupsUsedCommand.replace("{nodes}", str(resource.nodesPerGroup))
+        text = "# Report the network {0}s used\n".format(resource.constraintLevel)
+        if self.__networkGroups is not None:
+            text += "echo \"Network {0}s used: $({1}) (at most {2} requested)\"\n".format(resource.constraintLevel, command, self.__networkGroups[0])
+        else:
+            text += "echo \"Network {0}s used: $({1})\"\n".format(resource.constraintLevel, command)
+        return text
+
+    def placement(self, resource, coresPerDieUsed):
+        """Return the placement of the chunks of a chunked parallel option:
+           chunks on separate nodes ('scatter') or, for chunks per die, on
+           separate virtual nodes ('vscatter'), with the nodes exclusive to
+           the job if the resource has exclusive node access.
+
+           Arguments:
+             Resource resource        The resource the job runs on
+             int      coresPerDieUsed Tasks per die (0 if uneven)
+        """
+        if (resource.chunkUnit == "die") and (coresPerDieUsed > 0):
+            if resource.nodeExclusive: return "vscatter:exclhost"
+            return "vscatter:shared"
+        if resource.nodeExclusive: return "scatter:excl"
+        return "scatter:shared"
 
     #======================================================================
     # Verification methods check the consistency of the job
@@ -527,11 +821,13 @@ class BoltJob(object):
         coresPerNodeRequired = self.pTasksPerNode * self.threads
         if coresPerNodeRequired > resource.numLogicalCoresPerNode():
             bolterror.handleError("Number of cores per node required ({0}) is greater than number available for resource {1} ({2}). Reduce number of threads per task or tasks per node".format(coresPerNodeRequired, resource.name, resource.numCoresPerNode()))
+        if (self.coreSpec is not None) and (coresPerNodeRequired > self.coreSpec.availableLogicalCores(resource)):
+            bolterror.handleError("Number of cores per node required ({0}) is greater than number left for tasks on resource {1} with {2} reserved ({3}). Reduce number of threads per task or tasks per node".format(coresPerNodeRequired, resource.name, self.coreSpec.summaryString(resource), self.coreSpec.availableLogicalCores(resource)))
      
 
         # Check the total number of tasks
         # Number of nodes needed for this job
-        nodesUsed = self.pTasks / self.pTasksPerNode
+        nodesUsed = self.pTasks // self.pTasksPerNode
         if (self.pTasks % self.pTasksPerNode) > 0:
             nodesUsed += 1
         pUnits = nodesUsed * resource.numCoresPerNode()
@@ -548,6 +844,12 @@ class BoltJob(object):
             # Test the mimimum tasks
             if (code.minTasks > 0) and (pUnits < code.minTasks):
                 bolterror.handleError("Resources required ({0} cores) is less than minimum required for code {1} ({2}).".format(pUnits, code.name, code.minTasks))
+            # Test against the performance profile
+            if (code.scalingCeiling > 0) and (self.pTasks > code.scalingCeiling):
+                bolterror.printWarning("Number of parallel tasks ({0}) is beyond the scaling ceiling of code {1} ({2}). The job is unlikely to run faster than with {2} tasks.".format(self.pTasks, code.name, code.scalingCeiling))
+            if (code.memoryPerTask > 0) and (resource.memoryPerNode > 0) and \
+               (self.pTasksPerNode * code.memoryPerTask > resource.memoryPerNode):
+                bolterror.printWarning("Memory needed per node ({0} GB) by code {1} is more than available on resource {2} ({3} GB). Reduce the number of tasks per node.".format(self.pTasksPerNode * code.memoryPerTask, code.name, resource.name, resource.memoryPerNode))
 
     def checkTime(self, resource):
         """Check that the time requested is consistent with the selected
@@ -560,11 +862,8 @@ class BoltJob(object):
         """
 
         # Number of nodes needed for this job
-        nodesUsed = self.pTasks / self.pTasksPerNode
-        if self.isParallel:
-            sys.stdout.write(" ")
-        else:
-            sys.stdout.write(" ")
+        nodesUsed = self.pTasks // self.pTasksPerNode
+        if not self.isParallel:
             if self.wallTime > float(resource.maxSerialJobTime):bolterror.handleError("Requested walltime ({0} hours) longer than maximum allowed on resource {1} for this number of nodes ({2} hours).".format(self.wallTime, resource.name, resource.maxSerialJobTime))
 
         if (self.pTasks % self.pTasksPerNode) > 0:
@@ -582,65 +881,16 @@ class BoltJob(object):
            printed and the program exits.
 
            Arguments:
-              Batch    batch     Batch system to use
-              Resource resource  Resource to use
-              Code     code      Code to use
-              str      scriptFileThe name of the script file to write
+              Batch    batch      Batch system to use
+              Resource resource   Resource to use
+              Code     code       Code to use
+              file     scriptFile The script file to write to
         """
-
-        # Useful variables
-        batchPre = batch.optionID
-
         # Does the specified boltresource allow parallel jobs?
         if not resource.parallelJobs:
             bolterror.handleError("Resource: {0} does not support parallel jobs.".format(resource.name))
+        scriptFile.write(self.renderScript(batch, resource, code))
 
-        # The shell line
-        text = resource.shell + "\n"
-        scriptFile.write(text)
-       
-
-        # Information lines
-        scriptFile.write("#\n# Parallel script produced by bolt\n")
-        scriptFile.write("#        Resource: {0} ({1})\n".format(resource.name, resource.arch))
-        scriptFile.write("#    Batch system: {0}\n#\n".format(batch.name))
-        scriptFile.write("# bolt is written by EPCC (http://www.epcc.ed.ac.uk)\n#\n")
-        # Get the parallel boltbatch options
-        scriptFile.write(self.pBatchOptions)
-            
-        # Get the boltbatch options
-        text = batch.getOptionLines(True, self.name, self.queueName, self.qosName, \
-                                    self.getWallTime(resource), self.accountID)
-        scriptFile.write(text)
-
-        # Get any further options from boltresource configuration
-        scriptFile.write(self.jobOptions+"\n")
-
-        # Script preambles: boltresource -> boltbatch -> boltcode -> job
-        if self.parallelScriptPreamble != ("" or None):
-            scriptFile.write(self.parallelScriptPreamble + "\n")
-        if batch.parallelScriptPreamble != ("" or None):
-            scriptFile.write(batch.parallelScriptPreamble + "\n")
-        if code is not None:
-            if code.preamble is not None: scriptFile.write(code.preamble + "\n")
-#        if self.parallelScriptPreamble != ("" or None):
-#            scriptFile.write(self.parallelScriptPreamble + "\n")
-        # Parallel run line
-        scriptFile.write("# Run the parallel program\n")
-        if self.runLine is None:
-            scriptFile.write(self.jobCommand + "\n")
-        else:
-            scriptFile.write(self.runLine + " " + self.jobCommand + "\n")
-        # Script postambles: job -> boltcode -> boltbatch -> boltresource
-        if self.parallelScriptPostamble != ("" or None):
-            scriptFile.write(self.parallelScriptPostamble + "\n")
-        if code is not None:
-            if code.postamble is not None: scriptFile.write(code.postamble + "\n")
-        if batch.parallelScriptPostamble != ("" or None):
-            scriptFile.write(batch.parallelScriptPostamble + "\n")
-        if self.parallelScriptPostamble != ("" or None):
-            scriptFile.write(self.parallelScriptPostamble + "\n")
-        
     def writeSerialJob(self, batch, resource, code, scriptFile):
         """This function writes out a serial job script for the specified
            resource. If errors are encountered then an error message is
@@ -650,54 +900,102 @@ class BoltJob(object):
               Batch    batch      Batch system to use
               Resource resource   Resource to use
               Code     code       Code to use
-              str      scriptFile The name of the script file to write
+              file     scriptFile The script file to write to
         """
-
-        # Useful variables
-        batchPre = batch.optionID
-
         # Does the specified boltresource allow serial jobs?
         if not resource.serialJobs:
             bolterror.handleError("Resource: {0} does not support serial jobs.".format(resource.name))
+        scriptFile.write(self.renderScript(batch, resource, code))
 
-        # The shell line
-        text = resource.shell + "\n"
-        scriptFile.write(text)
+    def renderScript(self, batch, resource, code):
+        """Render the job script. This is the single path used to produce
+           job scripts, whether they are written to a file or not.
 
-        scriptFile.write("#\n# Serial script produced by bolt\n")
-        scriptFile.write("#        Resource: {0} ({1})\n".format(resource.name, resource.arch))
-        scriptFile.write("#    Batch system: {0}\n#\n".format(batch.name))
-        scriptFile.write("# bolt is written by EPCC (http://www.epcc.ed.ac.uk)\n#\n")
+           Arguments:
+              Batch    batch     Batch system to use
+              Resource resource  Resource to use
+              Code     code      Code to use (None if no code)
 
-        # Get the boltbatch options
-        text = batch.getOptionLines(False, self.name, self.queueName, \
-                                    self.getWallTime(resource), self.accountID)
-        scriptFile.write(text)
+           Returns:
+              str  text  - The job script
+        """
+        return self.buildScript(batch, resource, code).render()
 
-        # Get any further options from boltresource configuration
-        scriptFile.write(resource.serialJobOptions)
+    def buildScript(self, batch, resource, code):
+        """Build the model of the job script from the job settings and the
+           fragments contributed by the batch system, resource and code.
 
-        # Script preambles: boltresource -> boltbatch -> boltcode -> job
-        if resource.serialScriptPreamble != ("" or None):
-            scriptFile.write(resource.serialScriptPreamble + "\n")
-        if batch.parallelScriptPreamble != ("" or None):
-            scriptFile.write(batch.parallelScriptPreamble + "\n")
-        if code is not None:
-            if code.preamble is not None: scriptFile.write(code.postamble + "\n")
-        if self.parallelScriptPreamble != ("" or None):
-            scriptFile.write(self.parallelScriptPreamble + "\n")
+           Arguments:
+              Batch    batch     Batch system to use
+              Resource resource  Resource to use
+              Code     code      Code to use (None if no code)
 
-        # Serial run line
-        scriptFile.write("# Run the serial program\n")
-        scriptFile.write(self.jobCommand + "\n")
+           Returns:
+              BoltScript  script  - The job script
+        """
+        script = BoltScript(self.isParallel, resource.shell, resource.name, resource.arch, batch.name)
 
-        # Script postambles: job -> boltcode -> boltbatch -> boltresource
-        if self.parallelScriptPostamble != ("" or None):
-            scriptFile.write(self.paralleScriptPostamble + "\n")
-        if code is not None:
-            if code.postamble is not None: scriptFile.write(code.postamble + "\n")
-        if batch.parallelScriptPostamble != ("" or None):
-            scriptFile.write(batch.parallelScriptPostamble + "\n")
-        if resource.serialScriptPostamble != ("" or None):
-            scriptFile.write(resource.serialScriptPostamble + "\n")
-        
+        # Batch options
+        if self.isParallel:
+            script.append("batchOptions", self.pBatchOptions)
+        script.append("batchOptions", batch.getOptionLines(self.isParallel, self.name, self.queueName, \
+                                      self.qosName, self.getWallTime(resource), self.accountID))
+
+        # Any further options from boltresource configuration
+        if self.isParallel:
+            script.append("jobOptions", self.jobOptions)
+        else:
+            script.append("jobOptions", resource.serialJobOptions)
+        if self.staging is not None:
+            script.append("directives", self.staging.directives)
+        if self.checkpoint is not None:
+            script.append("directives", self.checkpoint.optionLines(batch))
+
+        # Script preambles: boltresource -> boltbatch -> boltcode
+        if self.isParallel:
+            preambles = [self.parallelScriptPreamble, batch.parallelScriptPreamble]
+        else:
+            preambles = [resource.serialScriptPreamble, batch.serialScriptPreamble]
+        if code is not None: preambles.append(code.preamble)
+        preamble = "".join([p + "\n" for p in preambles if (p is not None) and (p != "")])
+        if (self.envCache is not None) and (preamble != ""):
+            preamble = self.envCache.preambleLines(resource, preamble)
+        script.append("preamble", preamble)
+        if self.striping is not None:
+            script.append("setup", self.striping.preambleLines(resource))
+        script.append("setup", self.groupsUsedLines(resource))
+
+        # Run line
+        runLine = self.jobCommand
+        if self.isParallel and (self.runLine is not None):
+            runLine = self.runLine + " " + self.jobCommand
+        script.append("run", self.__runText(batch, resource, code, runLine))
+
+        # Script postambles: boltcode -> boltbatch -> boltresource
+        if code is not None: script.append("postamble", code.postamble)
+        if self.isParallel:
+            script.append("postamble", batch.parallelScriptPostamble)
+            script.append("postamble", self.parallelScriptPostamble)
+        else:
+            script.append("postamble", batch.serialScriptPostamble)
+            script.append("postamble", resource.serialScriptPostamble)
+        if self.checkpoint is not None:
+            script.append("resubmit", self.checkpoint.resubmitLines(batch, resource))
+        return script
+
+    def __runText(self, batch, resource, code, runLine):
+        """The run line, wrapped by the checkpointing, data staging and
+           run recording commands if they are switched on."""
+        if self.checkpoint is not None:
+            runLine = self.checkpoint.runLines(self, batch, resource, runLine)
+        stageIn = ""
+        stageOut = ""
+        # The broadcast is timed with the data staging
+        if self.broadcast is not None:
+            stageIn = self.broadcast.broadcastLines(self, resource)
+        if self.staging is not None:
+            stageIn += self.staging.stageInLines(self, resource)
+            stageOut = self.staging.stageOutLines(self, resource)
+        if self.records is None:
+            return stageIn + runLine + "\n" + stageOut
+        return self.records.recordLines(self, resource, code, runLine, stageIn, stageOut)
@@ -0,0 +1,365 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent a fitted performance model
+
+This class is part of the bolt job submission script generation
+tool. A model is fitted for a code on a resource from the run
+records written by bolt jobs. The runtime, T, on p cores is
+modelled as
+
+   T(p) = serial + parallel/p + communication*log2(p)
+
+i.e. an Amdahl-style serial fraction plus a communication term. The
+coefficients are fitted by least squares. The model keeps the sums
+needed for the normal equations so it can be refitted incrementally
+as new records arrive. Models are stored in files that use the
+[ConfigParser] module.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import math
+import os
+import bolterror
+
+# Number of terms in the model
+NTERMS = 3
+
+class BoltModel(object):
+    """This class represents a performance model for a code on a resource."""
+    def __init__(self, codeName=None, resourceName=None):
+        """The default constructor - setup an empty model.
+
+           Arguments:
+              str  codeName     - The code the model is for
+              str  resourceName - The resource the model is for
+        """
+        self.__codeName = codeName
+        self.__resourceName = resourceName
+
+        self.__recordsUsed = 0
+        self.__count = 0
+        self.__xtx = [[0.0]*NTERMS for i in range(NTERMS)]
+        self.__xty = [0.0]*NTERMS
+        self.__minCores = 0
+        self.__maxCores = 0
+
+        self.__coefficients = None
+
+        self.__safetyMargin = 0.2
+        self.__extrapolationLimit = 2.0
+
+    # Properties ==============================================================
+    @property
+    def codeName(self):
+        """The name of the code the model is for"""
+        return self.__codeName
+    @property
+    def resourceName(self):
+        """The name of the resource the model is for"""
+        return self.__resourceName
+    @property
+    def recordsUsed(self):
+        """The number of run records (for this code and resource) that
+        have been included in the fit"""
+        return self.__recordsUsed
+    @property
+    def count(self):
+        """The number of successful runs the model is fitted to"""
+        return self.__count
+    @property
+    def minCores(self):
+        """The smallest core count in the measured runs"""
+        return self.__minCores
+    @property
+    def maxCores(self):
+        """The largest core count in the measured runs"""
+        return self.__maxCores
+    @property
+    def coefficients(self):
+        """The fitted (serial, parallel, communication) coefficients in
+        seconds. None if the model has not been fitted."""
+        return self.__coefficients
+    @property
+    def serialFraction(self):
+        """The fitted serial fraction of the runtime on one core"""
+        if self.__coefficients is None: return None
+        serial, parallel, comm = self.__coefficients
+        if (serial + parallel) <= 0.0: return 0.0
+        return max(0.0, serial) / (serial + parallel)
+    @property
+    def safetyMargin(self):
+        """The fractional margin added to predictions when suggesting
+        a walltime"""
+        return self.__safetyMargin
+    @property
+    def extrapolationLimit(self):
+        """The factor beyond the measured core count range at which a
+        prediction is flagged as unreliable"""
+        return self.__extrapolationLimit
+
+    # Methods ==============================================================
+    def readConfig(self, fileName):
+        """Read the model from a file that uses the ConfigParser module.
+
+           Arguments:
+              str  fileName  - The file to read the model from
+        """
+        import configparser
+
+        modelConfig = configparser.ConfigParser(inline_comment_prefixes=(";",))
+        modelConfig.read(fileName)
+
+        self.__codeName = modelConfig.get("model info", "code")
+        self.__resourceName = modelConfig.get("model info", "resource")
+        self.__safetyMargin = modelConfig.getfloat("model info", "walltime safety margin", fallback=0.2)
+        self.__extrapolationLimit = modelConfig.getfloat("model info", "extrapolation limit", fallback=2.0)
+
+        self.__recordsUsed = modelConfig.getint("fit data", "records used")
+        self.__count = modelConfig.getint("fit data", "runs")
+        self.__minCores = modelConfig.getint("fit data", "minimum cores")
+        self.__maxCores = modelConfig.getint("fit data", "maximum cores")
+        values = [float(v) for v in modelConfig.get("fit data", "normal matrix").split(",")]
+        self.__xtx = [values[i*NTERMS:(i+1)*NTERMS] for i in range(NTERMS)]
+        self.__xty = [float(v) for v in modelConfig.get("fit data", "normal vector").split(",")]
+
+        self.fit()
+
+    def writeConfig(self, fileName):
+        """Write the model to a file that uses the ConfigParser module.
+
+           Arguments:
+              str  fileName  - The file to write the model to
+        """
+        import configparser
+
+        modelConfig = configparser.ConfigParser()
+        modelConfig.add_section("model info")
+        modelConfig.set("model info", "code", self.codeName)
+        modelConfig.set("model info", "resource", self.resourceName)
+        modelConfig.set("model info", "walltime safety margin", repr(self.safetyMargin))
+        modelConfig.set("model info", "extrapolation limit", repr(self.extrapolationLimit))
+
+        modelConfig.add_section("fit data")
+        modelConfig.set("fit data", "records used", str(self.recordsUsed))
+        modelConfig.set("fit data", "runs", str(self.count))
+        modelConfig.set("fit data", "minimum cores", str(self.minCores))
+        modelConfig.set("fit data", "maximum cores", str(self.maxCores))
+        modelConfig.set("fit data", "normal matrix", ",".join([repr(v) for row in self.__xtx for v in row]))
+        modelConfig.set("fit data", "normal vector", ",".join([repr(v) for v in self.__xty]))
+
+        if self.coefficients is not None:
+            modelConfig.add_section("coefficients")
+            modelConfig.set("coefficients", "serial", repr(self.coefficients[0]))
+            modelConfig.set("coefficients", "parallel", repr(self.coefficients[1]))
+            modelConfig.set("coefficients", "communication", repr(self.coefficients[2]))
+
+        try:
+            with open(fileName, "w") as modelFile:
+                modelFile.write("# Performance model written by bolt. The coefficients\n")
+                modelFile.write("# section is for information only: it is recomputed\n")
+                modelFile.write("# from the fit data when the model is read.\n")
+                modelConfig.write(modelFile)
+        except IOError as strerror:
+            bolterror.handleError("Writing performance model: {0}; {1}".format(fileName, strerror))
+
+    def update(self, records):
+        """Add any new run records to the fit. The records must be the
+           full list of records for this code and resource in the order
+           they were written; records already included are skipped.
+
+           Arguments:
+              list records  - Run records from BoltRecords.readRecords
+
+           Returns:
+              int  added    - The number of new records added
+        """
+        added = 0
+        for record in records[self.__recordsUsed:]:
+            self.__recordsUsed += 1
+            cores = record["tasks"] * record["threads"]
+            if (record["status"] != 0) or (record["runtime"] <= 0) or (cores < 1) or \
+               (record.get("checkpointed", "0") != "0"):
+                continue
+            x = features(cores)
+            for i in range(NTERMS):
+                for j in range(NTERMS):
+                    self.__xtx[i][j] += x[i] * x[j]
+                self.__xty[i] += x[i] * record["runtime"]
+            if self.__count == 0:
+                self.__minCores = cores
+                self.__maxCores = cores
+            else:
+                self.__minCores = min(self.__minCores, cores)
+                self.__maxCores = max(self.__maxCores, cores)
+            self.__count += 1
+            added += 1
+        if added > 0: self.fit()
+        return added
+
+    def fit(self):
+        """Solve the normal equations for the model coefficients. If the
+           measured runs do not cover enough core counts to determine all
+           the terms then the communication and then the serial terms are
+           dropped."""
+        self.__coefficients = None
+        if self.__count == 0: return
+        # Try the full model then progressively simpler ones
+        for terms in ((0, 1, 2), (0, 1), (1,)):
+            a = [[self.__xtx[i][j] for j in terms] for i in terms]
+            b = [self.__xty[i] for i in terms]
+            solution = solve(a, b)
+            if solution is not None:
+                self.__coefficients = [0.0]*NTERMS
+                for i, term in enumerate(terms):
+                    self.__coefficients[term] = solution[i]
+                return
+
+    def predict(self, cores):
+        """Predict the runtime of a job.
+
+           Arguments:
+              int    cores    - The number of cores (tasks * threads)
+
+           Returns:
+              float  runtime  - Predicted runtime in seconds (None if the
+                                model has not been fitted)
+        """
+        if self.__coefficients is None: return None
+        x = features(cores)
+        runtime = sum([x[i]*self.__coefficients[i] for i in range(NTERMS)])
+        # A poorly-conditioned fit can go negative far from the data
+        return max(runtime, 1.0)
+
+    def suggestWallTime(self, cores):
+        """Suggest a walltime for a job, including the safety margin.
+
+           Arguments:
+              int  cores    - The number of cores (tasks * threads)
+
+           Returns:
+              int  minutes  - The suggested walltime in whole minutes
+                              (None if no prediction)
+        """
+        runtime = self.predict(cores)
+        if runtime is None: return None
+        return int(math.ceil(runtime * (1.0 + self.safetyMargin) / 60.0))
+
+    def isExtrapolation(self, cores):
+        """Is the core count far outside the measured range?
+
+           Arguments:
+              int  cores  - The number of cores (tasks * threads)
+        """
+        if self.__count == 0: return True
+        return (cores * self.extrapolationLimit < self.minCores) or \
+               (cores > self.maxCores * self.extrapolationLimit)
+
+    def candidateShapes(self, job, resource, code):
+        """The predicted runtime and cost of the job and of shapes at
+           larger and smaller node counts that the resource and code
+           allow, fastest first.
+
+           Arguments:
+              BoltJob      job      - The job being set up
+              BoltResource resource - The selected resource
+              BoltCode     code     - The selected code
+
+           Returns:
+              list candidates  - (nodes, tasks, runtime, node hours) of
+                                 each shape (empty if none is allowed)
+        """
+        nodes = job.numNodes()
+        candidates = []
+        for n in (nodes // 4, nodes // 2, nodes, nodes * 2, nodes * 4):
+            if (n < 1) or (n > resource.nodes) or (n in [c[0] for c in candidates]): continue
+            tasks = n * job.pTasksPerNode
+            if n == nodes: tasks = job.pTasks
+            if n * resource.numCoresPerNode() > resource.maxTasks: continue
+            if (code.maxTasks > 0) and (n * resource.numCoresPerNode() > code.maxTasks): continue
+            runtime = self.predict(tasks * job.threads)
+            candidates.append((n, tasks, runtime, n * runtime / 3600.0))
+        candidates.sort(key=lambda c: c[2])
+        return candidates
+
+    def summaryString(self):
+        """Return a string summarising the model.
+
+           Return:
+              str  output  - The string summarising the model
+        """
+        if self.coefficients is None:
+            return "{0} on {1}: no successful runs recorded".format(self.codeName, self.resourceName)
+        serial, parallel, comm = self.coefficients
+        return "{0} on {1}: T(p) = {2:.1f} + {3:.1f}/p + {4:.2f}*log2(p) s " \
+               "(serial fraction {5:.4f}; {6} runs, {7}-{8} cores)".format(
+                   self.codeName, self.resourceName, serial, parallel, comm,
+                   self.serialFraction, self.count, self.minCores, self.maxCores)
+
+def modelFileName(historyDir, codeName, resourceName):
+    """The name of the file used to store the model for a code on a
+       resource. Models are fitted to the run records of each user, so
+       they are kept with the records in the bolt history directory.
+
+       Arguments:
+          str  historyDir    - The bolt history directory
+          str  codeName      - The name of the code
+          str  resourceName  - The name of the resource
+    """
+    return os.path.join(os.path.expanduser(historyDir), "models", "{0}.{1}.model".format(codeName, resourceName))
+
+def siteModelFileName(codeConfigDir, codeName, resourceName):
+    """The name of a model for a code on a resource installed with the
+       code configurations. Installed models are only read: they are
+       used when the user has no model of their own.
+
+       Arguments:
+          str  codeConfigDir - The code configuration directory
+          str  codeName      - The name of the code
+          str  resourceName  - The name of the resource
+    """
+    return os.path.join(codeConfigDir, "{0}.{1}.model".format(codeName, resourceName))
+
+def features(cores):
+    """The model terms evaluated for a core count"""
+    return [1.0, 1.0/cores, math.log(cores, 2)]
+
+def solve(a, b):
+    """Solve the linear system a.x = b by Gaussian elimination with
+       partial pivoting.
+
+       Returns:
+          list x  - The solution (None if the system is singular)
+    """
+    n = len(b)
+    m = [list(a[i]) + [b[i]] for i in range(n)]
+    scale = max([abs(v) for row in a for v in row] + [1.0])
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) <= 1.0e-12 * scale:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for row in range(col + 1, n):
+            factor = m[row][col] / m[col][col]
+            for k in range(col, n + 1):
+                m[row][k] -= factor * m[col][k]
+    x = [0.0]*n
+    for row in range(n - 1, -1, -1):
+        x[row] = (m[row][n] - sum([m[row][k]*x[k] for k in range(row + 1, n)])) / m[row][row]
+    return x
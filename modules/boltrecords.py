@@ -0,0 +1,166 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent the run records written by bolt jobs
+
+This class is part of the bolt job submission script generation
+tool. Job scripts produced with recording switched on append one
+line per run to a records file in the bolt history directory. Each
+line is a set of space-separated key=value pairs, for example:
+
+   time=1700000000 resource=ARCHER2 code=CP2K nodes=2 tasks=256 tpn=128 threads=1 stride=1 runtime=734 status=0
+
+Jobs that stage data also record the stage-in and stage-out times
+(stagein=, stageout=) in seconds. Jobs generated with the script
+store or '--skip-completed' record the hash of the job (key=).
+
+Unknown keys are kept so that the format can be extended.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import os
+import bolterror
+
+class BoltRecords(object):
+    """This class represents the run records in a bolt history directory."""
+    def __init__(self, directory):
+        """The default constructor.
+
+           Arguments:
+              str  directory  - The bolt history directory
+        """
+        self.__directory = os.path.expanduser(directory)
+
+    # Properties ==============================================================
+    @property
+    def directory(self):
+        """The bolt history directory"""
+        return self.__directory
+    @property
+    def fileName(self):
+        """The file that job scripts append run records to"""
+        return os.path.join(self.__directory, "records")
+
+    # Methods ==============================================================
+    def readRecords(self, resourceName=None, codeName=None):
+        """Read the run records, optionally selecting a single resource
+           and/or code.
+
+           Arguments:
+              str  resourceName - Only return records for this resource
+              str  codeName     - Only return records for this code
+
+           Returns:
+              list records      - List of dictionaries, one per run, in
+                                  the order they were written
+        """
+        records = []
+        if not os.path.isfile(self.fileName):
+            return records
+        with open(self.fileName, "r") as recordFile:
+            for line in recordFile:
+                record = parseRecord(line)
+                if record is None: continue
+                if (resourceName is not None) and (record.get("resource") != resourceName): continue
+                if (codeName is not None) and (record.get("code") != codeName): continue
+                records.append(record)
+        return records
+
+    def recordLines(self, job, resource, code, runLine, stageIn="", stageOut=""):
+        """Wrap the run line of a job script with the commands needed to
+           time the run and append a record to the records file. Data
+           staging is timed separately so that it does not distort the
+           recorded runtime.
+
+           Arguments:
+              BoltJob      job      - The job being written
+              BoltResource resource - The resource the job is for
+              BoltCode     code     - The code (None if no code specified)
+              str          runLine  - The complete run line for the job
+              str          stageIn  - Script lines that stage the input data
+              str          stageOut - Script lines that stage the output data
+
+           Returns:
+              str  text  - The script lines that run and record the job
+        """
+        codeName = "-"
+        if code is not None: codeName = code.name
+        fields = "time=${{BOLT_END}} resource={0} code={1} nodes={2} tasks={3} tpn={4} threads={5} stride={6}".format(
+                  resource.name, codeName, job.numNodes(), job.pTasks, job.pTasksPerNode, job.threads, job.pStride)
+        if job.recordTag is not None: fields += " tag=" + job.recordTag
+        if job.scriptKey is not None: fields += " key=" + job.scriptKey
+        # Runs stopped at a checkpoint do not give the full runtime
+        if job.checkpoint is not None: fields += " cycle=${BOLT_CYCLE} checkpointed=${BOLT_SIGNALLED}"
+        staged = (stageIn != "") or (stageOut != "")
+        if "csh" in resource.shell:
+            text = ""
+            if staged: text += "set BOLT_STAGE_START = `date +%s`\n" + stageIn
+            text += "set BOLT_START = `date +%s`\n"
+            text += runLine + "\n"
+            text += "set BOLT_STATUS = $status\n"
+            text += "set BOLT_END = `date +%s`\n"
+            if staged: text += stageOut + "set BOLT_STAGE_END = `date +%s`\n"
+            text += "@ BOLT_RUNTIME = $BOLT_END - $BOLT_START\n"
+            if staged:
+                text += "@ BOLT_STAGEIN = $BOLT_START - $BOLT_STAGE_START\n"
+                text += "@ BOLT_STAGEOUT = $BOLT_STAGE_END - $BOLT_END\n"
+                fields += " stagein=${BOLT_STAGEIN} stageout=${BOLT_STAGEOUT}"
+            text += "mkdir -p {0}\n".format(self.directory)
+            text += "echo \"{0} runtime=${{BOLT_RUNTIME}} status=${{BOLT_STATUS}}\" >> {1}\n".format(fields, self.fileName)
+        else:
+            text = ""
+            if staged: text += "BOLT_STAGE_START=$(date +%s)\n" + stageIn
+            text += "BOLT_START=$(date +%s)\n"
+            text += runLine + "\n"
+            text += "BOLT_STATUS=$?\n"
+            text += "BOLT_END=$(date +%s)\n"
+            if staged:
+                text += stageOut + "BOLT_STAGE_END=$(date +%s)\n"
+                fields += " stagein=$((BOLT_START - BOLT_STAGE_START)) stageout=$((BOLT_STAGE_END - BOLT_END))"
+            text += "mkdir -p {0}\n".format(self.directory)
+            text += "echo \"{0} runtime=$((BOLT_END - BOLT_START)) status=${{BOLT_STATUS}}\" >> {1}\n".format(fields, self.fileName)
+        return text
+
+def parseRecord(line):
+    """Parse a single record line.
+
+       Arguments:
+          str  line    - The line from the records file
+
+       Returns:
+          dict record  - The record values (None if the line is not a record)
+    """
+    record = {}
+    for item in line.split():
+        key, sep, value = item.partition("=")
+        if sep == "": return None
+        record[key] = value
+    if len(record) == 0: return None
+    for key in ("nodes", "tasks", "tpn", "threads", "stride", "runtime", "status", "stagein", "stageout"):
+        if key not in record:
+            # Records written before the stride was recorded and jobs
+            # that did not stage data
+            if key in ("stride", "stagein", "stageout"): continue
+            return None
+        try:
+            record[key] = int(record[key])
+        except ValueError:
+            bolterror.printWarning("Ignoring malformed run record: {0}".format(line.strip()))
+            return None
+    return record
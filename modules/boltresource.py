@@ -27,7 +27,21 @@ Note: then no checking for reasonable values is currently performed.
 """
 __author__ = "A. R. Turner, EPCC"
 
+import copy
+import re
 import sys
+import boltconfig
+import bolterror
+
+# Options of a [node class <name>] section and the attributes they set
+# (a blank option keeps the value of the default class)
+NODE_CLASS_OPTIONS = {"total nodes": ("nodes", int), "sockets per node": ("socketsPerNode", int),
+                      "dies per socket": ("diesPerSocket", int), "cores per die": ("coresPerDie", int),
+                      "threads per core": ("threadsPerCore", int), "accelerator type": ("accelerator", str),
+                      "memory per node": ("memoryPerNode", float), "charge rate": ("chargeRate", float),
+                      "maximum tasks": ("maxTasks", int), "maximum job duration": ("maxJobTime", str),
+                      "queue name": ("parallelQueue", str), "qos name": ("parallelQos", str),
+                      "additional job options": ("distribJobOptions", str)}
 
 class BoltResource(object):
     """This class represents an compute resource. Resources are currently
@@ -49,6 +63,13 @@ class BoltResource(object):
         self.__nodeExclusive = False
         self.__threadsPerCore = 0
         self.__accelerator = False
+        self.__memoryPerNode = 0.0
+        self.__chargeRate = 1.0
+
+        self.__nodeClass = None
+        self.__nodeClasses = []
+        self.__classSelection = "cost"
+        self.__classOptions = {}
 
         self.__parallelJobs = False
         self.__hybridJobs = False
@@ -66,6 +87,9 @@ class BoltResource(object):
         self.__taskStrideOption = None
         self.__parallelQueue = None
         self.__useBatchParallelOpts = False
+        self.__chunkUnit = "node"
+        self.__cpuMapOption = None
+        self.__cpuMaskOption = None
 
         self.__distribJobLauncher = None
         self.__distribJobOptions = None
@@ -92,6 +116,31 @@ class BoltResource(object):
         self.__serialScriptPreamble = None
         self.__serialScriptPostamble = None
 
+        self.__perNodeLauncher = None
+        self.__storageTiers = []
+
+        self.__broadcastCommand = None
+        self.__containerCommand = None
+        self.__broadcastDir = None
+        self.__broadcastLibDir = None
+        self.__broadcastMinNodes = 0
+        self.__containerExtensions = []
+
+        self.__storageTargets = 0
+        self.__maxStripeCount = 0
+        self.__stripeSize = None
+        self.__layoutCommand = None
+        self.__gbPerStripe = 0.0
+        self.__hintsVariable = None
+
+        self.__maxQueuedJobs = 0
+        self.__qosJobLimits = {}
+
+        self.__networkLevels = []
+        self.__constraintLevel = None
+        self.__networkPolicies = []
+        self.__groupsUsedCommand = None
+
     # Properties - getters and setters
     # System info
     @property
@@ -150,6 +199,56 @@ class BoltResource(object):
     def accelerator(self):
         """The type of accelerator (if any) on a compute node"""
         return self.__accelerator
+    @property
+    def memoryPerNode(self):
+        """The memory available to jobs on a compute node in GB (0 if
+        not specified)"""
+        return self.__memoryPerNode
+    @property
+    def chargeRate(self):
+        """The units charged for each node hour"""
+        return self.__chargeRate
+
+    # Node classes
+    @property
+    def nodeClass(self):
+        """The name of the node class described (None if the resource
+        has a single class of node)"""
+        return self.__nodeClass
+    @property
+    def nodeClasses(self):
+        """List of the names of the node classes, the default class
+        first (empty if the resource has a single class of node)"""
+        return self.__nodeClasses
+    @property
+    def classSelection(self):
+        """How a node class is chosen for a job: 'cost' (lowest charge)
+        or 'start' (earliest estimated start)"""
+        return self.__classSelection
+    def getNodeClass(self, name):
+        """Return the resource as seen by jobs on a node class: a copy
+        with the geometry, limits, queue and charge rate of the class.
+
+           Arguments:
+              str  name  - The name of the node class
+        """
+        if name not in self.__nodeClasses:
+            bolterror.handleError("Node class not found: {0}. Node classes of resource {1} are {2}.".format(name, self.__name, ", ".join(self.__nodeClasses)))
+        resource = copy.copy(self)
+        resource.__nodeClass = name
+        options = self.__classOptions.get(name, {})
+        for option in options:
+            attribute, convert = NODE_CLASS_OPTIONS[option]
+            setattr(resource, "_BoltResource__" + attribute, convert(options[option]))
+        if "qos name" in options: resource.__serialQos = resource.__parallelQos
+        if "queue name" in options: resource.__serialQueue = resource.__parallelQueue
+        if "additional job options" in options:
+            resource.__sharedJobOptions = resource.__distribJobOptions
+            resource.__hybridJobOptions = resource.__distribJobOptions
+        # The tasks are limited by the size of the class
+        if ("maximum tasks" not in options) and ("total nodes" in options):
+            resource.__maxTasks = min(self.__maxTasks, resource.numCoresPerNode() * resource.__nodes)
+        return resource
 
     # Parallel boltjob settings
     @property
@@ -242,6 +341,23 @@ class BoltResource(object):
         parallel tasks if the node is underpopulated."""
         return self.__useStrideOptionForUnderpop
     @property
+    def cpuMapOption(self):
+        """Option to the job launcher that binds each task to the core in
+        a comma-separated list (e.g. '--cpu-bind=map_cpu:' for srun). None
+        if not supported."""
+        return self.__cpuMapOption
+    @property
+    def cpuMaskOption(self):
+        """Option to the job launcher that binds each task to the cores in
+        a comma-separated list of hexadecimal masks (e.g.
+        '--cpu-bind=mask_cpu:' for srun). None if not supported."""
+        return self.__cpuMaskOption
+    @property
+    def chunkUnit(self):
+        """What each chunk of a chunked parallel option (e.g. PBS Pro
+        'select') describes: 'node' or 'die' (NUMA region)"""
+        return self.__chunkUnit
+    @property
     def taskPerDieOption(self):
         """Command-line option to job launcher command that sets the
         number of parallel tasks per die. If not set it indicates that the
@@ -362,6 +478,142 @@ class BoltResource(object):
            is finished"""
         return self.__serialScriptPostamble
 
+    # Data staging settings
+    @property
+    def perNodeLauncher(self):
+        """The command used to run one copy of a command on each node of
+        a job. '{nodes}' is replaced by the number of nodes."""
+        return self.__perNodeLauncher
+    @property
+    def storageTiers(self):
+        """The fast storage tiers available for staging data, in order
+        of preference. Each tier is a dictionary with keys: name, path
+        (may use variables set by the batch system), scope ('node' for
+        storage local to each node, 'shared' for storage shared by the
+        nodes of a job) and directives (extra script header lines)"""
+        return self.__storageTiers
+    def getStorageTier(self, name):
+        """Return the storage tier with the specified name (None if
+        there is no such tier)"""
+        for tier in self.__storageTiers:
+            if tier["name"] == name: return tier
+        return None
+
+    # Executable broadcast settings
+    @property
+    def broadcastCommand(self):
+        """The command that copies a file to every node of a job. '{source}'
+        and '{target}' are replaced by the file and the node-local copy.
+        None if broadcast is not available."""
+        return self.__broadcastCommand
+    @property
+    def containerCommand(self):
+        """The command used to broadcast container images (defaults to
+        the broadcast command)"""
+        return self.__containerCommand
+    @property
+    def broadcastDir(self):
+        """The node-local directory that files are broadcast to"""
+        return self.__broadcastDir
+    @property
+    def broadcastLibDir(self):
+        """The directory the broadcast command puts the shared libraries
+        of an executable in ('{target}' is replaced by the node-local
+        copy). None if libraries are not broadcast."""
+        return self.__broadcastLibDir
+    @property
+    def broadcastMinNodes(self):
+        """The number of nodes from which the executable is broadcast by
+        default (0 for never)"""
+        return self.__broadcastMinNodes
+    @property
+    def containerExtensions(self):
+        """File extensions of container images. Images in the job command
+        are broadcast instead of the executable."""
+        return self.__containerExtensions
+
+    # Parallel filesystem settings
+    @property
+    def storageTargets(self):
+        """The number of storage targets (e.g. Lustre OSTs) in the
+        parallel filesystem. 0 if not described."""
+        return self.__storageTargets
+    @property
+    def maxStripeCount(self):
+        """The largest stripe count allowed (0 for the number of storage
+        targets)"""
+        return self.__maxStripeCount
+    @property
+    def stripeSize(self):
+        """The stripe size to use (e.g. '1M')"""
+        return self.__stripeSize
+    @property
+    def layoutCommand(self):
+        """The command that sets the layout of a directory. '{count}',
+        '{size}' and '{directory}' are replaced. None if not available."""
+        return self.__layoutCommand
+    @property
+    def gbPerStripe(self):
+        """The amount of output (GB) that justifies each additional
+        stripe. 0 if the stripe count does not depend on output size."""
+        return self.__gbPerStripe
+    @property
+    def hintsVariable(self):
+        """The environment variable that names the MPI-IO hints file
+        (None to not write a hints file)"""
+        return self.__hintsVariable
+
+    # Queue limits
+    @property
+    def maxQueuedJobs(self):
+        """The largest number of jobs each user may have queued or running
+        (0 for no limit)"""
+        return self.__maxQueuedJobs
+    @property
+    def qosJobLimits(self):
+        """The largest number of jobs each user may have queued or running
+        in each QoS, keyed by QoS name"""
+        return self.__qosJobLimits
+
+    # Network topology
+    @property
+    def networkLevels(self):
+        """List of (name, nodes) for the levels of the interconnect
+        hierarchy (e.g. switches, groups, cabinets), smallest first"""
+        return self.__networkLevels
+    @property
+    def constraintLevel(self):
+        """The level of the interconnect that the scheduler topology
+        constraint counts (None if there is no network topology)"""
+        return self.__constraintLevel
+    @property
+    def nodesPerGroup(self):
+        """The number of nodes in each unit of the constraint level (0 if
+        there is no network topology)"""
+        for name, nodes in self.__networkLevels:
+            if name == self.__constraintLevel: return nodes
+        return 0
+    @property
+    def groupsUsedCommand(self):
+        """Command run in the job to print the number of units of the
+        constraint level the job uses. '{nodes}' is replaced by the nodes
+        in each unit. None to not report them."""
+        return self.__groupsUsedCommand
+    def networkPolicy(self, nodes):
+        """The topology constraint for a job of the specified number of
+           nodes.
+
+           Returns:
+              tuple policy  - (groups, wait): the most units of the
+                              constraint level the job may span and the
+                              longest time to wait for them (None for no
+                              limit); None if there is no policy for
+                              this number of nodes
+        """
+        for low, high, groups, wait in self.__networkPolicies:
+            if (nodes >= low) and ((high == 0) or (nodes <= high)): return (groups, wait)
+        return None
+
     # Methods
     def readConfig(self, fileName):
         """This method reads the machine configuration from a file. using the 
@@ -370,10 +622,10 @@ class BoltResource(object):
         Arguments:
            str  fileName  - The file to read the configuration from.
         """
-        import ConfigParser
+        import configparser
 
         # Set up the config for this object
-        resourceConfig = ConfigParser.SafeConfigParser()
+        resourceConfig = configparser.ConfigParser(inline_comment_prefixes=(";",))
         resourceConfig.read(fileName)
 
         # Get the system information options
@@ -392,6 +644,8 @@ class BoltResource(object):
         self.__threadsPerCore = resourceConfig.getint("node info", "threads per core")
         self.__nodeExclusive = resourceConfig.getboolean("node info", "exclusive node access")
         self.__accelerator = resourceConfig.get("node info", "accelerator type")
+        self.__memoryPerNode = boltconfig.getOptionalFloat(resourceConfig, "node info", "memory per node")
+        self.__chargeRate = boltconfig.getOptionalFloat(resourceConfig, "node info", "charge rate", 1.0)
 
         # Get the general parallel jobs options
         self.__parallelJobs = resourceConfig.getboolean("general parallel jobs", "parallel jobs")
@@ -405,12 +659,17 @@ class BoltResource(object):
         self.__parallelTaskOption = resourceConfig.get("general parallel jobs", "number of tasks option")
         self.__nodesOption = resourceConfig.get("general parallel jobs", "number of nodes option")
         self.__taskPerNodeOption = resourceConfig.get("general parallel jobs", "tasks per node option")
-        self.__useStrideOptionForUnderpop = resourceConfig.getboolean("general parallel jobs", "use stride option for underpopulation")
+        self.__useStrideOptionForUnderpop = resourceConfig.getboolean("general parallel jobs", "use stride option for underpopulation", fallback=False)
         self.__taskPerDieOption = resourceConfig.get("general parallel jobs", "tasks per die option")
         self.__taskStrideOption = resourceConfig.get("general parallel jobs", "tasks stride option")
         self.__parallelQueue = resourceConfig.get("general parallel jobs", "queue name")
-        self.__parallelQos = resourceConfig.get("general parallel jobs", "qos name")
+        self.__parallelQos = resourceConfig.get("general parallel jobs", "qos name", fallback="")
         self.__useBatchParallelOpts = resourceConfig.getboolean("general parallel jobs", "use batch parallel options")
+        self.__chunkUnit = boltconfig.getOptional(resourceConfig, "general parallel jobs", "chunk unit", "node")
+        self.__cpuMapOption = boltconfig.getOptional(resourceConfig, "general parallel jobs", "cpu map option", None)
+        self.__cpuMaskOption = boltconfig.getOptional(resourceConfig, "general parallel jobs", "cpu mask option", None)
+        if self.__chunkUnit not in ("node", "die"):
+            bolterror.handleError("Unknown chunk unit: {0} (use 'node' or 'die') in resource configuration file for resource: {1}.".format(self.__chunkUnit, self.__name))
 
 
         # Get the distributed memory jobs options
@@ -440,11 +699,101 @@ class BoltResource(object):
         self.__maxSerialJobTime = resourceConfig.getfloat("serial jobs", "maximum job duration")
         self.__serialTimeFormat = resourceConfig.get("serial jobs", "serial time format")
         self.__serialQueue = resourceConfig.get("serial jobs", "queue name")
-        self.__serialQos = resourceConfig.get("serial jobs", "qos name")
+        self.__serialQos = resourceConfig.get("serial jobs", "qos name", fallback="")
         self.__serialJobOptions = resourceConfig.get("serial jobs", "additional job options")
         self.__serialScriptPreamble = resourceConfig.get("serial jobs", "script preamble commands")
         self.__serialScriptPostamble = resourceConfig.get("serial jobs", "script postamble commands")
 
+        # Get the data staging options (optional)
+        self.__perNodeLauncher = boltconfig.getOptional(resourceConfig, "data staging", "per node launcher", None)
+        self.__storageTiers = []
+        for name in boltconfig.getOptional(resourceConfig, "data staging", "storage tiers").replace(",", " ").split():
+            section = "storage tier " + name
+            if not resourceConfig.has_section(section):
+                bolterror.handleError("Storage tier {0} listed for resource {1} but section [{2}] is missing.".format(name, self.__name, section))
+            tier = {}
+            tier["name"] = name
+            tier["path"] = resourceConfig.get(section, "path").strip()
+            tier["scope"] = boltconfig.getOptional(resourceConfig, section, "scope", "node")
+            tier["directives"] = boltconfig.getOptional(resourceConfig, section, "script directives")
+            if tier["scope"] not in ("node", "shared"):
+                bolterror.handleError("Unknown scope ({0}) for storage tier {1} on resource {2}. Use 'node' or 'shared'.".format(tier["scope"], name, self.__name))
+            if (tier["scope"] == "node") and (self.__perNodeLauncher is None):
+                bolterror.handleError("Storage tier {0} on resource {1} is local to each node but no per node launcher is set.".format(name, self.__name))
+            self.__storageTiers.append(tier)
+
+        # Get the executable broadcast options (optional)
+        self.__broadcastCommand = boltconfig.getOptional(resourceConfig, "broadcast", "broadcast command", None)
+        self.__containerCommand = boltconfig.getOptional(resourceConfig, "broadcast", "container command", self.__broadcastCommand)
+        self.__broadcastDir = boltconfig.getOptional(resourceConfig, "broadcast", "target directory", "/tmp")
+        self.__broadcastLibDir = boltconfig.getOptional(resourceConfig, "broadcast", "library directory", None)
+        self.__broadcastMinNodes = boltconfig.getOptionalInt(resourceConfig, "broadcast", "minimum nodes")
+        self.__containerExtensions = boltconfig.getOptional(resourceConfig, "broadcast", "container extensions").replace(",", " ").split()
+
+        # Get the parallel filesystem description (optional)
+        self.__storageTargets = boltconfig.getOptionalInt(resourceConfig, "filesystem", "storage targets")
+        self.__maxStripeCount = boltconfig.getOptionalInt(resourceConfig, "filesystem", "maximum stripe count")
+        self.__stripeSize = boltconfig.getOptional(resourceConfig, "filesystem", "stripe size", "1M")
+        self.__layoutCommand = boltconfig.getOptional(resourceConfig, "filesystem", "layout command", None)
+        self.__gbPerStripe = boltconfig.getOptionalFloat(resourceConfig, "filesystem", "gigabytes per stripe")
+        self.__hintsVariable = boltconfig.getOptional(resourceConfig, "filesystem", "hints variable", None)
+
+        # Get the queue limits (optional)
+        self.__maxQueuedJobs = boltconfig.getOptionalInt(resourceConfig, "queue limits", "maximum jobs")
+        self.__qosJobLimits = {}
+        for item in boltconfig.getOptional(resourceConfig, "queue limits", "qos limits").replace(",", " ").split():
+            qos, sep, limit = item.partition("=")
+            if (sep == "") or (not limit.isdigit()):
+                bolterror.handleError("QoS limits must be given as qos=jobs, not '{0}'.".format(item))
+            self.__qosJobLimits[qos] = int(limit)
+
+        # Get the network topology (optional)
+        self.__networkLevels = []
+        for item in boltconfig.getOptional(resourceConfig, "network topology", "levels").replace(",", " ").split():
+            level, sep, nodes = item.partition("=")
+            if (sep == "") or (not nodes.isdigit()) or (int(nodes) < 1):
+                bolterror.handleError("Network levels must be given as level=nodes, not '{0}'.".format(item))
+            self.__networkLevels.append((level, int(nodes)))
+        self.__constraintLevel = None
+        if len(self.__networkLevels) > 0:
+            self.__constraintLevel = boltconfig.getOptional(resourceConfig, "network topology", "constraint level", self.__networkLevels[0][0])
+            if self.nodesPerGroup == 0:
+                bolterror.handleError("Constraint level {0} of resource {1} is not one of the network levels.".format(self.__constraintLevel, self.__name))
+        self.__networkPolicies = []
+        for item in boltconfig.getOptional(resourceConfig, "network topology", "policies").replace(",", " ").split():
+            match = re.search(r"^([0-9]+)-([0-9]*):([0-9]+)(?:@([0-9][0-9:-]*))?$", item)
+            if (match is None) or (self.__constraintLevel is None):
+                bolterror.handleError("Network policies of resource {0} must be given as nodes-nodes:groups@wait for the network levels, not '{1}'.".format(self.__name, item))
+            self.__networkPolicies.append((int(match.group(1)), int(match.group(2) or 0), int(match.group(3)), match.group(4)))
+        self.__groupsUsedCommand = boltconfig.getOptional(resourceConfig, "network topology", "groups used command", None)
+
+        # Get the node classes (optional)
+        self.__nodeClasses = []
+        self.__classOptions = {}
+        names = boltconfig.getOptional(resourceConfig, "node classes", "node classes").replace(",", " ").split()
+        if len(names) > 0:
+            self.__nodeClass = boltconfig.getOptional(resourceConfig, "node classes", "default class", "standard")
+            self.__nodeClasses = [self.__nodeClass] + [n for n in names if n != self.__nodeClass]
+        self.__classSelection = boltconfig.getOptional(resourceConfig, "node classes", "selection", "cost")
+        if self.__classSelection not in ("cost", "start"):
+            bolterror.handleError("Node class selection for resource {0} must be cost or start, not '{1}'.".format(self.__name, self.__classSelection))
+        for name in self.__nodeClasses[1:]:
+            section = "node class " + name
+            if not resourceConfig.has_section(section):
+                bolterror.handleError("Node class {0} listed for resource {1} but section [{2}] is missing.".format(name, self.__name, section))
+            options = {}
+            for option in resourceConfig.options(section):
+                if option not in NODE_CLASS_OPTIONS:
+                    bolterror.handleError("Unknown option '{0}' in section [{1}] of resource {2}.".format(option, section, self.__name))
+                value = boltconfig.getOptional(resourceConfig, section, option)
+                if value == "": continue
+                try:
+                    NODE_CLASS_OPTIONS[option][1](value)
+                except ValueError:
+                    bolterror.handleError("Option '{0}' in section [{1}] of resource {2} is not valid: {3}".format(option, section, self.__name, value))
+                options[option] = value
+            self.__classOptions[name] = options
+
     def numCores(self):
         '''Return the total number of compute cores on this resource.
 
@@ -0,0 +1,217 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent a client for a scheduler REST API
+
+This class is part of the bolt job submission script generation
+tool. Some sites run a REST daemon in front of the batch system (for
+example slurmrestd). Submitting through it avoids starting a submit
+command for every job. The client posts job scripts over HTTP(S) or a
+UNIX socket, keeps a pool of persistent (keep-alive) connections and
+can submit many scripts concurrently, one request per connection.
+The access token is read from an environment variable so that it is
+never written to a configuration file. The endpoint is set in the
+[rest api] section of the batch system configuration.
+
+The request body is in the format used by slurmrestd:
+
+   {"script": "<job script>", "job": {"current_working_directory": ...,
+                                      "environment": [...]}}
+
+and the job ID is read from the response.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import concurrent.futures
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import urllib.parse
+import bolterror
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """An HTTP connection over a UNIX socket"""
+    def __init__(self, path, timeout):
+        http.client.HTTPConnection.__init__(self, "localhost", timeout=timeout)
+        self.__path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.__path)
+
+class BoltRestClient(object):
+    """This class represents a client for the REST API of a batch system."""
+    def __init__(self, batch):
+        """Setup the client from the [rest api] options of a batch
+           system. No connection is made until the first submission.
+
+           Arguments:
+              BoltBatch  batch  - The batch system to submit to
+        """
+        url = urllib.parse.urlsplit(batch.restEndpoint)
+        self.__endpoint = batch.restEndpoint
+        self.__scheme = url.scheme
+        self.__host = url.hostname
+        self.__port = url.port
+        self.__path = url.path or "/"
+        if url.query != "": self.__path += "?" + url.query
+        self.__socket = batch.restSocket
+        if (self.__socket is None) and (self.__scheme not in ("http", "https")):
+            bolterror.handleError("REST endpoint must be an http or https URL (or a path with a socket): {0}".format(batch.restEndpoint))
+        self.__timeout = batch.restTimeout
+        self.__connections = max(1, batch.restConnections)
+        self.__jobIDField = batch.restJobIDField
+        self.__tokenVariable = batch.restTokenVariable
+
+        self.__headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if batch.restTokenVariable is not None:
+            token = os.environ.get(batch.restTokenVariable)
+            if not token:
+                bolterror.handleError("The REST API token must be set in the environment variable {0}.".format(batch.restTokenVariable))
+            self.__headers[batch.restTokenHeader] = token
+        if batch.restUserHeader is not None:
+            self.__headers[batch.restUserHeader] = os.environ.get("USER", "")
+
+        # Idle connections, most recently used first
+        self.__pool = queue.LifoQueue()
+        self.__opened = 0
+        self.__lock = threading.Lock()
+
+    # Properties ==============================================================
+    @property
+    def endpoint(self):
+        """The URL (or path on the UNIX socket) scripts are posted to"""
+        return self.__endpoint
+    @property
+    def connections(self):
+        """The maximum number of connections (and concurrent requests)"""
+        return self.__connections
+    @property
+    def opened(self):
+        """The number of connections opened so far"""
+        return self.__opened
+
+    # Methods ==============================================================
+    def submit(self, script, workDir=None):
+        """Submit a job script.
+
+           Arguments:
+              str  script   - The job script
+              str  workDir  - The working directory of the job (default
+                              the current directory)
+
+           Returns:
+              str  jobID  - The ID of the submitted job
+        """
+        if workDir is None: workDir = os.getcwd()
+        return self.__post(self.__body(script, workDir))
+
+    def submitMany(self, scripts, workDir=None):
+        """Submit job scripts concurrently, with up to one request in
+           flight per connection.
+
+           Arguments:
+              list scripts  - The job scripts
+              str  workDir  - The working directory of the jobs
+
+           Returns:
+              list jobIDs  - The job IDs, in the same order as the scripts
+        """
+        if workDir is None: workDir = os.getcwd()
+        bodies = [self.__body(script, workDir) for script in scripts]
+        if (self.__connections == 1) or (len(bodies) < 2):
+            return [self.__post(body) for body in bodies]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.__connections) as executor:
+            return list(executor.map(self.__post, bodies))
+
+    def close(self):
+        """Close the idle connections."""
+        while True:
+            try:
+                self.__pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def __body(self, script, workDir):
+        """The request body for a job script. The job gets the submitting
+           environment (as with sbatch) apart from the access token."""
+        environment = ["{0}={1}".format(k, v) for k, v in sorted(os.environ.items()) if k != self.__tokenVariable]
+        job = {"current_working_directory": workDir, "environment": environment}
+        return json.dumps({"script": script, "job": job}).encode("utf-8")
+
+    def __newConnection(self):
+        with self.__lock:
+            self.__opened += 1
+        if self.__socket is not None:
+            return UnixHTTPConnection(self.__socket, self.__timeout)
+        if self.__scheme == "https":
+            return http.client.HTTPSConnection(self.__host, self.__port, timeout=self.__timeout)
+        return http.client.HTTPConnection(self.__host, self.__port, timeout=self.__timeout)
+
+    def __post(self, body):
+        """Post a request body on a pooled connection and return the job
+           ID. A reused connection that the server has closed is replaced
+           and the request retried once."""
+        try:
+            connection = self.__pool.get_nowait()
+            reused = True
+        except queue.Empty:
+            connection = self.__newConnection()
+            reused = False
+        while True:
+            try:
+                connection.request("POST", self.__path, body, self.__headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as strerror:
+                connection.close()
+                if not reused:
+                    bolterror.handleError("REST submission to {0} failed: {1}".format(self.__endpoint, strerror))
+                connection = self.__newConnection()
+                reused = False
+            except (OSError, http.client.HTTPException) as strerror:
+                connection.close()
+                bolterror.handleError("REST submission to {0} failed: {1}".format(self.__endpoint, strerror))
+        if response.will_close:
+            connection.close()
+        else:
+            self.__pool.put(connection)
+        return self.__jobID(response.status, data)
+
+    def __jobID(self, status, data):
+        """Read the job ID from a response"""
+        try:
+            reply = json.loads(data.decode("utf-8"))
+        except ValueError:
+            reply = {}
+        errors = []
+        if isinstance(reply, dict):
+            errors = [e.get("error", str(e)) if isinstance(e, dict) else str(e) for e in reply.get("errors", [])]
+        if (status < 200) or (status >= 300) or (len(errors) > 0):
+            message = "; ".join(errors)
+            if message == "": message = data.decode("utf-8", "replace").strip()[:200]
+            bolterror.handleError("REST submission to {0} failed ({1}): {2}".format(self.__endpoint, status, message))
+        if self.__jobIDField not in reply:
+            bolterror.handleError("REST submission response from {0} has no '{1}'.".format(self.__endpoint, self.__jobIDField))
+        return str(reply[self.__jobIDField])
@@ -0,0 +1,149 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+Python classes to represent and render job scripts
+
+This module is part of the bolt job submission script generation
+tool. A job script is built as a BoltScript: a set of named sections
+(batch options, preamble, run lines, ...) filled in by the job from
+fragments contributed by the batch system, resource and code. The
+script is rendered with a BoltTemplate, which is parsed once when
+the module is loaded so that rendering is a single join of strings.
+All callers (the command line tool, sweeps and other python code)
+render scripts through BoltJob.renderScript.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import string
+import bolterror
+
+class BoltTemplate(object):
+    """This class represents a template compiled for fast rendering."""
+    def __init__(self, text):
+        """Compile a template. Fields are names in braces, as for
+           str.format, but without format specifications.
+
+           Arguments:
+              str  text  - The template text
+        """
+        self.__parts = []
+        self.__fields = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if (spec not in (None, "")) or (conversion is not None):
+                bolterror.handleError("Template field {{{0}}} may not have a format specification.".format(field))
+            self.__parts.append(literal)
+            if field is not None:
+                self.__parts.append(None)
+                self.__fields.append(field)
+        # Slots are filled by position when the template is rendered
+        self.__slots = [i for i, part in enumerate(self.__parts) if part is None]
+
+    # Properties ==============================================================
+    @property
+    def fields(self):
+        """The names of the fields in the template, in order"""
+        return self.__fields
+
+    # Methods ==============================================================
+    def render(self, values):
+        """Render the template.
+
+           Arguments:
+              dict values  - Maps each field name to a string
+
+           Returns:
+              str  text    - The rendered text
+        """
+        parts = list(self.__parts)
+        for slot, field in zip(self.__slots, self.__fields):
+            parts[slot] = values[field]
+        return "".join(parts)
+
+# The layout of all job scripts
+SCRIPT_TEMPLATE = BoltTemplate(
+    "{shell}\n"
+    "#\n"
+    "# {kind} script produced by bolt\n"
+    "#        Resource: {resource} ({arch})\n"
+    "#    Batch system: {batch}\n"
+    "#\n"
+    "# bolt is written by EPCC (http://www.epcc.ed.ac.uk)\n"
+    "#\n"
+    "{batchOptions}"
+    "{jobOptions}"
+    "{directives}"
+    "{preamble}"
+    "{setup}"
+    "# Run the {runKind} program\n"
+    "{run}"
+    "{postamble}"
+    "{resubmit}")
+
+class BoltScript(object):
+    """This class represents the contents of a job script."""
+    # The sections of a script, in the order they appear
+    SECTIONS = ("batchOptions", "jobOptions", "directives", "preamble", "setup", "run", "postamble", "resubmit")
+
+    def __init__(self, isParallel, shell, resource, arch, batch):
+        """Setup an empty script.
+
+           Arguments:
+              boolean  isParallel - Is this a parallel job script?
+              str      shell      - The shell line
+              str      resource   - The resource name
+              str      arch       - The resource architecture
+              str      batch      - The batch system name
+        """
+        self.__values = dict.fromkeys(BoltScript.SECTIONS, "")
+        self.__values["shell"] = shell
+        self.__values["resource"] = resource
+        self.__values["arch"] = arch
+        self.__values["batch"] = batch
+        if isParallel:
+            self.__values["kind"] = "Parallel"
+            self.__values["runKind"] = "parallel"
+        else:
+            self.__values["kind"] = "Serial"
+            self.__values["runKind"] = "serial"
+
+    # Methods ==============================================================
+    def section(self, name):
+        """The text of a section of the script"""
+        return self.__values[name]
+
+    def append(self, name, text):
+        """Add text to a section of the script. Each piece of text is
+           ended with a newline if it does not have one. Empty text and
+           None are ignored.
+
+           Arguments:
+              str  name  - The section (one of BoltScript.SECTIONS)
+              str  text  - The text to add
+        """
+        if (text is None) or (text == ""): return
+        if not text.endswith("\n"): text += "\n"
+        self.__values[name] += text
+
+    def render(self):
+        """Render the script.
+
+           Returns:
+              str  text  - The job script
+        """
+        return SCRIPT_TEMPLATE.render(self.__values)
@@ -0,0 +1,320 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+Functions to choose where a job runs
+
+This module is part of the bolt job submission script generation
+tool. The shape of a job (nodes and tasks per node) is worked out for
+a resource from the number of tasks, threads and memory per task, and
+checked against the size and walltime limits of the resource. Resources
+with several classes of node (e.g. standard and high-memory nodes) use
+this to choose the class that fits the job at the lowest charge or with
+the earliest estimated start, and the same job is ranked across all the
+resources to choose where to run it.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import re
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bolterror
+
+# The most resources evaluated at the same time when ranking
+MAX_RANK_THREADS = 8
+
+def jobShape(resource, tasks, threads, tasksPerNode=0, memoryPerTask=0.0, code=None, wallTime=None, parallel=True,
+             coreSpec=None):
+    """Work out the shape and charge of a job on a resource.
+
+       Arguments:
+          BoltResource resource      - The resource (or node class)
+          int          tasks         - Number of parallel tasks
+          int          threads       - Threads per task
+          int          tasksPerNode  - Tasks per node (0 for the default)
+          float        memoryPerTask - Memory needed by each task in GB
+          BoltCode     code          - The code (None if no code)
+          float        wallTime      - Walltime in hours (None if not
+                                       known: the charge is per hour)
+          boolean      parallel      - Is this a parallel job?
+          BoltCoreSpec coreSpec      - Cores reserved on each node (None
+                                       if none)
+
+       Returns:
+          dict shape  - Keys: fits (boolean), reason (why the job does
+                        not fit), nodes, tpn, maxTime (hours) and cost
+                        (units charged)
+    """
+    shape = {"fits": False, "reason": "", "nodes": 1, "tpn": 1, "maxTime": 0.0, "cost": 0.0}
+    if code is not None: memoryPerTask = max(memoryPerTask, code.memoryPerTask)
+    if not parallel:
+        if not resource.serialJobs:
+            shape["reason"] = "no serial jobs"
+            return shape
+        shape["maxTime"] = float(resource.maxSerialJobTime)
+    else:
+        if not resource.parallelJobs:
+            shape["reason"] = "no parallel jobs"
+            return shape
+        cores = resource.numCoresPerNode()
+        logicalCores = resource.numLogicalCoresPerNode()
+        if coreSpec is not None:
+            cores = coreSpec.availableCores(resource)
+            logicalCores = coreSpec.availableLogicalCores(resource)
+        if threads > cores: cores = logicalCores
+        if threads > cores:
+            shape["reason"] = "{0} threads but {1} cores per node".format(threads, cores)
+            return shape
+        if (threads > 1) and (tasks > 1) and (not resource.hybridJobs):
+            shape["reason"] = "no hybrid jobs"
+            return shape
+        tpn = tasksPerNode
+        if (tpn == 0) and (code is not None):
+            # The code may decide the job does not fit
+            messages = []
+            previous = bolterror.collectMessages(messages)
+            try:
+                tpn = code.preferredTasksPerNode(resource, threads)
+            except bolterror.BoltError:
+                shape["reason"] = "{0} GB per task but {1} GB per node".format(memoryPerTask, resource.memoryPerNode)
+                return shape
+            finally:
+                bolterror.collectMessages(previous)
+        if tpn == 0: tpn = cores // threads
+        if (coreSpec is not None) and (tasksPerNode == 0): tpn = min(tpn, cores // threads)
+        if (memoryPerTask > 0) and (resource.memoryPerNode > 0):
+            memoryTasks = int(resource.memoryPerNode // memoryPerTask)
+            if memoryTasks < 1:
+                shape["reason"] = "{0} GB per task but {1} GB per node".format(memoryPerTask, resource.memoryPerNode)
+                return shape
+            tpn = min(tpn, memoryTasks)
+        tpn = max(1, min(tpn, tasks))
+        if tpn * threads > logicalCores:
+            shape["reason"] = "{0} cores per node needed but {1} available".format(tpn * threads, logicalCores)
+            return shape
+        nodes = (tasks + tpn - 1) // tpn
+        shape["nodes"] = nodes
+        shape["tpn"] = tpn
+        if nodes > resource.nodes:
+            shape["reason"] = "{0} nodes needed but {1} available".format(nodes, resource.nodes)
+            return shape
+        if nodes * resource.numCoresPerNode() > resource.maxTasks:
+            shape["reason"] = "{0} cores needed but at most {1} allowed".format(nodes * resource.numCoresPerNode(), resource.maxTasks)
+            return shape
+        shape["maxTime"] = float(resource.maxJobTimeByNodes(nodes))
+    if (wallTime is not None) and (wallTime > shape["maxTime"]):
+        shape["reason"] = "{0:g} hours needed but at most {1:g} allowed".format(wallTime, shape["maxTime"])
+        return shape
+    hours = 1.0
+    if wallTime is not None: hours = wallTime
+    shape["cost"] = shape["nodes"] * hours * resource.chargeRate
+    shape["fits"] = True
+    return shape
+
+def nodeClassCandidates(resource, batch, tasks, threads, tasksPerNode=0, memoryPerTask=0.0, code=None,
+                        wallTime=None, parallel=True, estimateStart=False, account=None, coreSpec=None):
+    """Work out the shape of a job on each node class of a resource.
+
+       Arguments:
+          BoltResource resource      - The resource
+          BoltBatch    batch         - Its batch system
+          boolean      estimateStart - Ask the batch system when the job
+                                       would start on each class
+          str          account       - The account (for start estimates)
+          (the other arguments are as jobShape)
+
+       Returns:
+          list candidates  - One shape per node class, with the node class
+                             ('class'), the resource for the class
+                             ('resource') and the estimated start time
+                             ('start', None if not known)
+    """
+    candidates = []
+    for name in resource.nodeClasses:
+        classResource = resource.getNodeClass(name)
+        shape = jobShape(classResource, tasks, threads, tasksPerNode, memoryPerTask, code, wallTime, parallel,
+                         coreSpec)
+        shape["class"] = name
+        shape["resource"] = classResource
+        shape["start"] = None
+        if estimateStart and shape["fits"]:
+            shape["start"] = startEstimate(batch, classResource, shape["nodes"], wallTime, account, parallel)
+        candidates.append(shape)
+    return candidates
+
+def selectCandidate(candidates, policy):
+    """Choose the node class that fits at the lowest charge ('cost') or
+       the earliest estimated start ('start', then the lowest charge).
+       Classes earlier in the list win ties.
+
+       Returns:
+          dict candidate  - The chosen candidate (None if none fit)
+    """
+    fits = [(i, c) for i, c in enumerate(candidates) if c["fits"]]
+    if len(fits) == 0: return None
+    if policy == "start":
+        return min(fits, key=lambda ic: (ic[1]["start"] is None, ic[1]["start"] or 0.0, ic[1]["cost"], ic[0]))[1]
+    return min(fits, key=lambda ic: (ic[1]["cost"], ic[0]))[1]
+
+def startEstimate(batch, resource, nodes, wallTime, account, parallel=True):
+    """Ask the batch system when a job would start (e.g. with 'sbatch
+       --test-only'). The first date and time (YYYY-MM-DDThh:mm:ss) in the
+       output of the start command is taken as the start.
+
+       Returns:
+          float start  - The start time in seconds since the epoch (None
+                         if it cannot be estimated)
+    """
+    if batch.startCommand is None: return None
+    hours = 1.0
+    if wallTime is not None: hours = wallTime
+    seconds = int(round(hours * 3600))
+    queue = resource.parallelQueue if parallel else resource.serialQueue
+    qos = resource.parallelQos if parallel else resource.serialQos
+    values = {"{queue}": queue or "", "{qos}": qos or "", "{nodes}": str(nodes), "{account}": account or "",
+              "{time}": "{0}:{1:02d}:{2:02d}".format(seconds // 3600, (seconds % 3600) // 60, seconds % 60)}
+    command = batch.startCommand
+    for key in values:
+        command = command.replace(key, shlex.quote(values[key]))
+    try:
+        process = subprocess.run(shlex.split(command), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                 universal_newlines=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired) as strerror:
+        bolterror.printWarning("Cannot estimate the start of a job on {0}: {1}".format(queue, strerror))
+        return None
+    match = re.search(r"(\d{4}-\d\d-\d\d)[T ](\d\d:\d\d:\d\d)", process.stdout)
+    if match is None: return None
+    return time.mktime(time.strptime(match.group(1) + "T" + match.group(2), "%Y-%m-%dT%H:%M:%S"))
+
+def candidateString(candidate):
+    """A one line description of the shape of a job on a node class"""
+    if not candidate["fits"]:
+        return "{0}: does not fit ({1})".format(candidate["class"], candidate["reason"])
+    text = "{0}: {1} nodes x {2} tasks, {3:.2f} units (up to {4:g} hours)".format(candidate["class"], candidate["nodes"],
+            candidate["tpn"], candidate["cost"], candidate["maxTime"])
+    if candidate["start"] is not None:
+        text += ", starts {0}".format(time.strftime("%Y-%m-%d %H:%M", time.localtime(candidate["start"])))
+    return text
+
+def evaluateResource(resource, tasks, threads, tasksPerNode=0, memoryPerTask=0.0, code=None, wallTime=None,
+                     parallel=True, model=None, coreSpec=None):
+    """Work out the shape, charge and time to solution of a job on a
+       resource (on the cheapest node class it fits if it has several).
+
+       Arguments:
+          BoltModel    model  - Performance model for the code on the
+                                resource (None if there is none)
+          (the other arguments are as jobShape)
+
+       Returns:
+          dict evaluation  - The shape with the resource name ('name'),
+                             node class ('class', None if the resource
+                             has one class), resource for the class
+                             ('resource'), predicted runtime in hours
+                             ('runtime', None if not known) and walltime
+                             ('wallTime'). The charge is for the
+                             predicted runtime if known, otherwise the
+                             walltime.
+    """
+    cores = tasks * threads
+    runtime = None
+    if (model is not None) and (model.predict(cores) is not None):
+        runtime = model.predict(cores) / 3600.0
+        if wallTime is None: wallTime = model.suggestWallTime(cores) / 60.0
+    if len(resource.nodeClasses) > 0:
+        candidates = nodeClassCandidates(resource, None, tasks, threads, tasksPerNode, memoryPerTask, code,
+                                         wallTime, parallel, coreSpec=coreSpec)
+        evaluation = selectCandidate(candidates, "cost")
+        if evaluation is None:
+            evaluation = candidates[0]
+            evaluation["reason"] = "; ".join(["{0}: {1}".format(c["class"], c["reason"]) for c in candidates])
+    else:
+        evaluation = jobShape(resource, tasks, threads, tasksPerNode, memoryPerTask, code, wallTime, parallel,
+                              coreSpec)
+        evaluation["class"] = None
+        evaluation["resource"] = resource
+    evaluation["name"] = resource.name
+    evaluation["runtime"] = runtime
+    evaluation["wallTime"] = wallTime
+    if evaluation["fits"] and (runtime is not None):
+        evaluation["cost"] = evaluation["nodes"] * runtime * evaluation["resource"].chargeRate
+    return evaluation
+
+def rankResources(resources, tasks, threads, tasksPerNode=0, memoryPerTask=0.0, code=None, wallTime=None,
+                  parallel=True, modelFor=None, policy="cost", coreSpec=None):
+    """Evaluate a job on each resource (concurrently) and rank them.
+
+       Arguments:
+          list     resources - The resources
+          function modelFor  - Returns the performance model for a resource
+                               name (None if there is none); None if the
+                               job has no code
+          str      policy    - 'cost' to rank by the lowest charge or
+                               'time' by the shortest predicted runtime
+          (the other arguments are as jobShape)
+
+       Returns:
+          list evaluations  - The evaluations (as evaluateResource), best
+                              first; resources the job does not fit on
+                              are last
+    """
+    def evaluate(resource):
+        try:
+            model = None
+            if modelFor is not None: model = modelFor(resource.name)
+            return evaluateResource(resource, tasks, threads, tasksPerNode, memoryPerTask, code, wallTime,
+                                    parallel, model, coreSpec)
+        except bolterror.BoltError as err:
+            return {"fits": False, "reason": str(err).strip(), "nodes": 1, "tpn": 1, "maxTime": 0.0, "cost": 0.0,
+                    "class": None, "resource": resource, "name": resource.name, "runtime": None, "wallTime": wallTime}
+
+    # Errors in the threads must not exit: they are collected in the
+    # list set here (nested collections in the threads only ever restore
+    # this list or another of the lists, never None)
+    messages = []
+    previous = bolterror.collectMessages(messages)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(len(resources), MAX_RANK_THREADS))) as pool:
+            evaluations = list(pool.map(evaluate, resources))
+    finally:
+        bolterror.collectMessages(previous)
+    if policy == "time":
+        key = lambda e: (not e["fits"], e["runtime"] is None, e["runtime"] or 0.0, e["cost"], e["name"])
+    else:
+        key = lambda e: (not e["fits"], e["cost"], e["runtime"] is None, e["runtime"] or 0.0, e["name"])
+    return sorted(evaluations, key=key)
+
+def rankingString(evaluations):
+    """A table of the ranked resources"""
+    text = "\n  {0:>4} {1:<24} {2:>7} {3:>10} {4:>12} {5:>11} {6:>10}\n".format("Rank", "Resource", "Nodes",
+            "Tasks/node", "Max time (h)", "Runtime (h)", "Charge")
+    rank = 0
+    for evaluation in evaluations:
+        name = evaluation["name"]
+        if evaluation["class"] is not None: name += " (" + evaluation["class"] + ")"
+        if not evaluation["fits"]:
+            text += "  {0:>4} {1:<24} does not fit: {2}\n".format("-", name, evaluation["reason"])
+            continue
+        rank += 1
+        runtime = "-"
+        if evaluation["runtime"] is not None: runtime = "{0:.2f}".format(evaluation["runtime"])
+        text += "  {0:>4d} {1:<24} {2:>7d} {3:>10d} {4:>12g} {5:>11} {6:>10.2f}\n".format(rank, name,
+                evaluation["nodes"], evaluation["tpn"], evaluation["maxTime"], runtime, evaluation["cost"])
+    return text + "\n"
@@ -0,0 +1,506 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent a simulated batch scheduler
+
+This class is part of the bolt job submission script generation
+tool. It stands in for the batch system so that submission
+throughput, queue waits and makespans of bolt workflows can be
+measured without a real controller. The cluster is modelled from a
+bolt resource configuration as a pool of cores (whole nodes for
+parallel jobs on node-exclusive resources). Job scripts are read with
+the batch options of the batch system configuration (as in
+'bolt --check') and rejected if they break the limits of the
+resource, including its queue limits.
+
+Jobs are started first in, first out with EASY backfill: the first
+job that does not fit gets a reservation at the time enough cores
+will be free (from the walltimes of the running jobs) and later jobs
+may start before it if they do not delay the reservation. Jobs do not
+run: a job takes a fraction of its walltime (or the runtime given in
+a '# bolt-sim: runtime=<seconds> exit=<code>' line of the script).
+
+Time is simulated. The clock moves on by 'speed' simulated seconds
+for every real second between commands (0 to only move the clock
+explicitly) and completing the jobs up to a time takes no longer than
+the scheduling calculation. The state is kept in a JSON file in the
+simulator directory, with a lock file so that commands can be run
+concurrently.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import fcntl
+import getpass
+import json
+import os
+import re
+import time
+import bolterror
+from boltcheck import BoltCheck
+
+# Job states (Slurm names)
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+CANCELLED = "CANCELLED"
+TIMEOUT = "TIMEOUT"
+FINISHED = (COMPLETED, FAILED, CANCELLED, TIMEOUT)
+
+# Short Slurm state codes and PBS states
+SHORT_STATES = {PENDING: "PD", RUNNING: "R", COMPLETED: "CD", FAILED: "F", CANCELLED: "CA", TIMEOUT: "TO"}
+PBS_STATES = {PENDING: "Q", RUNNING: "R", COMPLETED: "F", FAILED: "F", CANCELLED: "F", TIMEOUT: "F"}
+
+class BoltSimulator(object):
+    """This class represents a simulated batch scheduler."""
+    def __init__(self, directory):
+        """Setup the simulator (use init or load to set the state).
+
+           Arguments:
+              str  directory  - The directory the state is kept in
+        """
+        self.__directory = os.path.expanduser(directory)
+        self.__state = None
+        self.__resource = None
+        self.__batch = None
+        self.__lockFile = None
+
+    # Properties ==============================================================
+    @property
+    def directory(self):
+        """The directory the state is kept in"""
+        return self.__directory
+    @property
+    def stateName(self):
+        """The file the state is kept in"""
+        return os.path.join(self.__directory, "state.json")
+    @property
+    def resource(self):
+        """The simulated resource"""
+        return self.__resource
+    @property
+    def batch(self):
+        """The batch system whose options are read from the scripts"""
+        return self.__batch
+    @property
+    def clock(self):
+        """The simulated time (seconds since the epoch)"""
+        return self.__state["clock"]
+    @property
+    def cores(self):
+        """The number of cores in the simulated cluster"""
+        return self.__state["cores"]
+    @property
+    def freeCores(self):
+        """The number of cores not used by running jobs"""
+        return self.cores - sum([j["cores"] for j in self.jobs if j["state"] == RUNNING])
+    @property
+    def jobs(self):
+        """List of the jobs, in the order they were submitted. Each job
+        is a dictionary with keys id, name, user, qos, account, nodes,
+        cores, walltime and runtime (seconds), exit, state, reason,
+        submit, start and end (simulated times, None if not reached),
+        dependencies and script"""
+        return self.__state["jobs"]
+
+    # Methods ==============================================================
+    def init(self, resource, batch, resourceFile, batchFile, speed=3600.0, fraction=0.5, nodes=None):
+        """Start a new simulation (any existing state is discarded).
+
+           Arguments:
+              BoltResource resource     - The simulated resource
+              BoltBatch    batch        - Its batch system
+              str          resourceFile - The resource configuration file
+              str          batchFile    - The batch configuration file
+              float        speed        - Simulated seconds per real second
+              float        fraction     - Default runtime as a fraction of
+                                          the walltime
+              int          nodes        - Number of nodes (default all the
+                                          nodes of the resource)
+        """
+        if nodes is None: nodes = resource.nodes
+        self.__resource = resource
+        self.__batch = batch
+        now = time.time()
+        self.__state = {"resourceFile": os.path.abspath(resourceFile), "batchFile": os.path.abspath(batchFile),
+                        "speed": speed, "fraction": fraction, "nodes": nodes,
+                        "cores": nodes * resource.numCoresPerNode(), "clock": float(int(now)), "anchor": now,
+                        "nextID": 1000, "jobs": []}
+        with self.__lock():
+            self.save()
+
+    def load(self):
+        """Read the state and the configuration of the simulated resource,
+           then move the clock on by the real time since the last command."""
+        from boltresource import BoltResource
+        from boltbatch import BoltBatch
+        if not os.path.isfile(self.stateName):
+            bolterror.handleError("No simulation in {0}: start one with 'boltsim init'.".format(self.__directory))
+        self.__lockFile = open(os.path.join(self.__directory, "state.lock"), "w")
+        fcntl.flock(self.__lockFile, fcntl.LOCK_EX)
+        with open(self.stateName, "r") as stateFile:
+            self.__state = json.load(stateFile)
+        self.__resource = BoltResource()
+        self.__resource.readConfig(self.__state["resourceFile"])
+        self.__batch = BoltBatch()
+        self.__batch.readConfig(self.__state["batchFile"])
+        now = time.time()
+        if self.__state["speed"] > 0:
+            self.advance(self.clock + (now - self.__state["anchor"]) * self.__state["speed"])
+        self.__state["anchor"] = now
+
+    def save(self):
+        """Write the state (atomically) and release the lock."""
+        tmpName = "{0}.{1}".format(self.stateName, os.getpid())
+        try:
+            os.makedirs(self.__directory, exist_ok=True)
+            with open(tmpName, "w") as stateFile:
+                json.dump(self.__state, stateFile)
+            os.replace(tmpName, self.stateName)
+        except (IOError, OSError) as strerror:
+            bolterror.handleError("Writing simulator state: {0}; {1}".format(self.stateName, strerror))
+        if self.__lockFile is not None:
+            self.__lockFile.close()
+            self.__lockFile = None
+
+    def submit(self, text, fileName="-", dependencies=None, array=None, name=None, user=None):
+        """Submit a job script.
+
+           Arguments:
+              str   text         - The script
+              str   fileName     - The script file (for the record)
+              list  dependencies - IDs of jobs that must complete first
+              list  array        - Array task indices (None for a single job)
+              str   name         - Job name (default from the script)
+              str   user         - The user (default the current user)
+
+           Returns:
+              list  ids  - The IDs of the jobs (one per array task)
+        """
+        check = BoltCheck(fileName, text, self.__resource, self.__batch)
+        errors = [m for level, m in check.messages if level == "error"]
+        if len(errors) > 0: bolterror.handleError(errors[0])
+        if check.wallTime is None: bolterror.handleError("No walltime found in the job script.")
+        options = check.options
+        qos = options.get("qos", options.get("queue", "")) or "normal"
+        if user is None: user = getpass.getuser()
+        count = 1
+        if array is not None: count = len(array)
+        self.__checkLimits(user, qos, count)
+        # Parallel jobs on node-exclusive resources use whole nodes
+        report = check.report()
+        if report["parallel"] and self.__resource.nodeExclusive:
+            cores = check.nodes * self.__resource.numCoresPerNode()
+        else:
+            cores = max(1, report["tasks"] * report["threads"])
+        if cores > self.cores:
+            bolterror.handleError("Requested node configuration is not available ({0} cores, cluster has {1}).".format(cores, self.cores))
+        walltime = int(round(check.wallTime * 3600.0))
+        runtime = int(walltime * self.__state["fraction"])
+        exitCode = 0
+        match = re.search(r"^#\s*bolt-sim:(.*)$", text, re.MULTILINE)
+        if match is not None:
+            values = dict([item.partition("=")[::2] for item in match.group(1).split()])
+            if values.get("runtime", "").isdigit(): runtime = int(values["runtime"])
+            if values.get("exit", "").isdigit(): exitCode = int(values["exit"])
+        dependencies = [str(d) for d in (dependencies or [])]
+        for dependency in dependencies:
+            if self.findJob(dependency) is None:
+                bolterror.handleError("Job dependency problem: job {0} not found.".format(dependency))
+        jobID = self.__state["nextID"]
+        self.__state["nextID"] += 1
+        ids = []
+        for index in (array or [None]):
+            job = {"id": str(jobID), "name": name or options.get("name", os.path.basename(fileName)), "user": user,
+                   "qos": qos, "account": options.get("account", ""), "nodes": max(check.nodes, 1), "cores": cores,
+                   "walltime": walltime, "runtime": runtime, "exit": exitCode, "state": PENDING, "reason": "Priority",
+                   "submit": self.clock, "start": None, "end": None, "dependencies": dependencies, "script": fileName}
+            if index is not None: job["id"] = "{0}_{1}".format(jobID, index)
+            self.jobs.append(job)
+            ids.append(job["id"])
+        self.schedule()
+        return ids
+
+    def cancel(self, jobID):
+        """Cancel a job (all the tasks of an array job)."""
+        jobs = [j for j in self.jobs if (j["id"] == jobID) or j["id"].startswith(jobID + "_")]
+        if len(jobs) == 0: bolterror.handleError("Invalid job id specified: {0}".format(jobID))
+        for job in jobs:
+            if job["state"] in FINISHED: continue
+            if job["state"] == RUNNING: job["end"] = self.clock
+            job["state"] = CANCELLED
+            job["reason"] = "None"
+        self.schedule()
+
+    def findJob(self, jobID):
+        """The job with an ID (None if there is no such job)"""
+        for job in self.jobs:
+            if job["id"] == jobID: return job
+        return None
+
+    def schedule(self):
+        """Start the jobs that can run now: first in, first out with EASY
+           backfill."""
+        now = self.clock
+        free = self.freeCores
+        # Expected end times of running jobs (the scheduler only knows
+        # the walltimes)
+        releases = sorted([(j["start"] + j["walltime"], j["cores"]) for j in self.jobs if j["state"] == RUNNING])
+        shadow = None
+        extra = 0
+        for job in self.jobs:
+            if job["state"] != PENDING: continue
+            if not self.__dependenciesMet(job): continue
+            if shadow is None:
+                if job["cores"] <= free:
+                    self.__start(job, now)
+                    free -= job["cores"]
+                    releases.append((now + job["walltime"], job["cores"]))
+                    releases.sort()
+                    continue
+                # Reserve the earliest time the job will fit
+                available = free
+                shadow = now
+                for end, cores in releases:
+                    available += cores
+                    shadow = end
+                    if available >= job["cores"]: break
+                extra = available - job["cores"]
+                job["reason"] = "Resources"
+            elif (job["cores"] <= free) and ((now + job["walltime"] <= shadow) or (job["cores"] <= extra)):
+                # Backfill without delaying the reservation
+                self.__start(job, now)
+                free -= job["cores"]
+                if now + job["walltime"] > shadow: extra -= job["cores"]
+            else:
+                job["reason"] = "Priority"
+
+    def advance(self, until=None):
+        """Move the simulated clock on, completing jobs and starting new
+           ones as they finish.
+
+           Arguments:
+              float  until  - The simulated time to move to (None to run
+                              until no jobs are running)
+        """
+        while True:
+            self.schedule()
+            ends = [j["start"] + min(j["runtime"], j["walltime"]) for j in self.jobs if j["state"] == RUNNING]
+            if len(ends) == 0: break
+            nextEnd = min(ends)
+            if (until is not None) and (nextEnd > until): break
+            self.__state["clock"] = max(self.clock, nextEnd)
+            for job in self.jobs:
+                if (job["state"] == RUNNING) and (job["start"] + min(job["runtime"], job["walltime"]) <= self.clock):
+                    job["end"] = job["start"] + min(job["runtime"], job["walltime"])
+                    if job["runtime"] > job["walltime"]: job["state"] = TIMEOUT
+                    elif job["exit"] != 0: job["state"] = FAILED
+                    else: job["state"] = COMPLETED
+                    job["reason"] = "None"
+        if until is not None: self.__state["clock"] = max(self.clock, until)
+
+    def report(self):
+        """Measures of the simulated workload.
+
+           Returns:
+              dict report  - Number of jobs in each state, makespan (first
+                             submit to last end, seconds), queue waits
+                             (mean, median, 95th percentile and maximum
+                             seconds), throughput (jobs completed per hour)
+                             and utilisation of the cluster
+        """
+        report = {"jobs": len(self.jobs), "clock": self.clock}
+        for state in (PENDING, RUNNING) + FINISHED:
+            report[state.lower()] = len([j for j in self.jobs if j["state"] == state])
+        started = [j for j in self.jobs if j["start"] is not None]
+        waits = sorted([j["start"] - j["submit"] for j in started])
+        report["wait"] = {"mean": 0.0, "median": 0.0, "p95": 0.0, "max": 0.0}
+        if len(waits) > 0:
+            report["wait"] = {"mean": sum(waits) / len(waits), "median": waits[len(waits) // 2],
+                              "p95": waits[min(len(waits) - 1, int(0.95 * len(waits)))], "max": waits[-1]}
+        ended = [j for j in self.jobs if j["end"] is not None]
+        report["makespan"] = 0.0
+        report["throughput"] = 0.0
+        report["utilisation"] = 0.0
+        if len(ended) > 0:
+            first = min([j["submit"] for j in self.jobs])
+            last = max([j["end"] for j in ended])
+            report["makespan"] = last - first
+            if last > first:
+                report["throughput"] = len([j for j in ended if j["state"] == COMPLETED]) * 3600.0 / (last - first)
+                used = sum([(j["end"] - j["start"]) * j["cores"] for j in ended if j["start"] is not None])
+                report["utilisation"] = used / (self.cores * (last - first))
+        return report
+
+    def __dependenciesMet(self, job):
+        """Are the dependencies of a job complete? A job whose
+           dependency did not complete successfully is cancelled."""
+        for jobID in job["dependencies"]:
+            dependency = self.findJob(jobID)
+            if dependency is None: continue
+            if dependency["state"] in (FAILED, CANCELLED, TIMEOUT):
+                job["state"] = CANCELLED
+                job["reason"] = "DependencyNeverSatisfied"
+                return False
+            if dependency["state"] != COMPLETED:
+                job["reason"] = "Dependency"
+                return False
+        return True
+
+    def __start(self, job, now):
+        job["state"] = RUNNING
+        job["start"] = now
+        job["reason"] = "None"
+
+    def __checkLimits(self, user, qos, count):
+        """Reject jobs beyond the queue limits of the resource"""
+        active = [j for j in self.jobs if (j["user"] == user) and (j["state"] in (PENDING, RUNNING))]
+        if (self.__resource.maxQueuedJobs > 0) and (len(active) + count > self.__resource.maxQueuedJobs):
+            bolterror.handleError("Job violates accounting/QOS policy (job submit limit, user's size and/or time limits) [AssocMaxSubmitJobLimit]")
+        limit = self.__resource.qosJobLimits.get(qos)
+        if (limit is not None) and (len([j for j in active if j["qos"] == qos]) + count > limit):
+            bolterror.handleError("Job violates accounting/QOS policy (job submit limit, user's size and/or time limits) [QOSMaxSubmitJobPerUserLimit]")
+
+    def __lock(self):
+        os.makedirs(self.__directory, exist_ok=True)
+        self.__lockFile = open(os.path.join(self.__directory, "state.lock"), "w")
+        fcntl.flock(self.__lockFile, fcntl.LOCK_EX)
+        return self.__lockFile
+
+def hms(seconds):
+    """Format seconds as [d-]hh:mm:ss"""
+    seconds = int(max(seconds, 0))
+    days, seconds = divmod(seconds, 86400)
+    text = "{0:02d}:{1:02d}:{2:02d}".format(seconds // 3600, (seconds % 3600) // 60, seconds % 60)
+    if days > 0: text = "{0}-{1}".format(days, text)
+    return text
+
+def isoTime(value):
+    """Format a simulated time as Slurm does ('Unknown' if not reached)"""
+    if value is None: return "Unknown"
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(value))
+
+def exitCode(job):
+    """The Slurm exit code (code:signal) of a job"""
+    if job["state"] == CANCELLED: return "0:15"
+    if job["state"] in (FAILED, COMPLETED): return "{0}:0".format(job["exit"])
+    return "0:0"
+
+# squeue format codes and the fields they show
+SQUEUE_CODES = {"i": "jobid", "j": "jobname", "u": "user", "q": "qos", "a": "account", "P": "partition",
+                "t": "statecompact", "T": "state", "M": "elapsed", "D": "nnodes", "C": "ncpus", "l": "timelimit",
+                "V": "submit", "S": "start", "e": "end", "R": "reason", "r": "reason"}
+
+# squeue headings of the format codes
+SQUEUE_HEADINGS = {"i": "JOBID", "j": "NAME", "u": "USER", "q": "QOS", "a": "ACCOUNT", "P": "PARTITION", "t": "ST",
+                   "T": "STATE", "M": "TIME", "D": "NODES", "C": "CPUS", "l": "TIME_LIMIT", "V": "SUBMIT_TIME",
+                   "S": "START_TIME", "e": "END_TIME", "R": "NODELIST(REASON)", "r": "REASON"}
+
+def jobField(simulator, job, field):
+    """The value of a sacct field (e.g. JobID, State, ElapsedRaw) for a
+       job ('' for unknown fields)"""
+    elapsed = 0
+    if job["start"] is not None:
+        elapsed = (job["end"] if job["end"] is not None else simulator.clock) - job["start"]
+    field = field.lower()
+    if field in ("jobid", "jobidraw"): return job["id"]
+    if field == "jobname": return job["name"]
+    if field == "user": return job["user"]
+    if field == "qos": return job["qos"]
+    if field == "account": return job["account"]
+    if field == "partition": return "standard"
+    if field == "state": return job["state"]
+    if field == "statecompact": return SHORT_STATES[job["state"]]
+    if field == "elapsed": return hms(elapsed)
+    if field == "elapsedraw": return str(int(elapsed))
+    if field == "nnodes": return str(job["nodes"])
+    if field in ("ncpus", "alloccpus"): return str(job["cores"])
+    if field == "timelimit": return hms(job["walltime"])
+    if field == "submit": return isoTime(job["submit"])
+    if field == "start": return isoTime(job["start"])
+    if field == "end": return isoTime(job["end"])
+    if field == "reason": return job["reason"]
+    if field == "exitcode": return exitCode(job)
+    if field == "workdir": return os.path.dirname(job["script"])
+    return ""
+
+def squeueLines(simulator, jobs, fmt, header):
+    """The squeue output for jobs with a format string (e.g. '%i|%q|%T')"""
+    codes = re.compile(r"%(\.?)(\d*)([a-zA-Z])")
+    def render(value):
+        def replace(match):
+            text = value(match.group(3))
+            if match.group(2) == "": return text
+            width = int(match.group(2))
+            if match.group(1) == ".": return text[:width].rjust(width)
+            return text[:width].ljust(width)
+        return codes.sub(replace, fmt)
+    lines = []
+    if header: lines.append(render(lambda code: SQUEUE_HEADINGS.get(code, code.upper())))
+    for job in jobs:
+        lines.append(render(lambda code: jobField(simulator, job, SQUEUE_CODES.get(code, ""))))
+    return lines
+
+def sacctLines(simulator, jobs, fields, parsable, header):
+    """The sacct output for jobs with a list of fields"""
+    rows = []
+    if header: rows.append(fields)
+    for job in jobs:
+        rows.append([jobField(simulator, job, f) for f in fields])
+    if parsable: return ["|".join(row) for row in rows]
+    widths = [max([len(row[i]) for row in rows] + [10]) for i in range(len(fields))]
+    return [" ".join([row[i].rjust(widths[i]) for i in range(len(fields))]) for row in rows]
+
+def qstatLines(simulator, jobs, full, delimiter, suffix):
+    """The qstat output for jobs, in full (key = value) or short form"""
+    lines = []
+    if not full:
+        lines.append("Job id            Name             User              Time Use S Queue")
+        lines.append("----------------  ---------------- ----------------  -------- - -----")
+    for job in jobs:
+        jobID = job["id"] + suffix
+        elapsed = jobField(simulator, job, "elapsed")
+        if full:
+            items = ["Job Id: " + jobID, "Job_Name = " + job["name"], "Job_Owner = {0}@{1}".format(job["user"], "sim"),
+                     "job_state = " + PBS_STATES[job["state"]], "queue = " + job["qos"],
+                     "Resource_List.nodect = {0}".format(job["nodes"]),
+                     "Resource_List.walltime = " + hms(job["walltime"]), "ctime = " + isoTime(job["submit"])]
+            if job["start"] is not None: items.append("resources_used.walltime = " + elapsed)
+            if job["state"] in FINISHED: items.append("Exit_status = {0}".format(job["exit"] if job["state"] != CANCELLED else 271))
+            lines.append(delimiter.join(items))
+        else:
+            lines.append("{0:17s} {1:16s} {2:16s} {3:>9s} {4} {5}".format(jobID[:17], job["name"][:16], job["user"][:16],
+                         elapsed, PBS_STATES[job["state"]], job["qos"]))
+    return lines
+
+def arrayIndices(spec):
+    """The indices of an array specification such as '0-9' or '1,3,5-7'
+       (a '%' limit on running tasks is ignored)"""
+    indices = []
+    for item in spec.split("%")[0].split(","):
+        first, sep, last = item.partition("-")
+        if (not first.isdigit()) or (sep != "" and not last.isdigit()):
+            bolterror.handleError("Invalid job array specification: {0}".format(spec))
+        if sep == "": last = first
+        indices.extend(range(int(first), int(last) + 1))
+    return indices
+
+def simulatorDirectory():
+    """The simulator directory (BOLT_SIM_DIR, default ~/.bolt/sim)"""
+    return os.path.expanduser(os.environ.get("BOLT_SIM_DIR", "~/.bolt/sim"))
@@ -0,0 +1,168 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent data staging for a job
+
+This class is part of the bolt job submission script generation
+tool. The code configuration declares which arguments and files
+are inputs and outputs; the resource configuration declares the
+fast storage tiers (node-local disk, tmpfs, burst buffer) that
+are available. The generated script copies the inputs to the tier
+before the run (one copier per node for node-local storage), runs
+the code on the staged copies and copies the outputs back to the
+job directory afterwards (from the first node only for node-local
+storage), checking that each copy is complete.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import os
+import bolterror
+
+class BoltStaging(object):
+    """This class represents the staging of data for a single job."""
+    def __init__(self, tier, code, args):
+        """Setup the staging for a job.
+
+           Arguments:
+              dict      tier  - The storage tier (from BoltResource.storageTiers)
+              BoltCode  code  - The code being run
+              list      args  - The code arguments as given by the user
+        """
+        self.__tier = tier
+        self.__inputs = list(code.stageInputFiles)
+        self.__outputs = list(code.stageOutputFiles)
+        for i in code.stageInputArgs:
+            if args[i] not in self.__inputs: self.__inputs.append(args[i])
+        for i in code.stageOutputArgs:
+            if args[i] not in self.__outputs: self.__outputs.append(args[i])
+        self.__args = list(args)
+        for i in code.stageInputArgs + code.stageOutputArgs:
+            self.__args[i] = "${BOLT_STAGE_DIR}/" + os.path.basename(args[i])
+
+    # Properties ==============================================================
+    @property
+    def tier(self):
+        """The storage tier the data is staged to"""
+        return self.__tier
+    @property
+    def inputs(self):
+        """The files (or patterns) copied to the tier before the run"""
+        return self.__inputs
+    @property
+    def outputs(self):
+        """The files (or patterns) copied back after the run"""
+        return self.__outputs
+    @property
+    def args(self):
+        """The code arguments rewritten to point at the staged copies"""
+        return self.__args
+    @property
+    def directives(self):
+        """Extra script header lines needed by the tier (e.g. burst
+        buffer requests)"""
+        return self.__tier["directives"]
+
+    # Methods ==============================================================
+    def stageInLines(self, job, resource):
+        """The script lines that set the staging directory and copy the
+           inputs to it.
+
+           Arguments:
+              BoltJob      job      - The job being written
+              BoltResource resource - The resource the job is for
+
+           Returns:
+              str  text  - The script lines
+        """
+        stageDir = os.path.join(self.__tier["path"], "bolt.${BOLT_WORK_ID}")
+        if "csh" in resource.shell:
+            text = "setenv BOLT_WORK_DIR `pwd`\n"
+            text += "set BOLT_WORK_ID = $$\n"
+            text += "setenv BOLT_STAGE_DIR {0}\n".format(stageDir)
+        else:
+            text = "export BOLT_WORK_DIR=$(pwd)\n"
+            text += "BOLT_WORK_ID=$$\n"
+            text += "export BOLT_STAGE_DIR={0}\n".format(stageDir)
+        command = "mkdir -p ${BOLT_STAGE_DIR}"
+        if len(self.__inputs) > 0:
+            command += " && cd ${BOLT_WORK_DIR} && cp -p " + " ".join(self.__inputs) + " ${BOLT_STAGE_DIR}/"
+        text += self.__runOnNodes(job, resource, command) + "\n"
+        return text
+
+    def stageOutLines(self, job, resource):
+        """The script lines that copy the outputs back to the job directory
+           and check that the copies are complete. The staging directory
+           is only removed once every copy has been verified.
+
+           Arguments:
+              BoltJob      job      - The job being written
+              BoltResource resource - The resource the job is for
+
+           Returns:
+              str  text  - The script lines
+        """
+        if len(self.__outputs) == 0:
+            return self.__runOnNodes(job, resource, "rm -rf ${BOLT_STAGE_DIR}") + "\n"
+        copy = "cd ${BOLT_STAGE_DIR} && for f in " + " ".join([os.path.basename(f) for f in self.__outputs]) + \
+               "; do if [ -e $f ]; then cp -p $f ${BOLT_WORK_DIR}/ && cmp -s $f ${BOLT_WORK_DIR}/$f || " + \
+               "{ echo \"bolt: stage-out of $f failed\" >&2; exit 1; }; fi; done"
+        if self.__tier["scope"] == "node":
+            # Only the first node (where the first task writes the outputs)
+            # copies them back, so that no two nodes write the same file;
+            # the staged copies are then removed from every node
+            text = self.__runOnNodes(job, resource, copy, 1) + " && \\\n    " + \
+                   self.__runOnNodes(job, resource, "rm -rf ${BOLT_STAGE_DIR}") + "\n"
+        else:
+            text = self.__runOnNodes(job, resource, copy + "; cd / && rm -rf ${BOLT_STAGE_DIR}") + "\n"
+        check = "cd ${BOLT_WORK_DIR} && for f in " + " ".join([os.path.basename(f) for f in self.__outputs]) + \
+                "; do [ -e $f ] || echo \"bolt: output $f was not staged out\" >&2; done"
+        text += "sh -c '{0}'\n".format(check)
+        return text
+
+    def __runOnNodes(self, job, resource, command, nodes=None):
+        """Run a shell command once per node (or on the given number of
+           nodes) for node-local tiers, or once for shared tiers."""
+        line = "sh -c '{0}'".format(command)
+        if self.__tier["scope"] == "node":
+            if nodes is None: nodes = job.numNodes()
+            return "{0} {1}".format(resource.perNodeLauncher.format(nodes=nodes), line)
+        return line
+
+def selectTier(resource, code, name=None):
+    """Select the storage tier to stage data to.
+
+       Arguments:
+          BoltResource resource - The resource the job is for
+          BoltCode     code     - The code being run
+          str          name     - Tier requested by the user (None to use
+                                  the tier preferred by the code or the
+                                  first tier on the resource)
+
+       Returns:
+          dict  tier  - The selected tier
+    """
+    if len(resource.storageTiers) == 0:
+        bolterror.handleError("Data staging requested but resource {0} has no storage tiers.".format(resource.name))
+    if name is None: name = code.stageTier
+    if name is None: return resource.storageTiers[0]
+    tier = resource.getStorageTier(name)
+    if tier is None:
+        bolterror.handleError("Storage tier {0} is not defined for resource {1}. Available tiers: {2}".format(
+            name, resource.name, ", ".join([t["name"] for t in resource.storageTiers])))
+    return tier
@@ -0,0 +1,376 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent the status of the jobs submitted by bolt
+
+This class is part of the bolt job submission script generation
+tool. Each job submitted by bolt is added to the file 'submitted' in
+the bolt history directory. The status of the jobs is found with a
+single batched query per batch system, using the status command and
+output format set in the [status] section of the batch system
+configuration, instead of one query per job. The results are cached
+in the history directory for a short time and jobs that have finished
+are never queried again, so repeated status requests (and jobs
+waiting for other jobs) share one poll of the scheduler. A lock file
+stops several bolt processes from polling at the same time.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import fcntl
+import getpass
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+import bolterror
+
+# States reported for the jobs
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+# Maximum number of job IDs in one status command
+MAX_QUERY = 500
+
+class BoltStatus(object):
+    """This class represents the status of the jobs submitted by bolt."""
+    def __init__(self, directory, lifetime=60):
+        """Setup the status tracker.
+
+           Arguments:
+              str  directory  - The bolt history directory
+              int  lifetime   - Seconds for which polled status is reused
+        """
+        self.__directory = os.path.expanduser(directory)
+        self.__lifetime = lifetime
+
+    # Properties ==============================================================
+    @property
+    def directory(self):
+        """The bolt history directory"""
+        return self.__directory
+    @property
+    def lifetime(self):
+        """The number of seconds for which polled status is reused"""
+        return self.__lifetime
+    @property
+    def fileName(self):
+        """The file that submitted jobs are added to"""
+        return os.path.join(self.__directory, "submitted")
+    @property
+    def cacheName(self):
+        """The file that polled status is cached in"""
+        return os.path.join(self.__directory, "status.cache")
+
+    # Methods ==============================================================
+    def addJob(self, jobID, job, resource, batch, scriptName=None):
+        """Add a submitted job to the tracked jobs.
+
+           Arguments:
+              str          jobID      - The job ID from the batch system
+              BoltJob      job        - The job that was submitted
+              BoltResource resource   - The resource it was submitted to
+              BoltBatch    batch      - The batch system it was submitted to
+              str          scriptName - The job script (None if streamed)
+        """
+        fields = "time={0} id={1} resource={2} batch={3} nodes={4} name={5}".format(
+                 int(time.time()), jobID, resource.name, batch.name, job.numNodes(), re.sub(r"\s", "_", str(job.name)))
+        if job.wallTime is not None: fields += " walltime={0:.4f}".format(job.wallTime)
+        if scriptName is not None: fields += " script=" + os.path.abspath(scriptName)
+        if job.recordTag is not None: fields += " tag=" + job.recordTag
+        if job.scriptKey is not None: fields += " key=" + job.scriptKey
+        self.addLine(fields)
+
+    def addLine(self, fields):
+        """Add a job given as a line of key=value items (which must
+           include time, id, resource and batch) to the tracked jobs."""
+        try:
+            os.makedirs(self.__directory, exist_ok=True)
+            with open(self.fileName, "a") as jobFile:
+                jobFile.write(fields + "\n")
+        except (IOError, OSError) as strerror:
+            bolterror.printWarning("Could not add the job to the tracked jobs: {0}; {1}".format(self.fileName, strerror))
+
+    def readJobs(self, resourceName=None, tag=None):
+        """Read the tracked jobs, optionally for a single resource and/or
+           record tag.
+
+           Returns:
+              list jobs  - List of dictionaries, one per job, in the order
+                           they were submitted. A job ID reused by the
+                           batch system refers to the latest job.
+        """
+        jobs = {}
+        if not os.path.isfile(self.fileName):
+            return []
+        with open(self.fileName, "r") as jobFile:
+            for line in jobFile:
+                job = dict([item.partition("=")[::2] for item in line.split()])
+                if ("id" not in job) or ("batch" not in job): continue
+                if (resourceName is not None) and (job.get("resource") != resourceName): continue
+                if (tag is not None) and (job.get("tag") != tag): continue
+                jobs.pop(job["id"], None)
+                jobs[job["id"]] = job
+        return list(jobs.values())
+
+    def poll(self, batches, jobs, force=False):
+        """Find the status of jobs. Cached status is used for jobs that
+           have finished or were themselves polled within the lifetime of
+           the cache; the other jobs are queried with one status command
+           per batch system.
+
+           Arguments:
+              dict batches  - BoltBatch objects keyed by name
+              list jobs     - Jobs from readJobs
+              boolean force - Query the jobs that have not finished even
+                              if the cache is still valid
+
+           Returns:
+              dict status  - Maps job IDs to dictionaries with keys state,
+                             elapsed (seconds) and nodes
+        """
+        try:
+            os.makedirs(self.__directory, exist_ok=True)
+            lockFile = open(os.path.join(self.__directory, "status.lock"), "w")
+        except (IOError, OSError) as strerror:
+            bolterror.handleError("Opening status lock file in {0}; {1}".format(self.__directory, strerror))
+        with lockFile:
+            # Wait for any other bolt process that is polling
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+            cache = self.__readCache()
+            now = time.time()
+            queries = {}
+            for job in jobs:
+                known = cache["jobs"].get(job["id"])
+                # Each job has its own poll time, so polling a new job
+                # does not keep the cached status of the others fresh
+                stale = force or (now - cache["polled"].get(job["id"], 0) > self.__lifetime)
+                if (known is not None) and ((known["state"] in (DONE, FAILED)) or not stale): continue
+                queries.setdefault(job["batch"], []).append(job["id"])
+            if len(queries) > 0:
+                for batchName in sorted(queries):
+                    if batchName not in batches:
+                        bolterror.printWarning("Batch system {0} of tracked jobs is not defined.".format(batchName))
+                        continue
+                    cache["jobs"].update(queryJobs(batches[batchName], queries[batchName]))
+                    now = time.time()
+                    for jobID in queries[batchName]: cache["polled"][jobID] = now
+                self.__writeCache(cache)
+        return cache["jobs"]
+
+    def wait(self, batches, jobs, interval, report=None):
+        """Wait until all the jobs have finished, polling the status every
+           interval.
+
+           Arguments:
+              dict     batches  - BoltBatch objects keyed by name
+              list     jobs     - Jobs from readJobs
+              int      interval - Seconds between polls
+              function report   - Called with the status after each poll
+
+           Returns:
+              dict status  - The final status (as from poll)
+        """
+        while True:
+            status = self.poll(batches, jobs)
+            if report is not None: report(status)
+            states = [status.get(job["id"], {"state": UNKNOWN})["state"] for job in jobs]
+            if len([s for s in states if s in (QUEUED, RUNNING)]) == 0: return status
+            time.sleep(max(interval, 1))
+
+    def __readCache(self):
+        try:
+            with open(self.cacheName, "r") as cacheFile:
+                cache = json.load(cacheFile)
+            if ("polled" in cache) and ("jobs" in cache): return cache
+        except (IOError, ValueError):
+            pass
+        return {"polled": {}, "jobs": {}}
+
+    def __writeCache(self, cache):
+        tmpName = "{0}.{1}".format(self.cacheName, os.getpid())
+        try:
+            with open(tmpName, "w") as cacheFile:
+                json.dump(cache, cacheFile)
+            os.replace(tmpName, self.cacheName)
+        except (IOError, OSError) as strerror:
+            bolterror.printWarning("Could not cache job status: {0}; {1}".format(self.cacheName, strerror))
+
+def queryJobs(batch, jobIDs):
+    """Query the status of jobs with the status command of the batch
+       system. Jobs the batch system does not report are unknown.
+
+       Arguments:
+          BoltBatch  batch   - The batch system
+          list       jobIDs  - The job IDs
+
+       Returns:
+          dict status  - As BoltStatus.poll
+    """
+    if batch.statusCommand is None:
+        bolterror.handleError("Batch system {0} has no status command defined.".format(batch.name))
+    status = dict([(jobID, {"state": UNKNOWN, "elapsed": 0, "nodes": 0}) for jobID in jobIDs])
+    for start in range(0, len(jobIDs), MAX_QUERY):
+        jobs = batch.statusJobSeparator.join([shlex.quote(jobID) for jobID in jobIDs[start:start + MAX_QUERY]])
+        output = runCommand(batch.statusCommand.replace("{jobs}", jobs), "Status")
+        for jobID, values in parseStatus(batch, output).items():
+            if jobID in status: status[jobID] = values
+    return status
+
+def queuedJobs(batch):
+    """List the jobs of the user that are queued or running, with one
+       run of the queue command of the batch system. Jobs owned by other
+       users are left out if the output has an owner field.
+
+       Arguments:
+          BoltBatch  batch  - The batch system
+
+       Returns:
+          list jobs  - Dictionaries with the fields of the queue command
+                       output (e.g. id, qos and state), one per job
+    """
+    if batch.queueCommand is None:
+        bolterror.handleError("Batch system {0} has no queue command defined.".format(batch.name))
+    user = getpass.getuser()
+    output = runCommand(batch.queueCommand.replace("{user}", shlex.quote(user)), "Queue")
+    jobs = []
+    for values in parseFields(batch, output, batch.queueFields):
+        if values.get("owner", user).split("@")[0] != user: continue
+        if jobState(batch, values) not in (QUEUED, RUNNING): continue
+        jobs.append(values)
+    return jobs
+
+def runCommand(commandLine, description):
+    """Run a status or queue command and return its output"""
+    command = shlex.split(commandLine)
+    try:
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError as strerror:
+        bolterror.handleError("Running {0} command: {1}; {2}".format(description.lower(), " ".join(command), strerror))
+    if process.returncode != 0:
+        sys.stderr.write(process.stderr)
+        bolterror.handleError("{0} command failed ({1}): {2}".format(description, process.returncode, " ".join(command)))
+    return process.stdout
+
+def parseStatus(batch, output):
+    """Parse the output of a status command. In the 'delimited' format
+       each line is a job with the fields separated by the delimiter,
+       named in order by the status fields. In the 'keyvalue' format each
+       line is a job with key=value items separated by the delimiter and
+       the status fields map names to keys (e.g. 'state=job_state').
+
+       Arguments:
+          BoltBatch  batch   - The batch system
+          str        output  - The output of the status command
+
+       Returns:
+          dict status  - As BoltStatus.poll
+    """
+    status = {}
+    for values in parseFields(batch, output, batch.statusFields):
+        status[values["id"]] = {"state": jobState(batch, values), "elapsed": seconds(values.get("elapsed", "0")),
+                                "nodes": int(values["nodes"]) if values.get("nodes", "").isdigit() else 0}
+    return status
+
+def parseFields(batch, output, fields):
+    """Parse the output of a status or queue command into the named
+       fields of each job (see parseStatus). Lines without a job ID are
+       skipped.
+
+       Arguments:
+          BoltBatch  batch   - The batch system
+          str        output  - The output of the command
+          list       fields  - List of (name, key) for the fields
+
+       Returns:
+          list jobs  - Dictionaries of field values keyed by name
+    """
+    jobs = []
+    for line in output.split("\n"):
+        if line.strip() == "": continue
+        items = [item.strip() for item in line.split(batch.statusDelimiter)]
+        values = {}
+        if batch.statusFormat == "keyvalue":
+            pairs = {}
+            for item in items:
+                key, sep, value = item.partition("=")
+                if sep == "": key, sep, value = item.partition(":")
+                pairs[key.strip()] = value.strip()
+            for name, key in fields:
+                if key in pairs: values[name] = pairs[key]
+        else:
+            for i, (name, key) in enumerate(fields):
+                if i < len(items): values[name] = items[i]
+        if values.get("id", "") == "": continue
+        jobs.append(values)
+    return jobs
+
+def jobState(batch, values):
+    """The state of a job from its status fields"""
+    state = values.get("state", "").split(" ")[0].upper()
+    if state in batch.queuedStates: return QUEUED
+    if state in batch.runningStates: return RUNNING
+    if state in batch.failedStates: return FAILED
+    if values.get("exit", "0").split(":")[0] not in ("", "0"): return FAILED
+    if state == "": return UNKNOWN
+    return DONE
+
+def seconds(value):
+    """Convert an elapsed time ([d-]hh:mm:ss, mm:ss or seconds) to seconds"""
+    match = re.search(r"^(?:([0-9]+)-)?(?:([0-9]+):)?(?:([0-9]+):)?([0-9]+)(?:\.[0-9]*)?$", value.strip())
+    if match is None: return 0
+    days, first, second, secs = match.groups()
+    if second is None: hours, minutes = 0, first
+    else: hours, minutes = first, second
+    return int(days or 0) * 86400 + int(hours or 0) * 3600 + int(minutes or 0) * 60 + int(secs)
+
+def summary(jobs, status):
+    """Summarise the state of the jobs.
+
+       Returns:
+          dict summary  - Number of jobs in each state, total, the
+                          fraction finished and the node hours used
+    """
+    summary = dict([(state, 0) for state in (QUEUED, RUNNING, DONE, FAILED, UNKNOWN)])
+    nodeHours = 0.0
+    for job in jobs:
+        values = status.get(job["id"], {"state": UNKNOWN, "elapsed": 0, "nodes": 0})
+        summary[values["state"]] += 1
+        nodes = values["nodes"]
+        if nodes == 0: nodes = int(job.get("nodes", 0))
+        nodeHours += nodes * values["elapsed"] / 3600.0
+    summary["total"] = len(jobs)
+    summary["finished"] = 0.0
+    if len(jobs) > 0: summary["finished"] = float(summary[DONE] + summary[FAILED]) / len(jobs)
+    summary["nodeHours"] = nodeHours
+    return summary
+
+def summaryString(summary):
+    """The summary as text"""
+    text = "Jobs: {0} tracked\n".format(summary["total"])
+    for state in (QUEUED, RUNNING, DONE, FAILED, UNKNOWN):
+        text += "  {0:8s} {1:6d}\n".format(state, summary[state])
+    text += "Finished:        {0:.1f}%\n".format(100.0 * summary["finished"])
+    text += "Node hours used: {0:.1f}\n".format(summary["nodeHours"])
+    return text
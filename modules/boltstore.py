@@ -0,0 +1,210 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent a content-addressed store of job scripts
+
+This class is part of the bolt job submission script generation
+tool. A parameter sweep often generates the same job script many
+times. With the store switched on, each job is identified by a hash
+of everything that determines its script: the contents of the
+resource, batch system and code configuration files, the bolt
+version, the job shape and walltime, the job command (which contains
+the code arguments) and the optional features used. Rendered scripts
+are kept in the store under their hash and reused when the same job
+is generated again. An index file maps the job parameters to the
+hash so that the contents of the store can be listed.
+
+The same hash is added to the run record of recorded jobs so that a
+rerun of a sweep can skip the points that have already completed.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import hashlib
+import os
+import time
+import bolterror
+
+class BoltStore(object):
+    """This class represents the content-addressed store of job scripts."""
+    def __init__(self, directory):
+        """Setup the store.
+
+           Arguments:
+              str  directory  - The directory to keep the scripts in
+        """
+        self.__directory = os.path.expanduser(directory)
+
+    # Properties ==============================================================
+    @property
+    def directory(self):
+        """The directory the scripts are kept in"""
+        return self.__directory
+    @property
+    def indexName(self):
+        """The index file that maps job parameters to script hashes"""
+        return os.path.join(self.__directory, "index")
+
+    # Methods ==============================================================
+    def fileName(self, key):
+        """The file a script is stored in. Scripts are spread over
+           subdirectories named after the first two characters of the
+           hash to keep the directories small.
+
+           Arguments:
+              str  key  - The hash of the job
+        """
+        return os.path.join(self.__directory, key[:2], key)
+
+    def lookup(self, key):
+        """Return the stored script for a job.
+
+           Arguments:
+              str  key     - The hash of the job
+
+           Returns:
+              str  script  - The job script (None if not stored)
+        """
+        try:
+            with open(self.fileName(key), "r") as scriptFile:
+                return scriptFile.read()
+        except IOError:
+            return None
+
+    def save(self, key, script, params):
+        """Add a script to the store and the index. The script is written
+           to a temporary file and renamed so that a partly written
+           script is never reused.
+
+           Arguments:
+              str  key     - The hash of the job
+              str  script  - The job script
+              dict params  - The job parameters (from jobKey)
+        """
+        fileName = self.fileName(key)
+        try:
+            os.makedirs(os.path.dirname(fileName), exist_ok=True)
+            tmpName = "{0}.{1}".format(fileName, os.getpid())
+            with open(tmpName, "w") as scriptFile:
+                scriptFile.write(script)
+            os.replace(tmpName, fileName)
+            with open(self.indexName, "a") as indexFile:
+                indexFile.write(indexLine(key, params))
+        except (IOError, OSError) as strerror:
+            bolterror.printWarning("Could not add job script to the store: {0}; {1}".format(fileName, strerror))
+
+    def readIndex(self):
+        """Read the index of the store.
+
+           Returns:
+              dict index  - Maps each hash to the parameters of the job
+                        and the date it was stored
+        """
+        index = {}
+        if not os.path.isfile(self.indexName):
+            return index
+        with open(self.indexName, "r") as indexFile:
+            for line in indexFile:
+                items = line.rstrip("\n").split("\t")
+                if len(items) < 2: continue
+                params = {"date": items[1]}
+                for item in items[2:]:
+                    name, sep, value = item.partition("=")
+                    if sep != "": params[name] = value
+                index[items[0]] = params
+        return index
+
+def jobKey(job, resource, batch, code, configFiles, version, scriptPath=None):
+    """Compute the hash that identifies the job script of a fully
+       resolved job.
+
+       Arguments:
+          BoltJob      job         - The job (after the distribution is set)
+          BoltResource resource    - The resource the job is for
+          BoltBatch    batch       - The batch system the job is for
+          BoltCode     code        - The code (None if no code specified)
+          list         configFiles - The configuration files the job uses
+          str          version     - The bolt version
+          str          scriptPath  - The script file name (only used for
+                                     jobs that resubmit themselves)
+
+       Returns:
+          str  key     - The hash of the job
+          dict params  - The job parameters the hash was computed from
+    """
+    params = {}
+    params["resource"] = resource.name
+    params["batch"] = batch.name
+    params["code"] = "-"
+    if code is not None: params["code"] = code.name
+    params["parallel"] = str(job.isParallel)
+    params["tasks"] = str(job.pTasks)
+    params["tpn"] = str(job.pTasksPerNode)
+    params["threads"] = str(job.threads)
+    params["stride"] = str(job.pStride)
+    params["walltime"] = job.getWallTime(resource)
+    params["name"] = str(job.name)
+    params["account"] = str(job.accountID)
+    params["queue"] = str(job.queueName)
+    params["qos"] = str(job.qosName)
+    params["command"] = str(job.jobCommand)
+    if job.records is not None:
+        params["records"] = job.records.fileName
+        params["tag"] = str(job.recordTag)
+    if job.staging is not None: params["stage"] = job.staging.tier["name"]
+    if job.broadcast is not None: params["broadcast"] = "yes"
+    if job.striping is not None: params["stripes"] = str(job.striping.stripeCount)
+    if job.checkpoint is not None:
+        params["cycles"] = str(job.checkpoint.maxCycles)
+        params["script"] = os.path.abspath(scriptPath)
+    if job.coreSpec is not None: params["corespec"] = job.coreSpec.summaryString(resource)
+    if job.envCache is not None:
+        params["envcache"] = "{0}:{1}".format(job.envCache.directory, job.envCache.lifetime)
+
+    digest = hashlib.sha256()
+    digest.update(("bolt " + version + "\n").encode("utf-8"))
+    for fileName in configFiles:
+        with open(fileName, "rb") as configFile:
+            digest.update(configFile.read())
+        digest.update(b"\0")
+    for name in sorted(params):
+        digest.update("{0}={1}\n".format(name, params[name]).encode("utf-8"))
+    return digest.hexdigest(), params
+
+def indexLine(key, params):
+    """The index line for a stored script. Parameter values can contain
+       spaces (the job command) so the parameters are tab-separated."""
+    items = ["{0}={1}".format(name, params[name].replace("\t", " ").replace("\n", " ")) for name in sorted(params)]
+    return "{0}\t{1}\t{2}\n".format(key, time.strftime("%Y-%m-%d %H:%M:%S"), "\t".join(items))
+
+def completedKeys(records):
+    """The hashes of the jobs that have a successful run record. Runs
+       stopped at a checkpoint have not completed.
+
+       Arguments:
+          list records  - Run records from BoltRecords.readRecords
+
+       Returns:
+          set  keys     - The hashes of the completed jobs
+    """
+    keys = set()
+    for record in records:
+        if ("key" in record) and (record["status"] == 0) and \
+           (record.get("checkpointed", "0") == "0"):
+            keys.add(record["key"])
+    return keys
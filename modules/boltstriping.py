@@ -0,0 +1,120 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent the filesystem striping for a job
+
+This class is part of the bolt job submission script generation
+tool. Output written to shared files by a large job is limited by
+the number of storage targets the files are striped over. The
+stripe count is scaled with the number of nodes in the job (and the
+expected output size, if known) up to the limits of the filesystem.
+Codes that write one file per process are left with a single stripe
+per file. An MPI-IO hints file matching the layout is also written
+so that the collective buffering nodes line up with the stripes.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import math
+import bolterror
+
+class BoltStriping(object):
+    """This class represents the output layout for a single job."""
+    def __init__(self, resource, code, nodes):
+        """Compute the layout for a job.
+
+           Arguments:
+              BoltResource resource - The resource the job is for
+              BoltCode     code     - The code being run
+              int          nodes    - The number of nodes in the job
+        """
+        self.__directory = code.outputDir
+        self.__stripeSize = resource.stripeSize
+        limit = resource.storageTargets
+        if resource.maxStripeCount > 0: limit = min(limit, resource.maxStripeCount)
+        if code.outputPattern == "per process":
+            count = 1
+        else:
+            # One stripe per node, reduced if there is little output
+            count = nodes
+            if (code.outputSize > 0.0) and (resource.gbPerStripe > 0.0):
+                count = min(count, int(math.ceil(code.outputSize / resource.gbPerStripe)))
+        self.__stripeCount = max(1, min(count, limit))
+        self.__cbNodes = min(nodes, self.__stripeCount)
+        self.__isShared = code.outputPattern == "shared"
+
+    # Properties ==============================================================
+    @property
+    def directory(self):
+        """The output directory the layout is set on"""
+        return self.__directory
+    @property
+    def stripeCount(self):
+        """The number of storage targets to stripe over"""
+        return self.__stripeCount
+    @property
+    def stripeSize(self):
+        """The stripe size (e.g. '1M')"""
+        return self.__stripeSize
+    @property
+    def cbNodes(self):
+        """The number of collective buffering (aggregator) nodes"""
+        return self.__cbNodes
+
+    # Methods ==============================================================
+    def preambleLines(self, resource):
+        """The script lines that set the layout of the output directory
+           and write the MPI-IO hints file.
+
+           Arguments:
+              BoltResource resource - The resource the job is for
+
+           Returns:
+              str  text  - The script lines
+        """
+        text = "# Set the output layout: {0} stripes of {1} for {2}\n".format(
+                   self.stripeCount, self.stripeSize, self.directory)
+        text += "mkdir -p {0}\n".format(self.directory)
+        text += resource.layoutCommand.format(count=self.stripeCount, size=self.stripeSize,
+                                              directory=self.directory) + "\n"
+        if (resource.hintsVariable is None) or (not self.__isShared):
+            return text
+        hintsFile = "bolt_mpiio_hints"
+        text += "cat > {0} << EOF\n".format(hintsFile)
+        text += "romio_cb_write enable\n"
+        text += "romio_ds_write disable\n"
+        text += "cb_nodes {0}\n".format(self.cbNodes)
+        text += "striping_factor {0}\n".format(self.stripeCount)
+        text += "striping_unit {0}\n".format(sizeInBytes(self.stripeSize))
+        text += "EOF\n"
+        if "csh" in resource.shell:
+            text += "setenv {0} `pwd`/{1}\n".format(resource.hintsVariable, hintsFile)
+        else:
+            text += "export {0}=$(pwd)/{1}\n".format(resource.hintsVariable, hintsFile)
+        return text
+
+def sizeInBytes(size):
+    """Convert a size such as '1M' or '4m' to bytes."""
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    size = size.strip()
+    try:
+        if size[-1].upper() in units:
+            return int(size[:-1]) * units[size[-1].upper()]
+        return int(size)
+    except ValueError:
+        bolterror.handleError("Invalid stripe size: {0}. Use a number of bytes or a number followed by K, M or G.".format(size))
@@ -0,0 +1,132 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+Functions to submit job scripts to a batch system
+
+This module is part of the bolt job submission script generation
+tool. Scripts can be submitted from a file or streamed to the
+standard input of the submit command (sbatch and qsub both read a
+script from standard input) so that no script file is written. A
+copy of every submitted script can be appended to a compressed
+archive for provenance. Batch systems with a REST API configured are
+submitted to over HTTP instead (see boltrest).
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import gzip
+import os
+import subprocess
+import sys
+import time
+import bolterror
+from boltrest import BoltRestClient
+
+# REST clients keyed by batch system name, so that connections are
+# reused between submissions
+_clients = {}
+
+def submitFile(batch, fileName):
+    """Submit a job script file.
+
+       Arguments:
+          BoltBatch  batch     - The batch system to submit to
+          str        fileName  - The job script
+
+       Returns:
+          str  output  - The output of the submit command (e.g. the job ID)
+    """
+    return _run(batch.submitCommand.split() + [fileName], None)
+
+def submitStream(batch, script):
+    """Submit a job script by writing it to the standard input of the
+       submit command.
+
+       Arguments:
+          BoltBatch  batch   - The batch system to submit to
+          str        script  - The job script
+
+       Returns:
+          str  output  - The output of the submit command (e.g. the job ID)
+    """
+    return _run(batch.submitCommand.split(), script)
+
+def submitRest(batch, script):
+    """Submit a job script to the REST API of the batch system.
+
+       Arguments:
+          BoltBatch  batch   - The batch system to submit to
+          str        script  - The job script
+
+       Returns:
+          str  output  - The job ID
+    """
+    return restClient(batch).submit(script)
+
+def restClient(batch):
+    """The (shared) REST client for a batch system"""
+    if batch.name not in _clients:
+        _clients[batch.name] = BoltRestClient(batch)
+    return _clients[batch.name]
+
+def jobID(output):
+    """The job ID in the output of a submit command: the last word, less
+       any cluster name added by 'sbatch --parsable' (e.g. 'Submitted
+       batch job 1234' and '1234.pbs01' give '1234' and '1234.pbs01').
+
+       Arguments:
+          str  output  - The output of the submit command
+
+       Returns:
+          str  jobID   - The job ID (None if there is no output)
+    """
+    words = output.split()
+    if len(words) == 0: return None
+    return words[-1].split(";")[0]
+
+def archiveScript(fileName, script, description):
+    """Append a submitted script to a compressed archive. Each script is
+       preceded by a line starting '#### bolt submitted' and is a separate
+       gzip member, so the archive can be read with zcat.
+
+       Arguments:
+          str  fileName     - The archive file
+          str  script       - The job script
+          str  description  - Where the script was submitted (e.g. job ID)
+    """
+    fileName = os.path.expanduser(fileName)
+    try:
+        if not os.path.isdir(os.path.dirname(fileName)):
+            os.makedirs(os.path.dirname(fileName))
+        with gzip.open(fileName, "at") as archive:
+            archive.write("#### bolt submitted {0} {1}\n".format(time.strftime("%Y-%m-%dT%H:%M:%S"), description))
+            archive.write(script)
+    except (IOError, OSError) as strerror:
+        bolterror.printWarning("Could not archive the submitted script: {0}; {1}".format(fileName, strerror))
+
+def _run(command, script):
+    """Run the submit command and return its output"""
+    try:
+        process = subprocess.run(command, input=script, stdout=subprocess.PIPE, \
+                                 stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError as strerror:
+        bolterror.handleError("Running submit command: {0}; {1}".format(" ".join(command), strerror))
+    sys.stderr.write(process.stderr)
+    if process.returncode != 0:
+        bolterror.handleError("Submit command failed ({0}): {1}".format(process.returncode, " ".join(command)))
+    return process.stdout.strip()
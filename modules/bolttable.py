@@ -0,0 +1,171 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+Module for computing the table of job shapes for a resource
+
+This module is part of the bolt job submission script generation
+tool. The table lists every valid shape for a range of task counts
+on a resource: the nodes, tasks per node, tasks per die, stride and
+units charged, and the maximum walltime allowed. It applies the same
+rules as BoltJob.setParallelDistribution, BoltJob.checkTasks and
+BoltResource.maxJobTimeByNodes, but evaluates them over the whole
+grid at once with NumPy arrays, so tables with millions of shapes
+take seconds. NumPy is only needed for the table.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import bolterror
+
+# The columns of the table
+COLUMNS = ("tasks", "nodes", "tpn", "threads", "tpd", "stride", "units", "maxhours", "status")
+
+# Number of rows formatted at a time when writing CSV
+CSV_BLOCK = 65536
+
+# Values of the status column: 0 is a valid shape, others give the
+# check that fails
+STATUS = {0: "valid", 1: "hybrid jobs not supported", 2: "too many cores for the resource",
+          3: "too few cores for the resource", 4: "too many cores for the code",
+          5: "too few cores for the code", 6: "no walltime allowed for this number of nodes"}
+
+def importNumpy():
+    """Import NumPy, stopping with an error if it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        bolterror.handleError("The shape table needs the NumPy python module, which is not installed.")
+    return numpy
+
+def shapeTable(resource, minTasks, maxTasks, threadsList, code=None):
+    """Compute the shapes of parallel jobs for a range of task counts.
+       Every number of tasks per node that fits on a node is included
+       for each number of threads.
+
+       Arguments:
+          BoltResource resource    - The resource
+          int          minTasks    - The smallest number of tasks
+          int          maxTasks    - The largest number of tasks
+          list         threadsList - The numbers of threads per task
+          BoltCode     code        - The code (None if no code)
+
+       Returns:
+          ndarray table  - Integer array with one row per shape and the
+                           columns in COLUMNS
+    """
+    np = importNumpy()
+    logicalCores = resource.numLogicalCoresPerNode()
+    cores = resource.numCoresPerNode()
+    coresPerDie = resource.coresPerDie
+    diesPerNode = resource.socketsPerNode * resource.diesPerSocket
+
+    blocks = []
+    allTasks = np.arange(max(1, minTasks), maxTasks + 1, dtype=np.int64)
+    for threads in threadsList:
+        maxTpn = logicalCores // threads
+        if maxTpn < 1: continue
+        tasks, tpn = np.meshgrid(allTasks, np.arange(1, maxTpn + 1, dtype=np.int64), indexing="ij")
+        # More tasks per node than tasks is the same shape as fewer
+        keep = tpn <= tasks
+        tasks = tasks[keep]
+        tpn = tpn[keep]
+        nodes = -(-tasks // tpn)
+
+        # Tasks per die (0 if the tasks cannot be divided between dies)
+        tpd = np.where(tpn % diesPerNode == 0, tpn // diesPerNode, 0)
+
+        # Stride, following BoltJob.setParallelDistribution
+        if threads > 1:
+            stride = np.full(tasks.shape, threads, dtype=np.int64)
+        else:
+            safeTpd = np.maximum(tpd, 1)
+            if (code is not None) and code.memoryBound:
+                noDie = np.maximum(1, cores // tpn)
+            else:
+                noDie = np.where(cores // tpn > resource.preferredStride, np.minimum(tpn, resource.preferredStride), 1)
+            if resource.useStrideOptionForUnderpop:
+                withDie = np.where((coresPerDie // safeTpd > 1) & (coresPerDie % safeTpd == 0), coresPerDie // safeTpd, 1)
+            else:
+                withDie = np.where(coresPerDie // safeTpd >= resource.preferredStride, np.minimum(safeTpd, resource.preferredStride), 1)
+            stride = np.where(tpd == 0, noDie, withDie)
+
+        # Units charged, following the batch options
+        if resource.parallelBatchUnit == "nodes":
+            units = nodes
+        elif resource.nodeExclusive:
+            units = nodes * cores
+        else:
+            units = tasks.copy()
+
+        # Maximum walltime, looked up by number of nodes
+        usedCores = nodes * cores
+        maxNodes = int(min(nodes.max(), resource.maxTasks // max(cores, 1) + 1))
+        limits = np.array([resource.maxJobTimeByNodes(n) for n in range(maxNodes + 1)], dtype=np.int64)
+        maxHours = limits[np.minimum(nodes, maxNodes)]
+
+        # Checks, following BoltJob.checkTasks (the first failure is kept)
+        status = np.zeros(tasks.shape, dtype=np.int64)
+        if (threads > 1) and (not resource.hybridJobs):
+            status[tasks > 1] = 1
+        checks = [(usedCores > resource.maxTasks, 2), (usedCores < resource.minTasks, 3)]
+        if code is not None:
+            if code.maxTasks > 0: checks.append((usedCores > code.maxTasks, 4))
+            if code.minTasks > 0: checks.append((usedCores < code.minTasks, 5))
+        checks.append((maxHours <= 0, 6))
+        for failed, value in checks:
+            status[(status == 0) & failed] = value
+
+        blocks.append(np.stack([tasks, nodes, tpn, np.full(tasks.shape, threads, dtype=np.int64),
+                                tpd, stride, units, maxHours, status], axis=1))
+
+    if len(blocks) == 0:
+        return np.zeros((0, len(COLUMNS)), dtype=np.int64)
+    table = np.concatenate(blocks)
+    # Order by tasks then threads then tasks per node: the blocks are
+    # in threads order and sorted by tasks then tasks per node, so a
+    # stable sort on the tasks is enough
+    return table[np.argsort(table[:, 0], kind="stable")]
+
+def writeTable(fileName, table):
+    """Write the table as CSV or, if the file name ends in '.npy', as a
+       binary NumPy array (the columns are in COLUMNS).
+
+       Arguments:
+          str      fileName  - The file to write to (None for standard output)
+          ndarray  table     - The table from shapeTable
+    """
+    import sys
+    np = importNumpy()
+    try:
+        if (fileName is not None) and fileName.endswith(".npy"):
+            np.save(fileName, table)
+            return
+        tableFile = sys.stdout
+        if fileName is not None: tableFile = open(fileName, "w")
+        tableFile.write(",".join(COLUMNS) + "\n")
+        # Format blocks of rows with a single format string, which is
+        # much faster than formatting each row
+        rowFormat = ",".join(["%d"] * len(COLUMNS)) + "\n"
+        blockFormat = rowFormat * CSV_BLOCK
+        for start in range(0, table.shape[0], CSV_BLOCK):
+            block = table[start:start + CSV_BLOCK]
+            if block.shape[0] < CSV_BLOCK: blockFormat = rowFormat * block.shape[0]
+            tableFile.write(blockFormat % tuple(block.ravel().tolist()))
+        if fileName is not None: tableFile.close()
+    except IOError as strerror:
+        bolterror.handleError("Writing shape table: {0}; {1}".format(fileName, strerror))
@@ -0,0 +1,273 @@
+#----------------------------------------------------------------------
+# Copyright 2012-2020 EPCC, The University of Edinburgh
+#
+# This file is part of bolt.
+#
+# bolt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# bolt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with bolt.  If not, see <http://www.gnu.org/licenses/>.
+#----------------------------------------------------------------------
+"""
+A python class to represent tuned default layouts
+
+This class is part of the bolt job submission script generation
+tool. An autotune run times a small matrix of node layouts (tasks
+per node, threads per task and task stride) for a code on a
+resource. The winning layout is stored as a new version in a file
+that uses the [ConfigParser] module, together with the node geometry
+of the resource at the time, so the history shows when a change to
+the system moves the optimum. The latest version is used as the
+default layout for the code on the resource.
+"""
+__author__ = "A. R. Turner, EPCC"
+
+import os
+import re
+import time
+import bolterror
+
+# The record tag of an autotune run (a time stamp) and the pattern that
+# matches it
+TAG_FORMAT = "tune%Y%m%dT%H%M%S"
+TAG_PATTERN = r"^tune[0-9]{8}T[0-9]{6}$"
+
+class BoltTune(object):
+    """This class represents the tuned layouts for a code on a resource."""
+    def __init__(self, codeName=None, resourceName=None):
+        """The default constructor - setup an empty set of versions.
+
+           Arguments:
+              str  codeName     - The code the layouts are for
+              str  resourceName - The resource the layouts are for
+        """
+        self.__codeName = codeName
+        self.__resourceName = resourceName
+        self.__versions = []
+
+    # Properties ==============================================================
+    @property
+    def codeName(self):
+        """The name of the code the layouts are for"""
+        return self.__codeName
+    @property
+    def resourceName(self):
+        """The name of the resource the layouts are for"""
+        return self.__resourceName
+    @property
+    def versions(self):
+        """List of tuned versions, oldest first. Each version is a
+        dictionary with keys: version, date, tag, geometry, nodes, tpn,
+        threads, stride, runtime and results"""
+        return self.__versions
+    @property
+    def current(self):
+        """The latest tuned version (None if not tuned)"""
+        if len(self.__versions) == 0: return None
+        return self.__versions[-1]
+
+    # Methods ==============================================================
+    def readConfig(self, fileName):
+        """Read the tuned versions from a file that uses the ConfigParser
+           module.
+
+           Arguments:
+              str  fileName  - The file to read the tuned versions from
+        """
+        import configparser
+
+        tuneConfig = configparser.ConfigParser(inline_comment_prefixes=(";",))
+        tuneConfig.read(fileName)
+
+        self.__codeName = tuneConfig.get("tune info", "code")
+        self.__resourceName = tuneConfig.get("tune info", "resource")
+        self.__versions = []
+        for section in tuneConfig.sections():
+            if not section.startswith("version "): continue
+            version = {}
+            version["version"] = int(section.split()[1])
+            version["date"] = tuneConfig.get(section, "date")
+            version["tag"] = tuneConfig.get(section, "tag")
+            version["geometry"] = tuneConfig.get(section, "node geometry")
+            version["nodes"] = tuneConfig.getint(section, "nodes")
+            version["tpn"] = tuneConfig.getint(section, "tasks per node")
+            version["threads"] = tuneConfig.getint(section, "threads")
+            version["stride"] = tuneConfig.getint(section, "stride")
+            version["runtime"] = tuneConfig.getfloat(section, "runtime")
+            version["results"] = tuneConfig.get(section, "results")
+            self.__versions.append(version)
+        self.__versions.sort(key=lambda v: v["version"])
+
+    def writeConfig(self, fileName):
+        """Write the tuned versions to a file that uses the ConfigParser
+           module.
+
+           Arguments:
+              str  fileName  - The file to write the tuned versions to
+        """
+        import configparser
+
+        tuneConfig = configparser.ConfigParser()
+        tuneConfig.add_section("tune info")
+        tuneConfig.set("tune info", "code", self.codeName)
+        tuneConfig.set("tune info", "resource", self.resourceName)
+        for version in self.__versions:
+            section = "version {0}".format(version["version"])
+            tuneConfig.add_section(section)
+            tuneConfig.set(section, "date", version["date"])
+            tuneConfig.set(section, "tag", version["tag"])
+            tuneConfig.set(section, "node geometry", version["geometry"])
+            tuneConfig.set(section, "nodes", str(version["nodes"]))
+            tuneConfig.set(section, "tasks per node", str(version["tpn"]))
+            tuneConfig.set(section, "threads", str(version["threads"]))
+            tuneConfig.set(section, "stride", str(version["stride"]))
+            tuneConfig.set(section, "runtime", "{0:.1f}".format(version["runtime"]))
+            tuneConfig.set(section, "results", version["results"])
+
+        try:
+            with open(fileName, "w") as tuneFile:
+                tuneFile.write("# Tuned layouts written by bolt autotune. The latest\n")
+                tuneFile.write("# version is used as the default layout.\n")
+                tuneConfig.write(tuneFile)
+        except IOError as strerror:
+            bolterror.handleError("Writing tuned layouts: {0}; {1}".format(fileName, strerror))
+
+    def hasTag(self, tag):
+        """Has the autotune run with this tag already been selected?"""
+        return tag in [v["tag"] for v in self.__versions]
+
+    def addVersion(self, tag, resource, results):
+        """Add a new version from the results of an autotune run.
+
+           Arguments:
+              str          tag      - The record tag of the autotune run
+              BoltResource resource - The resource that was tuned
+              dict         results  - Results from tuneResults
+
+           Returns:
+              dict  version  - The new version
+        """
+        best = min(results, key=lambda k: results[k][0])
+        version = {}
+        version["version"] = len(self.__versions) + 1
+        if len(self.__versions) > 0: version["version"] = self.__versions[-1]["version"] + 1
+        version["date"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        version["tag"] = tag
+        version["geometry"] = geometryString(resource)
+        version["nodes"] = results[best][2]
+        version["tpn"], version["threads"], version["stride"] = best
+        version["runtime"] = results[best][0]
+        version["results"] = ", ".join(["{0}x{1}x{2}={3:.1f}".format(k[0], k[1], k[2], results[k][0]) \
+                                        for k in sorted(results)])
+        self.__versions.append(version)
+        return version
+
+def tunedFileName(historyDir, codeName, resourceName):
+    """The name of the file used to store the tuned layouts for a code on
+       a resource. Tuned layouts come from the run records of each user,
+       so they are kept with the records in the bolt history directory.
+
+       Arguments:
+          str  historyDir    - The bolt history directory
+          str  codeName      - The name of the code
+          str  resourceName  - The name of the resource
+    """
+    return os.path.join(os.path.expanduser(historyDir), "tuned", "{0}.{1}.tuned".format(codeName, resourceName))
+
+def siteTunedFileName(codeConfigDir, codeName, resourceName):
+    """The name of tuned layouts for a code on a resource installed with
+       the code configurations. Installed layouts are only read: they are
+       used when the user has not tuned the code.
+
+       Arguments:
+          str  codeConfigDir - The code configuration directory
+          str  codeName      - The name of the code
+          str  resourceName  - The name of the resource
+    """
+    return os.path.join(codeConfigDir, "{0}.{1}.tuned".format(codeName, resourceName))
+
+def newTag():
+    """The record tag for a new autotune run"""
+    return time.strftime(TAG_FORMAT)
+
+def isTuneTag(tag):
+    """Is a record tag that of an autotune run (and not a tag chosen by
+       the user)?"""
+    return re.search(TAG_PATTERN, tag) is not None
+
+def geometryString(resource):
+    """A string describing the node geometry of a resource, used to spot
+       when the hardware has changed since a layout was tuned.
+
+       Arguments:
+          BoltResource resource - The resource
+    """
+    return "{0} sockets x {1} dies x {2} cores x {3} threads".format(resource.socketsPerNode, \
+               resource.diesPerSocket, resource.coresPerDie, resource.threadsPerCore)
+
+def variants(resource, hybrid):
+    """The matrix of node layouts to time for a resource. For each number
+       of threads per task the node is filled and half filled, and tasks
+       are both packed (stride = threads) and spread evenly over the node.
+
+       Arguments:
+          BoltResource resource - The resource to tune for
+          boolean      hybrid   - Can tasks use more than one thread?
+
+       Returns:
+          list  layouts  - List of (tasks per node, threads, stride)
+    """
+    coresPerNode = resource.numCoresPerNode()
+    threadsList = [1]
+    if hybrid:
+        threads = 2
+        while threads <= min(resource.coresPerDie, coresPerNode // 2):
+            if coresPerNode % threads == 0: threadsList.append(threads)
+            threads *= 2
+    layouts = []
+    for threads in threadsList:
+        for fill in (1, 2):
+            tpn = coresPerNode // (threads * fill)
+            if tpn < 1: continue
+            for stride in (threads, coresPerNode // tpn):
+                if (tpn, threads, stride) not in layouts:
+                    layouts.append((tpn, threads, stride))
+    return layouts
+
+def tuneResults(records, tag):
+    """Collect the runtimes of the layouts in an autotune run.
+
+       Arguments:
+          list records  - Run records from BoltRecords.readRecords
+          str  tag      - The record tag of the autotune run
+
+       Returns:
+          dict results  - Maps (tasks per node, threads, stride) to
+                          (mean runtime, number of runs, nodes)
+    """
+    runs = {}
+    for record in records:
+        if (record.get("tag") != tag) or (record["status"] != 0) or \
+           (record.get("checkpointed", "0") != "0"): continue
+        key = (record["tpn"], record["threads"], record.get("stride", 1))
+        runs.setdefault(key, []).append(record)
+    results = {}
+    for key in runs:
+        runtimes = [r["runtime"] for r in runs[key]]
+        results[key] = (float(sum(runtimes)) / len(runtimes), len(runtimes), runs[key][0]["nodes"])
+    return results
+
+def latestTag(records):
+    """The tag of the most recent autotune run in a list of records (None
+       if there are no autotune runs)."""
+    for record in reversed(records):
+        if isTuneTag(record.get("tag", "")): return record["tag"]
+    return None
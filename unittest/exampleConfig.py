@@ -0,0 +1,42 @@
+"""
+Switch on the example sections that are shipped commented out in the
+resource configurations, so that the tests can use them. The options
+of an example are written '#option: value'; explanatory comments are
+written '# text' and are left alone.
+"""
+import os
+import re
+import tempfile
+
+def enableExamples(fileName, sections, replacements=None):
+    """Write a copy of a configuration file with the commented out
+       sections switched on.
+
+       Arguments:
+          str  fileName     - The configuration file
+          list sections     - Names of the sections to switch on
+          dict replacements - New values of options in the sections
+
+       Returns:
+          str  copyName  - The file name of the copy
+    """
+    if replacements is None: replacements = {}
+    with open(fileName, "r") as configFile:
+        lines = configFile.read().split("\n")
+    active = False
+    for i, line in enumerate(lines):
+        match = re.search(r"^#\[(.*)\]\s*$", line)
+        if match is not None:
+            active = match.group(1) in sections
+        elif line.startswith("#---"):
+            active = False
+        if not active: continue
+        match = re.search(r"^#(\[.*\]|([a-z][a-z ]*):.*)$", line)
+        if match is None: continue
+        lines[i] = line[1:]
+        if match.group(2) in replacements:
+            lines[i] = "{0}: {1}".format(match.group(2), replacements[match.group(2)])
+    copyName = os.path.join(tempfile.mkdtemp(), os.path.basename(fileName))
+    with open(copyName, "w") as configFile:
+        configFile.write("\n".join(lines))
+    return copyName
@@ -0,0 +1,85 @@
+"""
+A local stand-in for a scheduler REST daemon, used to test and
+benchmark REST submission. It accepts posted job scripts in the
+slurmrestd format, checks the access token and replies with a new job
+ID. It listens on a TCP port on localhost or on a UNIX socket.
+"""
+import http.server
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    # Keep connections open between requests
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        http.server.BaseHTTPRequestHandler.setup(self)
+        # The headers and body of a reply are written separately
+        if self.connection.family != socket.AF_UNIX:
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length).decode("utf-8"))
+        if self.headers.get(self.server.tokenHeader) != self.server.token:
+            self.reply(401, {"errors": [{"error": "authentication failed"}]})
+        elif not request.get("script", "").startswith("#!"):
+            self.reply(500, {"errors": [{"error": "script is missing the shell line"}]})
+        else:
+            jobID = next(self.server.jobIDs)
+            with self.server.lock:
+                self.server.scripts[jobID] = request
+            self.reply(200, {"job_id": jobID, "errors": []})
+
+    def reply(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        return "stand-in"
+
+    def log_message(self, format, *args):
+        pass
+
+class TCPStandIn(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class UnixStandIn(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def start(token, tokenHeader="X-SLURM-USER-TOKEN", socketPath=None):
+    """Start a stand-in server in a background thread.
+
+       Returns:
+          server  - The server; server.url is the endpoint to use (the
+                    path only for a UNIX socket), server.scripts the
+                    submitted requests keyed by job ID and
+                    server.connections the number of connections made
+    """
+    if socketPath is None:
+        server = TCPStandIn(("127.0.0.1", 0), StandInHandler)
+        server.url = "http://127.0.0.1:{0}/slurm/v0.0.40/job/submit".format(server.server_address[1])
+    else:
+        if os.path.exists(socketPath): os.remove(socketPath)
+        server = UnixStandIn(socketPath, StandInHandler)
+        server.url = "/slurm/v0.0.40/job/submit"
+    server.token = token
+    server.tokenHeader = tokenHeader
+    server.jobIDs = itertools.count(1000)
+    server.scripts = {}
+    server.connections = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
@@ -7,3 +7,26 @@ export BOLT_DIR=..
 export PYTHONPATH=$BOLT_DIR/modules
 python testJob.py
 python testDistribution.py
+python testModel.py
+python testTune.py
+python testStaging.py
+python testBroadcast.py
+python testStriping.py
+python testCheckpoint.py
+python testEnvCache.py
+python testScript.py
+python testSubmit.py
+python testStore.py
+python testCheck.py
+python testTable.py
+python testRest.py
+python testStatus.py
+python testDatabase.py
+python testFeed.py
+python testSim.py
+python testDiscover.py
+python testNodeClass.py
+python testRank.py
+python testChunks.py
+python testNetwork.py
+python testCoreSpec.py
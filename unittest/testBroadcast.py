@@ -0,0 +1,39 @@
+import unittest
+import os
+from boltbroadcast import BoltBroadcast as Broadcast
+from boltresource import BoltResource as Resource
+from boltjob import BoltJob as Job
+
+configDir = "/unittest/configuration"
+resourceConfig = "test.resource"
+
+class BroadcastTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resource = Resource()
+        rootDir = os.environ['BOLT_DIR']
+        self.resource.readConfig(rootDir + configDir + "/" + resourceConfig)
+        self.job = Job()
+
+    def testExecutable(self):
+        """The executable is broadcast with its libraries and launched locally."""
+        broadcast = Broadcast(self.resource, "--hint=nomultithread cp2k.popt -i in.inp")
+        self.assertEqual(broadcast.jobCommand, "--hint=nomultithread /local/cp2k.popt -i in.inp")
+        text = broadcast.broadcastLines(self.job, self.resource)
+        correct = "sbcast --send-libs $(command -v cp2k.popt) /local/cp2k.popt\n" \
+                  "export LD_LIBRARY_PATH=/local/cp2k.popt_libs${LD_LIBRARY_PATH:+:${LD_LIBRARY_PATH}}\n"
+        self.assertEqual(text, correct, "Value= '{0}', Expected= '{1}'".format(text, correct))
+
+    def testContainer(self):
+        """Container images are broadcast instead of the executable."""
+        broadcast = Broadcast(self.resource, "singularity exec images/app.sif ./run")
+        assert broadcast.isContainer, "Image should be detected."
+        self.assertEqual(broadcast.files, [("images/app.sif", "/local/app.sif")])
+        self.assertEqual(broadcast.broadcastLines(self.job, self.resource), "sbcast images/app.sif /local/app.sif\n")
+
+def suite():
+    suite = unittest.makeSuite(BroadcastTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
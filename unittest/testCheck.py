@@ -0,0 +1,54 @@
+import unittest
+import os
+import boltcheck
+from boltcheck import BoltCheck as Check
+from boltresource import BoltResource as Resource
+from boltbatch import BoltBatch as Batch
+
+configDir = "/unittest/configuration"
+resourceConfig = "test.resource"
+batchConfig = "test.batch"
+
+class CheckTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rootDir = os.environ['BOLT_DIR']
+        self.resource = Resource()
+        self.resource.readConfig(rootDir + configDir + "/" + resourceConfig)
+        self.batch = Batch()
+        self.batch.readConfig(rootDir + configDir + "/" + batchConfig)
+
+    def testOptions(self):
+        """Options are read with or without a space after the option name."""
+        options = boltcheck.parseOptions("#!/bin/bash\n#PBS -Nmyjob\n#PBS -q standard\n#PBS -l mppwidth=64\n", self.batch)
+        self.assertEqual(options, {"name": "myjob", "queue": "standard", "units": "64"})
+
+    def testTime(self):
+        """Walltimes with days are converted to hours."""
+        self.assertEqual(boltcheck.hmsString("1-02:30:00", "hms"), "26:30:0")
+        self.assertEqual(boltcheck.hmsString("3600", "seconds"), "1:0:0")
+
+    def testViolation(self):
+        """Walltimes longer than allowed for the job size are errors."""
+        check = Check("a.pbs", "#!/bin/bash\n#PBS -l mppwidth=64\n#PBS -l walltime=30:00:00\n", self.resource, self.batch)
+        self.assertEqual(check.nodes, 2)
+        self.assertEqual(check.wallTime, 30.0)
+        self.assertEqual([m[0] for m in check.messages], ["error"])
+        assert "(12 hours)" in check.messages[0][1], check.messages[0][1]
+
+    def testWaste(self):
+        """Cores left idle on the allocated nodes are reported as waste."""
+        check = Check("b.pbs", "#!/bin/bash\n#PBS -l mppwidth=48\n#PBS -l walltime=2:00:00\n", self.resource, self.batch)
+        self.assertEqual(check.messages, [])
+        self.assertEqual(check.idleCores, 16)
+        self.assertEqual(check.wastedNodeHours, 1.0)
+        summary = boltcheck.summary([check.report()])
+        self.assertEqual(summary["withErrors"], 0)
+        self.assertEqual(summary["nodeHours"], 4.0)
+
+def suite():
+    suite = unittest.makeSuite(CheckTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
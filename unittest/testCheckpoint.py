@@ -0,0 +1,48 @@
+import unittest
+import os
+from boltcheckpoint import BoltCheckpoint as Checkpoint
+from boltresource import BoltResource as Resource
+from boltbatch import BoltBatch as Batch
+from boltcode import BoltCode as Code
+from boltjob import BoltJob as Job
+
+configDir = "/unittest/configuration"
+
+class CheckpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rootDir = os.environ['BOLT_DIR']
+        self.resource = Resource()
+        self.resource.readConfig(rootDir + configDir + "/test.resource")
+        self.batch = Batch()
+        self.batch.readConfig(rootDir + configDir + "/test.batch")
+        self.code = Code()
+        self.code.readConfig(rootDir + configDir + "/test.code")
+        self.job = Job()
+        self.job.setWallTime("1:0:0")
+        self.checkpoint = Checkpoint(self.code, ["in", "out"], "/work/job.bolt", self.code.maxCycles)
+
+    def testOptions(self):
+        """The signal option and restart line come from the configuration."""
+        self.assertEqual(self.checkpoint.signal, "USR1")
+        text = self.checkpoint.optionLines(self.batch)
+        assert text.endswith(" --signal=B:USR1@600\n"), "Value= '{0}'".format(text)
+        self.assertEqual(self.checkpoint.restartLine("srun a.out -i in -o out"), "srun a.out -i in -o out --restart")
+
+    def testLoop(self):
+        """The code runs in the background and the job resubmits itself."""
+        text = self.checkpoint.runLines(self.job, self.batch, self.resource, "srun a.out -i in -o out")
+        assert "srun a.out -i in -o out --restart &\n" in text, "Restart line missing."
+        assert "trap 'BOLT_SIGNALLED=1; kill -USR1 ${BOLT_PID} 2>/dev/null' USR1" in text, "Trap missing."
+        assert "sleep" not in text, "Timer not needed when the batch system sends the signal."
+        text = self.checkpoint.resubmitLines(self.batch, self.resource)
+        assert "if grep -q DONE out; then" in text, "Completion check missing."
+        assert "[ ${BOLT_CYCLE} -lt 4 ]" in text, "Cycle limit missing."
+        assert "sbatch --export=ALL,BOLT_CYCLE=$((BOLT_CYCLE + 1)) /work/job.bolt" in text, "Resubmit missing."
+
+def suite():
+    suite = unittest.makeSuite(CheckpointTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import os
+import boltcheck
+from boltjob import BoltJob as Job
+from boltbatch import BoltBatch as Batch
+from boltresource import BoltResource as Resource
+
+class DieResource(Resource):
+    """ARCHER with one PBS virtual node per die"""
+    @property
+    def chunkUnit(self):
+        return "die"
+
+class SharedResource(Resource):
+    """ARCHER with nodes shared between jobs"""
+    @property
+    def nodeExclusive(self):
+        return False
+
+class ChunkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        configDir = os.path.join(os.environ['BOLT_DIR'], "configuration")
+        self.resourceFile = os.path.join(configDir, "resources", "ARCHER.resource")
+        self.resource = Resource()
+        self.resource.readConfig(self.resourceFile)
+        self.batch = Batch()
+        self.batch.readConfig(os.path.join(configDir, "batch", "PBSPro_select.batch"))
+
+    def distribute(self, resource, tasks, tpn, threads=1):
+        job = Job()
+        job.setTasks(tasks)
+        job.setTasksPerNode(tpn)
+        job.setThreads(threads)
+        job.setIsParallel(True)
+        job.setParallelJobLauncher(resource.distribJobLauncher)
+        job.setParallelDistribution(resource, self.batch)
+        return job.pBatchOptions.split("\n")[:2]
+
+    def testNodeChunks(self):
+        """One chunk per node with the tasks and threads of the job."""
+        self.assertEqual(self.distribute(self.resource, 48, 24),
+                         ["#PBS -l select=2:ncpus=24:mpiprocs=24:ompthreads=1", "#PBS -l place=scatter:excl"])
+        self.assertEqual(self.distribute(self.resource, 30, 6, 4)[0], "#PBS -l select=5:ncpus=24:mpiprocs=6:ompthreads=4")
+
+    def testRemainder(self):
+        """A partly filled last node is a chunk of its own."""
+        self.assertEqual(self.distribute(self.resource, 100, 24)[0],
+                         "#PBS -l select=4:ncpus=24:mpiprocs=24:ompthreads=1+1:ncpus=24:mpiprocs=4:ompthreads=1")
+        resource = SharedResource()
+        resource.readConfig(self.resourceFile)
+        self.assertEqual(self.distribute(resource, 100, 24),
+                         ["#PBS -l select=4:ncpus=24:mpiprocs=24:ompthreads=1+1:ncpus=4:mpiprocs=4:ompthreads=1",
+                          "#PBS -l place=scatter:shared"])
+
+    def testDieChunks(self):
+        """Chunks per die when the tasks divide evenly between the dies."""
+        resource = DieResource()
+        resource.readConfig(self.resourceFile)
+        self.assertEqual(self.distribute(resource, 50, 12),
+                         ["#PBS -l select=8:ncpus=12:mpiprocs=6:ompthreads=1+1:ncpus=12:mpiprocs=2:ompthreads=1",
+                          "#PBS -l place=vscatter:exclhost"])
+        # Uneven tasks per die fall back to chunks per node
+        self.assertEqual(self.distribute(resource, 14, 7)[0], "#PBS -l select=2:ncpus=24:mpiprocs=7:ompthreads=1")
+
+    def testCheck(self):
+        """Job scripts with chunks are checked."""
+        check = boltcheck.BoltCheck("a.pbs", "#!/bin/bash\n#PBS -l select=4:ncpus=24:mpiprocs=24:ompthreads=1+" \
+                                    "1:ncpus=24:mpiprocs=4:ompthreads=1\n#PBS -l walltime=1:00:00\n",
+                                    self.resource, self.batch)
+        self.assertEqual((check.nodes, check.idleCores, check.messages), (5, 20, []))
+        self.assertEqual(boltcheck.parseChunks("2:ncpus=8+ncpus=4"), [(2, {"ncpus": "8"}), (1, {"ncpus": "4"})])
+        self.assertIsNone(boltcheck.parseChunks("16"))
+
+if __name__ == "__main__":
+    unittest.main()
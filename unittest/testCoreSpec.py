@@ -0,0 +1,115 @@
+import unittest
+import os
+import bolterror
+import boltcorespec
+import boltselect
+from boltcorespec import BoltCoreSpec as CoreSpec
+from boltjob import BoltJob as Job
+from boltbatch import BoltBatch as Batch
+from boltresource import BoltResource as Resource
+
+class BindingResource(Resource):
+    """ARCHER2 with a launcher that can bind tasks to cores"""
+    @property
+    def cpuMapOption(self):
+        return "--cpu-bind=map_cpu:"
+    @property
+    def cpuMaskOption(self):
+        return "--cpu-bind=mask_cpu:"
+
+class CoreSpecTestCase(unittest.TestCase):
+
+    def setUp(self):
+        configDir = os.path.join(os.environ['BOLT_DIR'], "configuration")
+        self.resourceFile = os.path.join(configDir, "resources", "ARCHER2.resource")
+        self.resource = Resource()
+        self.resource.readConfig(self.resourceFile)
+        self.batch = Batch()
+        self.batch.readConfig(os.path.join(configDir, "batch", "Slurm.batch"))
+
+    def distribute(self, resource, spec, tasks, tpn, threads=1):
+        job = Job()
+        job.setTasks(tasks)
+        job.setTasksPerNode(tpn)
+        job.setThreads(threads)
+        job.setCoreSpec(CoreSpec(spec))
+        job.setIsParallel(True)
+        job.setParallelJobLauncher(resource.distribJobLauncher)
+        job.setParallelDistribution(resource, self.batch)
+        return job
+
+    def testParse(self):
+        """Reservations are per node or per die."""
+        self.assertEqual(boltcorespec.parseSpec("2"), (2, False))
+        self.assertEqual(boltcorespec.parseSpec("1/die"), (1, True))
+        self.assertEqual(boltcorespec.parseSpec("1/node"), (1, False))
+        messages = []
+        previous = bolterror.collectMessages(messages)
+        try:
+            self.assertRaises(bolterror.BoltError, boltcorespec.parseSpec, "1/socket")
+        finally:
+            bolterror.collectMessages(previous)
+        spec = CoreSpec("1/die")
+        self.assertEqual((spec.reservedPerNode(self.resource), spec.availableCores(self.resource)), (8, 120))
+        self.assertEqual(spec.availableLogicalCores(self.resource), 120 * self.resource.threadsPerCore)
+
+    def testPlan(self):
+        """Cores reserved per node go to the dies with the most idle cores."""
+        self.assertEqual(CoreSpec("1").reservedPlan(self.resource, 127, 1), [0, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(CoreSpec("2").reservedPlan(self.resource, 126, 1), [0, 0, 0, 0, 0, 0, 1, 1])
+        self.assertEqual(CoreSpec("1/die").reservedPlan(self.resource, 120, 1), [1] * 8)
+
+    def testBinding(self):
+        """Tasks are bound to the cores that are not reserved."""
+        resource = BindingResource()
+        resource.readConfig(self.resourceFile)
+        cores = CoreSpec("1").taskCores(resource, 127, 1)
+        self.assertEqual(len(cores), 127)
+        self.assertNotIn([127], cores)
+        job = self.distribute(resource, "1/die", 240, 120)
+        self.assertIn("--cpu-bind=map_cpu:0,1,2", job.runLine)
+        self.assertNotIn(",15,", job.runLine)
+        self.assertNotIn("--core-spec", job.pBatchOptions)
+        self.assertEqual(CoreSpec("1/die").bindingOption(resource, 8, 2), "--cpu-bind=mask_cpu:" + \
+                         ",".join([hex(3 << (16 * die)) for die in range(8)]))
+        # Tasks that do not fit cannot be bound
+        self.assertIsNone(CoreSpec("1/die").bindingOption(resource, 128, 1))
+
+    def testCoreSpecOption(self):
+        """Without binding the batch system reserves the cores."""
+        job = self.distribute(self.resource, "1", 254, 127)
+        self.assertIn("#SBATCH --core-spec=1\n", job.pBatchOptions)
+        # The batch system cannot reserve cores on each die
+        messages = []
+        previous = bolterror.collectMessages(messages)
+        try:
+            self.assertRaises(bolterror.BoltError, self.distribute, self.resource, "1/die", 240, 120)
+        finally:
+            bolterror.collectMessages(previous)
+        self.assertIn("Reserve 8 cores per node instead", messages[0][1])
+
+    def testShape(self):
+        """Node classes and rankings leave the reserved cores free."""
+        shape = boltselect.jobShape(self.resource, 254, 1, coreSpec=CoreSpec("1"))
+        self.assertEqual((shape["nodes"], shape["tpn"]), (2, 127))
+        shape = boltselect.jobShape(self.resource, 256, 1, 128, coreSpec=CoreSpec("1"))
+        self.assertFalse(shape["fits"])
+        self.assertEqual(shape["reason"], "128 cores per node needed but 127 available")
+
+    def testCheck(self):
+        """Jobs using the reserved cores are errors."""
+        job = Job()
+        job.setTasks(256)
+        job.setTasksPerNode(128)
+        job.setCoreSpec(CoreSpec("1"))
+        job.setIsParallel(True)
+        messages = []
+        previous = bolterror.collectMessages(messages)
+        try:
+            self.assertRaises(bolterror.BoltError, job.checkTasks, self.resource, None)
+        finally:
+            bolterror.collectMessages(previous)
+        self.assertIn("1 cores per node reserved", messages[0][1])
+
+if __name__ == "__main__":
+    unittest.main()
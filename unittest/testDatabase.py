@@ -0,0 +1,82 @@
+import unittest
+import multiprocessing
+import os
+import tempfile
+import boltdb
+from boltdb import BoltDatabase as Database
+
+def addRows(fileName, process, count):
+    """Add rows from a separate process"""
+    database = Database(fileName)
+    for i in range(count):
+        database.addRow({"resource": "ARCHER2", "code": "CP2K", "nodes": i, "name": "p{0}".format(process)})
+    database.close()
+
+class DatabaseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fileName = os.path.join(tempfile.mkdtemp(), "hist", "jobs.db")
+
+    def addSweep(self, database):
+        for resource in ("ARCHER2", "Cirrus"):
+            for code in ("CP2K", "GROMACS"):
+                for nodes in (1, 4, 16, 32, 64):
+                    database.addRow({"resource": resource, "code": code, "nodes": nodes, "walltime": 2.0,
+                                     "cost": 2.0 * nodes, "key": "{0}{1}{2}".format(resource, code, nodes)})
+
+    def testQuery(self):
+        """Jobs are selected by resource, code and conditions on the columns."""
+        database = Database(self.fileName)
+        self.addSweep(database)
+        self.assertEqual(database.pending, 20)
+        jobs = database.query("ARCHER2", "CP2K", conditions=["nodes>16"])
+        self.assertEqual(database.pending, 0)
+        self.assertEqual([j["nodes"] for j in jobs], [32, 64])
+        self.assertEqual(len(database.query(conditions=["cost>=64", "code!=CP2K"])), 4)
+        self.assertEqual([j["nodes"] for j in database.query("Cirrus", limit=2)], [32, 64])
+        database.close()
+
+    def testIndex(self):
+        """Queries on resource, code and nodes use the index."""
+        database = Database(self.fileName)
+        plan = database.queryPlan("SELECT * FROM jobs WHERE resource = ? AND code = ? AND nodes > ?", ("ARCHER2", "CP2K", 16))
+        assert "USING INDEX jobs_shape" in plan, plan
+        database.close()
+
+    def testJobID(self):
+        """The submission of the latest job with a hash is recorded."""
+        database = Database(self.fileName)
+        self.addSweep(database)
+        database.setJobID("ARCHER2CP2K16", "1234", 100.0)
+        jobs = database.query(conditions=["jobid=1234"])
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual((jobs[0]["key"], jobs[0]["submitted"]), ("ARCHER2CP2K16", 100.0))
+        database.close()
+
+    def testReopen(self):
+        """Rows written are kept when the database is reopened."""
+        database = Database(self.fileName)
+        self.addSweep(database)
+        database.close()
+        database = Database(self.fileName)
+        self.assertEqual(len(database.query()), 20)
+        database.close()
+
+    def testConcurrent(self):
+        """Several processes can add jobs at the same time."""
+        Database(self.fileName).close()
+        processes = [multiprocessing.Process(target=addRows, args=(self.fileName, p, 200)) for p in range(4)]
+        for process in processes: process.start()
+        for process in processes: process.join()
+        database = Database(self.fileName)
+        jobs = database.query()
+        self.assertEqual(len(jobs), 800)
+        self.assertEqual(len(database.query(conditions=["name=p3"])), 200)
+        database.close()
+
+def suite():
+    suite = unittest.makeSuite(DatabaseTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
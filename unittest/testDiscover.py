@@ -0,0 +1,134 @@
+import unittest
+import os
+import boltdiscover
+from boltdiscover import BoltDiscovery as Discovery
+from boltresource import BoltResource as Resource
+
+LSCPU = """Architecture:            x86_64
+CPU(s):                  256
+Thread(s) per core:      2
+Core(s) per socket:      64
+Socket(s):               2
+NUMA node(s):            8
+Model name:              AMD EPYC 7742 64-Core Processor
+"""
+
+# Two sockets, two NUMA regions per socket, two cores per region and
+# two hardware threads per core
+LSCPU_PARSE = "# The following is the parsable format\n# CPU,Core,Socket,Node,,L1d,L1i,L2\n" + \
+              "".join(["{0},{1},{2},{3},,0,0,0\n".format(cpu, cpu % 8, (cpu % 8) // 4, (cpu % 8) // 2) for cpu in range(16)])
+
+HWLOC = """<?xml version="1.0" encoding="UTF-8"?>
+<topology version="2.0">
+  <object type="Machine" os_index="0">
+{0}
+  </object>
+</topology>
+""".format("".join(["""    <object type="Package" os_index="{0}">
+      <object type="NUMANode" os_index="{0}" local_memory="68719476736"/>
+      <object type="Core" os_index="{1}"><object type="PU" os_index="{1}"/></object>
+      <object type="Core" os_index="{2}"><object type="PU" os_index="{2}"/></object>
+    </object>
+""".format(p, 2 * p, 2 * p + 1) for p in range(2)]))
+
+SLURM_NODES = """NodeName=nid001000 Arch=x86_64 CoresPerSocket=64 CPUAlloc=0 CPUTot=256 OS=Linux 5.14.21 RealMemory=262144 Sockets=2 State=IDLE ThreadsPerCore=2 Partitions=standard,serial
+NodeName=nid001001 Arch=x86_64 CoresPerSocket=64 CPUAlloc=0 CPUTot=256 RealMemory=262144 Sockets=2 State=IDLE ThreadsPerCore=2 Partitions=standard
+NodeName=nid001002 Arch=x86_64 CoresPerSocket=64 CPUAlloc=0 CPUTot=256 RealMemory=524288 Sockets=2 State=IDLE ThreadsPerCore=2 Partitions=standard
+NodeName=nid002000 Arch=x86_64 CoresPerSocket=64 CPUAlloc=0 CPUTot=256 RealMemory=524288 Sockets=2 State=IDLE ThreadsPerCore=2 Partitions=highmem
+"""
+
+SLURM_PARTITIONS = """PartitionName=standard Default=YES MaxNodes=UNLIMITED MaxTime=1-00:00:00 Nodes=nid[001000-001002] TotalCPUs=768 TotalNodes=3
+PartitionName=highmem Default=NO MaxTime=2-00:00:00 TotalNodes=1
+"""
+
+PBS_NODES = """node1
+     Mom = node1
+     state = free
+     resources_available.ncpus = 36
+     resources_available.mem = 131072000kb
+     resources_available.Qlist = workq
+
+node2
+     Mom = node2
+     resources_available.ncpus = 36
+     resources_available.mem = 131072000kb
+"""
+
+PBS_QUEUES = """Queue: workq
+    queue_type = Execution
+    resources_max.walltime = 12:00:00
+    enabled = True
+"""
+
+class DiscoverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resource = Resource()
+        self.resource.readConfig(os.path.join(os.environ['BOLT_DIR'], "configuration", "resources", "ARCHER2.resource"))
+
+    def testTopology(self):
+        """The node geometry is read from lscpu and hwloc output."""
+        self.assertEqual(boltdiscover.parseLscpu(LSCPU), {"sockets per node": 2, "dies per socket": 4,
+                         "cores per die": 16, "threads per core": 2})
+        self.assertEqual(boltdiscover.parseLscpuParse(LSCPU_PARSE), {"sockets per node": 2, "dies per socket": 2,
+                         "cores per die": 2, "threads per core": 2})
+        self.assertEqual(boltdiscover.parseHwloc(HWLOC, "hwloc"), {"sockets per node": 2, "dies per socket": 1,
+                         "cores per die": 2, "threads per core": 1, "memory per node": 128})
+        self.assertEqual(boltdiscover.outputType(LSCPU_PARSE), "lscpu parse")
+        self.assertEqual(boltdiscover.outputType("hello"), None)
+
+    def testScheduler(self):
+        """Nodes and limits are read for the queue of the resource."""
+        discovery = Discovery("standard")
+        self.assertEqual(discovery.addOutput(SLURM_NODES, "nodes"), "slurm nodes")
+        discovery.addOutput(SLURM_PARTITIONS, "partitions")
+        self.assertEqual(discovery.values["total nodes"], 3)
+        self.assertEqual(discovery.values["memory per node"], 256)
+        self.assertEqual(discovery.values["maximum job duration"], 24)
+        self.assertEqual(discovery.coresPerNode, 128)
+        self.assertIn("1 of 3 nodes", discovery.notes[0])
+        self.assertEqual(boltdiscover.slurmHours("2-12:00:00"), 60)
+        self.assertEqual(boltdiscover.slurmHours("90"), 1)
+        self.assertEqual(boltdiscover.slurmHours("UNLIMITED"), None)
+
+    def testPbs(self):
+        """PBS node and queue listings give the cores, memory and walltime."""
+        discovery = Discovery("workq")
+        discovery.addOutput(PBS_NODES, "pbsnodes")
+        discovery.addOutput(PBS_QUEUES, "queues")
+        self.assertEqual(discovery.values, {"total nodes": 1, "memory per node": 125, "maximum job duration": 12})
+        self.assertEqual(discovery.coresPerNode, 36)
+
+    def testDifferences(self):
+        """Differences from the resource are reported; the topology takes
+        precedence over the batch system."""
+        discovery = Discovery("standard")
+        discovery.addOutput(SLURM_NODES, "nodes")
+        discovery.addOutput(LSCPU, "lscpu")
+        discovery.addOutput(SLURM_PARTITIONS, "partitions")
+        self.assertEqual(discovery.sources["threads per core"], "lscpu")
+        differences = discovery.differences(self.resource)
+        self.assertEqual([d[0] for d in differences], ["total nodes", "threads per core", "maximum job duration"])
+        self.assertEqual(differences[1], ("threads per core", 1, 2, "lscpu"))
+
+    def testUpdate(self):
+        """The configuration is updated keeping comments and node-dependent
+        walltime limits."""
+        with open(os.path.join(os.environ['BOLT_DIR'], "configuration", "resources", "ARCHER2.resource"), "r") as configFile:
+            text = configFile.read()
+        discovery = Discovery("standard")
+        discovery.addOutput(LSCPU, "lscpu")
+        discovery.addOutput(SLURM_PARTITIONS, "partitions")
+        updated = discovery.updateConfig(text)
+        self.assertEqual(boltdiscover.configValue(updated, "node info", "threads per core"), "2")
+        self.assertEqual(boltdiscover.configValue(updated, "general parallel jobs", "maximum job duration"), "1-16:48,17-:24")
+        self.assertIn("discovered limit is 24 hours", discovery.notes[0])
+        self.assertEqual(len(updated.split("\n")), len(text.split("\n")))
+        # Options that are not set are added to their section
+        text = boltdiscover.setConfigValue("[node info]\n# Cores\ncores per die: 4 ; cores\n\n[serial jobs]\n",
+                                           "node info", "memory per node", "64")
+        self.assertEqual(text, "[node info]\n# Cores\ncores per die: 4 ; cores\nmemory per node: 64\n\n[serial jobs]\n")
+        self.assertEqual(boltdiscover.setConfigValue(text, "node info", "cores per die", "8").split("\n")[2], "cores per die: 8 ; cores")
+
+if __name__ == "__main__":
+    unittest.main()
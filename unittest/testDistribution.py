@@ -3,10 +3,12 @@ import os
 from boltjob import BoltJob as Job
 from boltbatch import BoltBatch as Batch
 from boltresource import BoltResource as Resource
+from boltcode import BoltCode as Code
 
 configDir = "/unittest/configuration"
 batchConfig = "test.batch"
 resourceConfig = "test.resource"
+codeConfig = "test.code"
     
 class DistributionTestCase(unittest.TestCase):
     
@@ -18,6 +20,8 @@ class DistributionTestCase(unittest.TestCase):
         rootDir = os.environ['BOLT_DIR']
         self.batch.readConfig(rootDir + configDir + "/" + batchConfig)
         self.resource.readConfig(rootDir + configDir + "/" + resourceConfig)
+        self.code = Code()
+        self.code.readConfig(rootDir + configDir + "/" + codeConfig)
 
     def testParallelTaskDitributionPureMPI(self):
         """Pure MPI task distribution (fully populated)."""
@@ -71,6 +75,39 @@ class DistributionTestCase(unittest.TestCase):
         correct = "export OMP_NUM_THREADS=3\naprun -n 1024 -N 10 -d 3"
         self.assertEqual(self.job.runLine, correct, "Value= '{0}', Expected= '{1}'".format(self.job.runLine, correct))
 
+    def testParallelTaskDitributionRequestedStride(self):
+        """Pure MPI task distribution (requested stride)."""
+        
+        # Set the parallel distribution
+        self.job.setTasks(1024)
+        self.job.setTasksPerNode(16)
+        self.job.setThreads(1)
+        self.job.setStride(1)
+        self.job.setParallelJobLauncher(self.resource.distribJobLauncher)
+        self.job.setParallelDistribution(self.resource, self.batch)
+        
+        correct = "aprun -n 1024 -N 16 -S 4 -d 1"
+        self.assertEqual(self.job.runLine, correct, "Value= '{0}', Expected= '{1}'".format(self.job.runLine, correct))
+        self.assertEqual(self.job.pStride, 1)
+
+    def testParallelTaskDitributionMemoryBound(self):
+        """Memory-bound code task distribution (uneven tasks per die)."""
+        
+        # Set the parallel distribution
+        self.job.setTasks(1000)
+        self.job.setTasksPerNode(10)
+        self.job.setThreads(1)
+        self.job.setParallelJobLauncher(self.resource.distribJobLauncher)
+        self.job.setParallelDistribution(self.resource, self.batch, self.code)
+        
+        correct = "aprun -n 1000 -N 10 -d 3"
+        self.assertEqual(self.job.runLine, correct, "Value= '{0}', Expected= '{1}'".format(self.job.runLine, correct))
+
+    def testPreferredTasksPerNode(self):
+        """Memory-bound code leaves half of each die empty."""
+        self.assertEqual(self.code.preferredTasksPerNode(self.resource, 1), 16)
+        self.assertEqual(self.code.preferredTasksPerNode(self.resource, 2), 8)
+
 def suite():
     suite = unittest.makeSuite(DistributionTestCase,'test')
     return suite
@@ -0,0 +1,45 @@
+import unittest
+import os
+from boltenvcache import BoltEnvCache as EnvCache
+from boltresource import BoltResource as Resource
+
+configDir = "/unittest/configuration"
+resourceConfig = "test.resource"
+
+class EnvCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resource = Resource()
+        rootDir = os.environ['BOLT_DIR']
+        self.resource.readConfig(rootDir + configDir + "/" + resourceConfig)
+        self.cache = EnvCache("/tmp/bolt/env", 2)
+
+    def testFileName(self):
+        """The cache file depends on the preamble text."""
+        first = self.cache.fileName(self.resource, "module load cp2k\n")
+        self.assertEqual(first, self.cache.fileName(self.resource, "module load cp2k\n"))
+        assert first != self.cache.fileName(self.resource, "module load cp2k/9.1\n"), "Changed preamble should use a new cache file."
+        assert first.startswith("/tmp/bolt/env/" + self.resource.name + "."), "Value= '{0}'".format(first)
+
+    def testPreamble(self):
+        """The preamble is the fallback when the cache is not valid."""
+        text = self.cache.preambleLines(self.resource, "module load cp2k\n")
+        assert "-mmin -2880 " in text, "Cache lifetime not used."
+        assert "\n    module load cp2k\n" in text, "Preamble not used as fallback."
+        self.assertEqual(self.cache.preambleLines(self.resource, "\n"), "\n")
+
+    def testModulesOnly(self):
+        """Only the module commands are cached; other lines always run."""
+        text = self.cache.preambleLines(self.resource, "cd $PBS_O_WORKDIR\nmodule load cp2k\nexport A=1\n")
+        assert text.startswith("cd $PBS_O_WORKDIR\n"), "Working directory not always set."
+        assert text.endswith("fi\nexport A=1\n"), "Value= '{0}'".format(text)
+        assert "PWD|OLDPWD|PBS_" in text, "Job variables not filtered."
+        assert "sed 's/^/unset /'" in text, "Unset variables not saved."
+        assert "declare -f $f" in text, "Shell functions not saved."
+
+def suite():
+    suite = unittest.makeSuite(EnvCacheTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import getpass
+import os
+import re
+import stat
+import tempfile
+import boltfeed
+from boltfeed import BoltFeed as Feed
+from boltbatch import BoltBatch as Batch
+from boltstatus import BoltStatus as Status
+
+class FakeResource(object):
+    """Resource with a limit of 4 jobs in total and 2 in the short QoS"""
+    name = "test"
+    maxQueuedJobs = 4
+    qosJobLimits = {"short": 2}
+
+class FeedTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # Fake submit and queue commands that share a queue file
+        self.queue = os.path.join(self.directory, "queue")
+        open(self.queue, "w").close()
+        submit = os.path.join(self.directory, "fakesbatch")
+        with open(submit, "w") as commandFile:
+            commandFile.write("#!/bin/bash\nn=$(($(wc -l < {0}) + 100))\n"
+                              "echo \"$n|$(grep -o 'qos=[a-z]*' $1 | cut -d= -f2)|PENDING|{1}\" >> {0}\n"
+                              "echo \"Submitted batch job $n\"\n".format(self.queue, getpass.getuser()))
+        query = os.path.join(self.directory, "fakesqueue")
+        with open(query, "w") as commandFile:
+            commandFile.write("#!/bin/bash\ncat {0}\n".format(self.queue))
+        for command in (submit, query): os.chmod(command, stat.S_IRWXU)
+        with open(os.path.join(os.environ['BOLT_DIR'], "configuration", "batch", "Slurm.batch"), "r") as batchFile:
+            config = batchFile.read()
+        config = re.sub(r"(?m)^submit command:.*$", "submit command: " + submit, config)
+        config = re.sub(r"(?m)^queue command:.*$", "queue command: " + query, config)
+        config = re.sub(r"(?m)^queue fields:.*$", "queue fields: id, qos, state, owner", config)
+        with open(os.path.join(self.directory, "Slurm.batch"), "w") as batchFile:
+            batchFile.write(config)
+        self.batch = Batch()
+        self.batch.readConfig(os.path.join(self.directory, "Slurm.batch"))
+
+    def writeScripts(self, qos, count):
+        fileNames = []
+        for i in range(count):
+            fileName = os.path.join(self.directory, "{0}{1}.bolt".format(qos, i))
+            with open(fileName, "w") as scriptFile:
+                scriptFile.write("#!/bin/bash\n#SBATCH --job-name=test\n#SBATCH --qos={0}\nsrun ./a.out\n".format(qos))
+            fileNames.append(fileName)
+        return fileNames
+
+    def submittedQueue(self):
+        with open(self.queue, "r") as queueFile:
+            return [line.split("|")[1] for line in queueFile.read().split("\n")[:-1]]
+
+    def testAdd(self):
+        """Scripts are added once, with the QoS from their batch options."""
+        feed = Feed(self.directory, FakeResource(), self.batch)
+        fileNames = self.writeScripts("standard", 2) + self.writeScripts("short", 1)
+        self.assertEqual(feed.add(fileNames), 3)
+        self.assertEqual(feed.add(fileNames), 0)
+        self.assertEqual([e["qos"] for e in feed.pending], ["standard", "standard", "short"])
+
+    def testLimits(self):
+        """Rounds submit up to the total and QoS limits, counting queued jobs."""
+        feed = Feed(self.directory, FakeResource(), self.batch)
+        feed.add(self.writeScripts("short", 3) + self.writeScripts("standard", 3))
+        submitted = feed.submitRound()
+        self.assertEqual(self.submittedQueue(), ["short", "short", "standard", "standard"])
+        self.assertEqual([e["id"] for e in submitted], ["100", "101", "102", "103"])
+        # Nothing fits until a job leaves the queue
+        self.assertEqual(feed.submitRound(), [])
+        with open(self.queue, "w") as queueFile:
+            queueFile.write("102|standard|RUNNING|{0}\n103|standard|COMPLETED|{0}\n".format(getpass.getuser()))
+        submitted = feed.submitRound()
+        self.assertEqual([e["qos"] for e in submitted], ["short", "standard"])
+
+    def testOtherUsers(self):
+        """Jobs of other users do not count towards the limits."""
+        with open(self.queue, "w") as queueFile:
+            queueFile.write("1|standard|PENDING|someoneelse\n" * 4)
+        feed = Feed(self.directory, FakeResource(), self.batch)
+        feed.add(self.writeScripts("standard", 2))
+        self.assertEqual(len(feed.submitRound()), 2)
+
+    def testRestart(self):
+        """Progress is kept in the queue file and submitted jobs are tracked."""
+        tracker = Status(self.directory)
+        feed = Feed(self.directory, FakeResource(), self.batch)
+        feed.add(self.writeScripts("standard", 6))
+        feed.submitRound(tracker)
+        feed = Feed(self.directory, FakeResource(), self.batch)
+        feed.read()
+        self.assertEqual(len(feed.pending), 2)
+        self.assertEqual([j["id"] for j in tracker.readJobs()], ["100", "101", "102", "103"])
+        with open(self.queue, "w") as queueFile: pass
+        feed.run(1, tracker)
+        self.assertEqual(len(feed.pending), 0)
+        assert boltfeed.summaryString(feed).endswith(": 0 pending, 6 submitted\n")
+
+def suite():
+    suite = unittest.makeSuite(FeedTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+import math
+import tempfile
+from boltmodel import BoltModel as Model
+import boltmodel
+from boltrecords import parseRecord
+from boltjob import BoltJob as Job
+from boltresource import BoltResource as Resource
+
+class FakeCode(object):
+    """A code limited to a number of tasks"""
+    def __init__(self, maxTasks):
+        self.maxTasks = maxTasks
+
+def makeRecords(cores, serial, parallel, comm):
+    records = []
+    for p in cores:
+        runtime = int(round(serial + parallel/float(p) + comm*math.log(p, 2)))
+        records.append(parseRecord("time=1 resource=test code=test nodes=1 tasks={0} tpn=32 threads=1 runtime={1} status=0".format(p, runtime)))
+    return records
+
+class ModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.model = Model("test", "test")
+        self.records = makeRecords((32, 64, 128, 256, 512, 1024), 20.0, 200000.0, 5.0)
+
+    def testFit(self):
+        """Fit the full model to runs at several core counts."""
+        self.model.update(self.records)
+        correct = 20.0 + 200000.0/2048 + 5.0*11
+        value = self.model.predict(2048)
+        self.assertAlmostEqual(value, correct, delta=2.0, msg="Value= '{0}', Expected= '{1}'".format(value, correct))
+
+    def testIncremental(self):
+        """Incremental refit gives the same model as a single fit."""
+        self.model.update(self.records[:3])
+        self.model.update(self.records)
+        single = Model("test", "test")
+        single.update(self.records)
+        self.assertEqual(self.model.count, 6)
+        self.assertAlmostEqual(self.model.predict(100), single.predict(100), places=6)
+
+    def testReducedModel(self):
+        """Runs at a single core count give a perfect-scaling model."""
+        self.model.update(self.records[2:3])
+        correct = self.records[2]["runtime"] / 2.0
+        value = self.model.predict(256)
+        self.assertAlmostEqual(value, correct, places=6, msg="Value= '{0}', Expected= '{1}'".format(value, correct))
+
+    def testFailedRuns(self):
+        """Failed runs are counted as used but not fitted."""
+        failed = parseRecord("time=1 resource=test code=test nodes=1 tasks=32 threads=1 tpn=32 runtime=1 status=1")
+        self.model.update([failed])
+        self.assertEqual(self.model.recordsUsed, 1)
+        assert self.model.coefficients is None, "Model should not be fitted."
+
+    def testExtrapolation(self):
+        """Requests far outside the measured range are flagged."""
+        self.model.update(self.records)
+        assert not self.model.isExtrapolation(2048), "2048 cores should not be flagged."
+        assert self.model.isExtrapolation(4096), "4096 cores should be flagged."
+        assert self.model.isExtrapolation(8), "8 cores should be flagged."
+
+    def testWallTime(self):
+        """Suggested walltime includes the safety margin."""
+        self.model.update(self.records)
+        correct = int(math.ceil(self.model.predict(64) * 1.2 / 60.0))
+        value = self.model.suggestWallTime(64)
+        self.assertEqual(value, correct, "Value= '{0}', Expected= '{1}'".format(value, correct))
+
+    def testReadWrite(self):
+        """Models are restored from file."""
+        self.model.update(self.records)
+        fileName = os.path.join(tempfile.mkdtemp(), "test.test.model")
+        self.model.writeConfig(fileName)
+        restored = Model()
+        restored.readConfig(fileName)
+        self.assertEqual(restored.recordsUsed, 6)
+        self.assertAlmostEqual(restored.predict(100), self.model.predict(100), places=6)
+
+    def testFileName(self):
+        """Models are kept with the run records of the user."""
+        fileName = boltmodel.modelFileName("~/.bolt", "cp2k", "ARCHER2")
+        self.assertEqual(fileName, os.path.join(os.path.expanduser("~"), ".bolt", "models", "cp2k.ARCHER2.model"))
+        self.assertEqual(boltmodel.siteModelFileName("/opt/bolt/configuration/codes", "cp2k", "ARCHER2"),
+                         "/opt/bolt/configuration/codes/cp2k.ARCHER2.model")
+
+    def testCandidateShapes(self):
+        """Shapes outside the limits of the code and resource are left out."""
+        self.model.update(self.records)
+        resource = Resource()
+        resource.readConfig(os.environ['BOLT_DIR'] + "/unittest/configuration/test.resource")
+        job = Job()
+        job.setTasks(4 * resource.numCoresPerNode())
+        job.setTasksPerNode(resource.numCoresPerNode())
+        candidates = self.model.candidateShapes(job, resource, FakeCode(0))
+        self.assertEqual(sorted([c[0] for c in candidates]), [1, 2, 4, 8, 16])
+        self.assertEqual([c[2] for c in candidates], sorted([c[2] for c in candidates]))
+        # A code limited to less than a node allows no shapes
+        self.assertEqual(self.model.candidateShapes(job, resource, FakeCode(resource.numCoresPerNode() // 2)), [])
+
+def suite():
+    suite = unittest.makeSuite(ModelTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import bolterror
+import exampleConfig
+from boltjob import BoltJob as Job
+from boltbatch import BoltBatch as Batch
+from boltresource import BoltResource as Resource
+
+class NetworkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        configDir = os.path.join(os.environ['BOLT_DIR'], "configuration")
+        # ARCHER2 with the example network topology switched on
+        resourceFile = exampleConfig.enableExamples(os.path.join(configDir, "resources", "ARCHER2.resource"),
+                                                    ["network topology"],
+                                                    {"policies": "1-128:1@12:00:00, 129-512:4@24:00:00"})
+        self.resource = Resource()
+        self.resource.readConfig(resourceFile)
+        self.batch = Batch()
+        self.batch.readConfig(os.path.join(configDir, "batch", "Slurm.batch"))
+
+    def distribute(self, nodes):
+        job = Job()
+        job.setTasks(nodes * 128)
+        job.setTasksPerNode(128)
+        job.setIsParallel(True)
+        job.setParallelJobLauncher(self.resource.distribJobLauncher)
+        job.setParallelDistribution(self.resource, self.batch)
+        return job
+
+    def testTopology(self):
+        """The levels and policies are read from the resource."""
+        self.assertEqual(self.resource.networkLevels, [("switch", 16), ("group", 128), ("cabinet", 256)])
+        self.assertEqual((self.resource.constraintLevel, self.resource.nodesPerGroup), ("group", 128))
+        self.assertEqual(self.resource.networkPolicy(64), (1, "12:00:00"))
+        self.assertEqual(self.resource.networkPolicy(512), (4, "24:00:00"))
+        self.assertIsNone(self.resource.networkPolicy(513))
+
+    def testConstraint(self):
+        """The switches option is added for jobs with a policy."""
+        self.assertIn("#SBATCH --switches=1@12:00:00\n", self.distribute(8).pBatchOptions)
+        self.assertIn("#SBATCH --switches=4@24:00:00\n", self.distribute(200).pBatchOptions)
+        self.assertNotIn("--switches", self.distribute(600).pBatchOptions)
+
+    def testShipped(self):
+        """The shipped ARCHER2 configuration sets no policy."""
+        configDir = os.path.join(os.environ['BOLT_DIR'], "configuration")
+        resource = Resource()
+        resource.readConfig(os.path.join(configDir, "resources", "ARCHER2.resource"))
+        self.assertEqual(resource.networkLevels, [])
+        self.assertIsNone(resource.networkPolicy(64))
+
+    def testNeeded(self):
+        """A job is never limited to fewer groups than it needs."""
+        job = Job()
+        messages = []
+        previous = bolterror.collectMessages(messages)
+        try:
+            self.resource._BoltResource__networkPolicies = [(1, 0, 1, None)]
+            self.assertEqual(job.networkGroups(self.resource, 300), (3, None))
+        finally:
+            bolterror.collectMessages(previous)
+        self.assertIn("needs 3 network groups", messages[0][1])
+
+    def testReport(self):
+        """The script reports the groups used."""
+        job = self.distribute(8)
+        lines = job.groupsUsedLines(self.resource)
+        self.assertIn("awk '{print int($1/128)}'", lines)
+        self.assertIn("(at most 1 requested)", lines)
+        self.assertEqual(self.distribute(600).groupsUsedLines(self.resource).count("requested"), 0)
+
+if __name__ == "__main__":
+    unittest.main()
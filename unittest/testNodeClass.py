@@ -0,0 +1,110 @@
+import unittest
+import os
+import sys
+import bolterror
+import boltcheck
+import exampleConfig
+import boltselect
+from boltresource import BoltResource as Resource
+from boltbatch import BoltBatch as Batch
+
+# Prints an earlier start for the highmem queue than the standard queue
+START_SCRIPT = "import sys; print('sbatch: Job 1 to start at ' + " \
+               "{'standard': '2030-01-02T08:00:00', 'highmem': '2030-01-01T08:00:00'}[sys.argv[1]])"
+
+class FakeBatch(Batch):
+    """Slurm with a start estimate that does not need the batch system"""
+    @property
+    def startCommand(self):
+        return "{0} -c \"{1}\" {{queue}}".format(sys.executable, START_SCRIPT)
+
+class NodeClassTestCase(unittest.TestCase):
+
+    def setUp(self):
+        configDir = os.path.join(os.environ['BOLT_DIR'], "configuration")
+        # ARCHER2 with the example high-memory class switched on
+        self.resourceFile = exampleConfig.enableExamples(os.path.join(configDir, "resources", "ARCHER2.resource"),
+                                                         ["node classes", "node class highmem"])
+        self.resource = Resource()
+        self.resource.readConfig(self.resourceFile)
+        self.batch = FakeBatch()
+        self.batch.readConfig(os.path.join(configDir, "batch", "Slurm.batch"))
+
+    def testNodeClass(self):
+        """A node class overrides the options of the resource."""
+        self.assertEqual(self.resource.nodeClasses, ["standard", "highmem"])
+        self.assertEqual(self.resource.classSelection, "cost")
+        highmem = self.resource.getNodeClass("highmem")
+        self.assertEqual(highmem.name, "ARCHER2")
+        self.assertEqual(highmem.nodeClass, "highmem")
+        self.assertEqual((highmem.nodes, highmem.memoryPerNode), (584, 512))
+        self.assertEqual((highmem.parallelQueue, highmem.parallelQos), ("highmem", "highmem"))
+        self.assertEqual(highmem.maxJobTimeByNodes(100), 48)
+        self.assertEqual(highmem.maxTasks, 584 * 128)
+        # The resource itself is unchanged
+        self.assertEqual((self.resource.nodes, self.resource.parallelQueue), (1024, "standard"))
+        standard = self.resource.getNodeClass("standard")
+        self.assertEqual((standard.nodes, standard.parallelQueue, standard.nodeClass), (1024, "standard", "standard"))
+
+    def testShape(self):
+        """The shape of a job depends on the memory per task and limits."""
+        shape = boltselect.jobShape(self.resource, 256, 1, memoryPerTask=3.0, wallTime=2.0)
+        self.assertEqual((shape["fits"], shape["nodes"], shape["tpn"], shape["cost"]), (True, 4, 85, 8.0))
+        shape = boltselect.jobShape(self.resource, 256, 1, memoryPerTask=300.0)
+        self.assertFalse(shape["fits"])
+        self.assertIn("GB per task", shape["reason"])
+        shape = boltselect.jobShape(self.resource, 128 * 2000, 1)
+        self.assertIn("nodes needed", shape["reason"])
+
+    def testCost(self):
+        """The class the job fits on at the lowest charge is chosen."""
+        candidates = boltselect.nodeClassCandidates(self.resource, self.batch, 256, 1, memoryPerTask=3.0, wallTime=1.0)
+        self.assertEqual([c["nodes"] for c in candidates], [4, 2])
+        self.assertEqual(boltselect.selectCandidate(candidates, "cost")["class"], "highmem")
+        # Equal charges go to the default class
+        candidates = boltselect.nodeClassCandidates(self.resource, self.batch, 256, 1, wallTime=1.0)
+        self.assertEqual(boltselect.selectCandidate(candidates, "cost")["class"], "standard")
+        # A higher charge rate makes the high-memory nodes dearer
+        highmem = self.resource.getNodeClass("highmem")
+        highmem._BoltResource__chargeRate = 3.0
+        self.assertEqual(boltselect.jobShape(highmem, 256, 1, memoryPerTask=3.0, wallTime=1.0)["cost"], 6.0)
+
+    def testWallTime(self):
+        """Classes whose walltime limit is too short do not fit."""
+        candidates = boltselect.nodeClassCandidates(self.resource, self.batch, 128 * 20, 1, wallTime=30.0)
+        self.assertEqual([c["fits"] for c in candidates], [False, True])
+        self.assertEqual(boltselect.selectCandidate(candidates, "cost")["class"], "highmem")
+        self.assertIn("standard: does not fit", boltselect.candidateString(candidates[0]))
+
+    def testStart(self):
+        """The class with the earliest estimated start is chosen."""
+        candidates = boltselect.nodeClassCandidates(self.resource, self.batch, 256, 1, wallTime=1.0,
+                                                    estimateStart=True, account="z01")
+        self.assertLess(candidates[1]["start"], candidates[0]["start"])
+        self.assertEqual(boltselect.selectCandidate(candidates, "start")["class"], "highmem")
+        self.assertIn("starts 2030-01-01", boltselect.candidateString(candidates[1]))
+
+    def testCheck(self):
+        """Scripts are checked against the class whose partition they use."""
+        text = "#!/bin/bash\n# Parallel script produced by bolt\n#SBATCH --nodes=32\n#SBATCH --tasks-per-node=32\n" \
+               "#SBATCH --cpus-per-task=4\n#SBATCH --partition={0}\n#SBATCH --qos={0}\n#SBATCH --time=48:0:0\n"
+        check = boltcheck.BoltCheck("a.slurm", text.format("highmem"), self.resource, self.batch)
+        self.assertEqual(check.messages, [])
+        self.assertEqual(check.report()["class"], "highmem")
+        check = boltcheck.BoltCheck("a.slurm", text.format("standard"), self.resource, self.batch)
+        self.assertIn("walltime", check.messages[0][1])
+
+    def testNoFit(self):
+        """Nothing is chosen if the job fits on no class; unknown classes
+        are errors."""
+        candidates = boltselect.nodeClassCandidates(self.resource, self.batch, 256, 1, memoryPerTask=600.0)
+        self.assertIsNone(boltselect.selectCandidate(candidates, "cost"))
+        messages = []
+        previous = bolterror.collectMessages(messages)
+        try:
+            self.assertRaises(bolterror.BoltError, self.resource.getNodeClass, "gpu")
+        finally:
+            bolterror.collectMessages(previous)
+
+if __name__ == "__main__":
+    unittest.main()
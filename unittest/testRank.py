@@ -0,0 +1,78 @@
+import unittest
+import os
+import fnmatch
+import bolterror
+import exampleConfig
+import boltselect
+from boltresource import BoltResource as Resource
+
+class FakeModel(object):
+    """A model of a code that runs faster on ARCHER2 than elsewhere"""
+    def __init__(self, seconds):
+        self.seconds = seconds
+    def predict(self, cores):
+        return self.seconds
+    def suggestWallTime(self, cores):
+        return int(self.seconds * 1.2 / 60)
+
+class RankTestCase(unittest.TestCase):
+
+    def setUp(self):
+        resourceDir = os.path.join(os.environ['BOLT_DIR'], "configuration", "resources")
+        self.resources = []
+        for fileName in sorted(os.listdir(resourceDir)):
+            if not fnmatch.fnmatch(fileName, "*.resource"): continue
+            fileName = os.path.join(resourceDir, fileName)
+            # ARCHER2 with the example high-memory class switched on
+            if os.path.basename(fileName) == "ARCHER2.resource":
+                fileName = exampleConfig.enableExamples(fileName, ["node classes", "node class highmem"])
+            resource = Resource()
+            resource.readConfig(fileName)
+            self.resources.append(resource)
+        self.names = [r.name for r in self.resources]
+
+    def testCost(self):
+        """Resources are ranked by charge; those the job does not fit on
+        are last with the reason."""
+        ranking = boltselect.rankResources(self.resources, 512, 1, wallTime=2.0)
+        self.assertEqual(sorted([e["name"] for e in ranking]), sorted(self.names))
+        self.assertEqual((ranking[0]["name"], ranking[0]["class"], ranking[0]["nodes"]), ("ARCHER2", "standard", 4))
+        costs = [e["cost"] for e in ranking if e["fits"]]
+        self.assertEqual(costs, sorted(costs))
+        self.assertFalse(ranking[-1]["fits"])
+        self.assertIn("hours needed", ranking[-1]["reason"])
+        self.assertIn("does not fit", boltselect.rankingString(ranking))
+
+    def testNodeClass(self):
+        """The cheapest node class of a resource is used."""
+        ranking = boltselect.rankResources(self.resources, 512, 1, memoryPerTask=3.0, wallTime=2.0)
+        archer2 = [e for e in ranking if e["name"] == "ARCHER2"][0]
+        self.assertEqual((archer2["class"], archer2["nodes"]), ("highmem", 4))
+        self.assertEqual(archer2["resource"].parallelQueue, "highmem")
+
+    def testTime(self):
+        """Predicted runtimes rank by time to solution and set the charge
+        and walltime."""
+        models = {"ARCHER2": FakeModel(1800.0), "ARCHER": FakeModel(900.0)}
+        ranking = boltselect.rankResources(self.resources, 512, 1, modelFor=lambda name: models.get(name),
+                                           policy="time")
+        self.assertEqual([e["name"] for e in ranking[:2]], ["ARCHER", "ARCHER2"])
+        self.assertEqual(ranking[1]["runtime"], 0.5)
+        self.assertEqual(ranking[1]["cost"], 4 * 0.5)
+        self.assertEqual(ranking[1]["wallTime"], 0.6)
+        # Resources without a prediction come after
+        self.assertIsNone(ranking[2]["runtime"])
+
+    def testErrors(self):
+        """An error evaluating one resource does not stop the others."""
+        def modelFor(name):
+            if name == "ARCHER": bolterror.handleError("Broken model")
+            return None
+        ranking = boltselect.rankResources(self.resources, 512, 1, wallTime=2.0, modelFor=modelFor)
+        archer = [e for e in ranking if e["name"] == "ARCHER"][0]
+        self.assertFalse(archer["fits"])
+        self.assertEqual(archer["reason"], "Broken model")
+        self.assertTrue(ranking[0]["fits"])
+
+if __name__ == "__main__":
+    unittest.main()
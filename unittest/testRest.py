@@ -0,0 +1,83 @@
+import unittest
+import os
+import tempfile
+import restServer
+from boltrest import BoltRestClient as RestClient
+
+class FakeBatch(object):
+    """Batch system with a REST API"""
+    restEndpoint = None
+    restSocket = None
+    restTokenVariable = "BOLT_TEST_TOKEN"
+    restTokenHeader = "X-SLURM-USER-TOKEN"
+    restUserHeader = "X-SLURM-USER-NAME"
+    restConnections = 4
+    restTimeout = 10.0
+    restJobIDField = "job_id"
+
+class RestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        os.environ["BOLT_TEST_TOKEN"] = "secret"
+        self.server = restServer.start("secret")
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.batch = FakeBatch()
+        self.batch.restEndpoint = self.server.url
+
+    def testKeepAlive(self):
+        """Sequential submissions reuse a single connection."""
+        client = RestClient(self.batch)
+        self.addCleanup(client.close)
+        ids = [client.submit("#!/bin/bash\necho {0}\n".format(i)) for i in range(10)]
+        self.assertEqual(ids, [str(i) for i in range(1000, 1010)])
+        self.assertEqual(client.opened, 1)
+        self.assertEqual(self.server.connections, 1)
+        request = self.server.scripts[1003]
+        self.assertEqual(request["script"], "#!/bin/bash\necho 3\n")
+        assert "BOLT_TEST_TOKEN=secret" not in request["job"]["environment"], "Token passed to the job."
+
+    def testConcurrent(self):
+        """Concurrent submissions use up to the pool size of connections."""
+        client = RestClient(self.batch)
+        self.addCleanup(client.close)
+        scripts = ["#!/bin/bash\necho {0}\n".format(i) for i in range(40)]
+        ids = client.submitMany(scripts)
+        self.assertEqual(len(set(ids)), 40)
+        for i, jobID in enumerate(ids):
+            self.assertEqual(self.server.scripts[int(jobID)]["script"], scripts[i])
+        assert client.opened <= 4, client.opened
+
+    def testToken(self):
+        """Requests with the wrong token and missing tokens are errors."""
+        os.environ["BOLT_TEST_TOKEN"] = "wrong"
+        client = RestClient(self.batch)
+        self.assertRaises(SystemExit, client.submit, "#!/bin/bash\n")
+        del os.environ["BOLT_TEST_TOKEN"]
+        self.assertRaises(SystemExit, RestClient, self.batch)
+
+    def testSocket(self):
+        """Scripts can be posted over a UNIX socket."""
+        socketDir = tempfile.TemporaryDirectory()
+        self.addCleanup(socketDir.cleanup)
+        socketPath = os.path.join(socketDir.name, "rest.socket")
+        server = restServer.start("secret", socketPath=socketPath)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.batch.restEndpoint = server.url
+        self.batch.restSocket = socketPath
+        client = RestClient(self.batch)
+        self.addCleanup(client.close)
+        # The IDs are given out in the order the concurrent posts arrive
+        scripts = ["#!/bin/bash\necho {0}\n".format(i) for i in range(3)]
+        ids = client.submitMany(scripts)
+        self.assertEqual(sorted(ids), ["1000", "1001", "1002"])
+        for i, jobID in enumerate(ids):
+            self.assertEqual(server.scripts[int(jobID)]["script"], scripts[i])
+
+def suite():
+    suite = unittest.makeSuite(RestTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
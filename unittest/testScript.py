@@ -0,0 +1,58 @@
+import unittest
+import os
+from boltscript import BoltTemplate as Template
+from boltscript import BoltScript as Script
+from boltbatch import BoltBatch as Batch
+from boltresource import BoltResource as Resource
+from boltjob import BoltJob as Job
+
+configDir = "/unittest/configuration"
+
+class ScriptTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rootDir = os.environ['BOLT_DIR']
+        self.batch = Batch()
+        self.batch.readConfig(rootDir + configDir + "/test.batch")
+        self.resource = Resource()
+        self.resource.readConfig(rootDir + configDir + "/test.resource")
+
+    def testTemplate(self):
+        """Compiled templates render like str.format."""
+        template = Template("a{x}b{y}{x}")
+        self.assertEqual(template.fields, ["x", "y", "x"])
+        self.assertEqual(template.render({"x": "1", "y": "2"}), "a1b21")
+
+    def testSections(self):
+        """Sections are rendered in order and empty text is skipped."""
+        script = Script(False, "#!/bin/sh", "R", "A", "B")
+        script.append("run", "./a.out")
+        script.append("preamble", "")
+        script.append("batchOptions", "#X y\n")
+        text = script.render()
+        assert text.startswith("#!/bin/sh\n#\n# Serial script produced by bolt\n"), text
+        assert text.endswith("#X y\n# Run the serial program\n./a.out\n"), text
+
+    def testOptionLines(self):
+        """Option lines do not need a job name."""
+        text = self.batch.getOptionLines(True, None, "standard", None, "1:0:0", "z01")
+        correct = "#PBS -Az01\n#PBS -qstandard\n#PBS -l walltime=1:0:0\n"
+        assert text.startswith(correct), "Value= '{0}', Expected= '{1}'".format(text, correct)
+        text = self.batch.getOptionLines(False, "job", None, None, "1:0:0", None)
+        assert text.startswith("#PBS -Njob\n"), "Value= '{0}'".format(text)
+
+    def testRender(self):
+        """Serial jobs render through the same path as parallel jobs."""
+        job = Job()
+        job.setName("test")
+        job.setWallTime("1:0:0")
+        job.setJobCommand("./a.out")
+        text = job.renderScript(self.batch, self.resource, None)
+        assert "# Run the serial program\n./a.out\n" in text, text
+
+def suite():
+    suite = unittest.makeSuite(ScriptTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import os
+import tempfile
+import bolterror
+import boltsim
+from boltsim import BoltSimulator as Simulator
+from boltresource import BoltResource as Resource
+from boltbatch import BoltBatch as Batch
+
+class FakeResource(Resource):
+    """ARCHER2 with a limit of 2 jobs in the short QoS"""
+    @property
+    def qosJobLimits(self):
+        return {"short": 2}
+
+class SimulatorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        configDir = os.path.join(os.environ['BOLT_DIR'], "configuration")
+        self.resourceFile = os.path.join(configDir, "resources", "ARCHER2.resource")
+        self.batchFile = os.path.join(configDir, "batch", "Slurm.batch")
+        self.resource = Resource()
+        self.resource.readConfig(self.resourceFile)
+        self.batch = Batch()
+        self.batch.readConfig(self.batchFile)
+        self.directory = tempfile.mkdtemp()
+        # Only move the clock explicitly
+        self.simulator = Simulator(self.directory)
+        self.simulator.init(self.resource, self.batch, self.resourceFile, self.batchFile, speed=0, nodes=8)
+        self.start = self.simulator.clock
+
+    def script(self, nodes, hours, qos="standard", extra=""):
+        return "#!/bin/bash\n#SBATCH --job-name=test\n#SBATCH --nodes={0}\n#SBATCH --tasks-per-node=128\n" \
+               "#SBATCH --cpus-per-task=1\n#SBATCH --time={1}:00:00\n#SBATCH --account=z01\n" \
+               "#SBATCH --partition=standard\n#SBATCH --qos={2}\n{3}srun ./a.out\n".format(nodes, hours, qos, extra)
+
+    def states(self):
+        return [(j["id"], j["state"]) for j in self.simulator.jobs]
+
+    def testBackfill(self):
+        """Small jobs start ahead of a blocked job only if they do not
+        delay its reservation."""
+        sim = self.simulator
+        sim.submit(self.script(4, 2), "a.bolt")
+        sim.submit(self.script(8, 1), "b.bolt")
+        sim.submit(self.script(4, 1), "c.bolt")
+        sim.submit(self.script(4, 3), "d.bolt")
+        self.assertEqual(self.states(), [("1000", "RUNNING"), ("1001", "PENDING"), ("1002", "RUNNING"), ("1003", "PENDING")])
+        self.assertEqual(sim.findJob("1001")["reason"], "Resources")
+        sim.advance()
+        self.assertEqual(set([s for i, s in self.states()]), set(["COMPLETED"]))
+        # Default runtime is half the walltime: the 8 node job starts
+        # when the 2 hour job ends, the 3 hour job after it
+        self.assertEqual(sim.findJob("1001")["start"] - self.start, 3600)
+        self.assertEqual(sim.findJob("1003")["start"] - self.start, 5400)
+        report = sim.report()
+        self.assertEqual(report["completed"], 4)
+        self.assertEqual(report["makespan"], 5400 + 5400)
+        self.assertEqual(report["wait"]["max"], 5400)
+
+    def testRuntime(self):
+        """A bolt-sim line sets the runtime and exit code."""
+        sim = self.simulator
+        sim.submit(self.script(1, 1, extra="# bolt-sim: runtime=60 exit=3\n"), "a.bolt")
+        sim.submit(self.script(1, 1, extra="# bolt-sim: runtime=7200\n"), "b.bolt")
+        sim.advance(self.start + 120)
+        self.assertEqual(self.states(), [("1000", "FAILED"), ("1001", "RUNNING")])
+        sim.advance()
+        self.assertEqual(sim.findJob("1001")["state"], "TIMEOUT")
+        self.assertEqual(sim.findJob("1001")["end"] - self.start, 3600)
+
+    def testDependencies(self):
+        """Dependent jobs wait and are cancelled if a dependency fails."""
+        sim = self.simulator
+        first = sim.submit(self.script(1, 1), "a.bolt")[0]
+        second = sim.submit(self.script(1, 1), "b.bolt", dependencies=[first])[0]
+        failed = sim.submit(self.script(1, 1, extra="# bolt-sim: exit=1\n"), "c.bolt")[0]
+        third = sim.submit(self.script(1, 1), "d.bolt", dependencies=[failed])[0]
+        self.assertEqual(sim.findJob(second)["reason"], "Dependency")
+        sim.advance()
+        self.assertEqual(sim.findJob(second)["state"], "COMPLETED")
+        self.assertEqual(sim.findJob(second)["start"], sim.findJob(first)["end"])
+        self.assertEqual(sim.findJob(third)["state"], "CANCELLED")
+        self.assertEqual(sim.findJob(third)["reason"], "DependencyNeverSatisfied")
+
+    def testArray(self):
+        """Array jobs have one job per index."""
+        self.assertEqual(boltsim.arrayIndices("1,3,5-7%2"), [1, 3, 5, 6, 7])
+        ids = self.simulator.submit(self.script(1, 1), "a.bolt", array=boltsim.arrayIndices("0-2"))
+        self.assertEqual(ids, ["1000_0", "1000_1", "1000_2"])
+        self.simulator.cancel("1000")
+        self.assertEqual(set([s for i, s in self.states()]), set(["CANCELLED"]))
+
+    def testLimits(self):
+        """Jobs beyond the queue limits or the cluster size are rejected."""
+        resource = FakeResource()
+        resource.readConfig(self.resourceFile)
+        self.simulator.init(resource, self.batch, self.resourceFile, self.batchFile, speed=0, nodes=8)
+        messages = []
+        bolterror.collectMessages(messages)
+        try:
+            for i in range(2): self.simulator.submit(self.script(1, 1, qos="short"), "a.bolt")
+            self.assertRaises(bolterror.BoltError, self.simulator.submit, self.script(1, 1, qos="short"), "a.bolt")
+            self.assertIn("QOSMaxSubmitJobPerUserLimit", messages[-1][1])
+            self.assertRaises(bolterror.BoltError, self.simulator.submit, self.script(16, 1), "a.bolt")
+        finally:
+            bolterror.collectMessages(None)
+        self.assertEqual(len(self.simulator.jobs), 2)
+
+    def testPersistence(self):
+        """The state is kept between commands."""
+        self.simulator.submit(self.script(1, 1), "a.bolt")
+        self.simulator.save()
+        simulator = Simulator(self.directory)
+        simulator.load()
+        self.assertEqual(simulator.findJob("1000")["state"], "RUNNING")
+        self.assertEqual(simulator.resource.name, "ARCHER2")
+        simulator.save()
+
+    def testOutput(self):
+        """Scheduler command output has the fields bolt reads."""
+        sim = self.simulator
+        sim.submit(self.script(2, 1, extra="# bolt-sim: runtime=100\n"), "a.bolt")
+        sim.submit(self.script(8, 1), "b.bolt")
+        sim.advance(self.start + 50)
+        jobs = sim.jobs
+        self.assertEqual(boltsim.squeueLines(sim, jobs, "%i|%q|%T", False),
+                         ["1000|standard|RUNNING", "1001|standard|PENDING"])
+        self.assertEqual(boltsim.squeueLines(sim, jobs[:1], "%.6i %.2t", True), [" JOBID ST", "  1000  R"])
+        sim.advance()
+        self.assertEqual(boltsim.sacctLines(sim, jobs, ["JobID", "State", "ElapsedRaw", "NNodes", "ExitCode"], True, False),
+                         ["1000|COMPLETED|100|2|0:0", "1001|COMPLETED|1800|8|0:0"])
+        lines = boltsim.qstatLines(sim, jobs[:1], True, "|", ".sim")
+        self.assertIn("Job Id: 1000.sim", lines[0].split("|"))
+        self.assertIn("job_state = F", lines[0].split("|"))
+        self.assertIn("Exit_status = 0", lines[0].split("|"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import boltstaging
+from boltstaging import BoltStaging as Staging
+from boltresource import BoltResource as Resource
+from boltcode import BoltCode as Code
+from boltjob import BoltJob as Job
+from boltrecords import BoltRecords as Records
+
+configDir = "/unittest/configuration"
+resourceConfig = "test.resource"
+codeConfig = "test.code"
+
+class StagingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rootDir = os.environ['BOLT_DIR']
+        self.resource = Resource()
+        self.resource.readConfig(rootDir + configDir + "/" + resourceConfig)
+        self.code = Code()
+        self.code.readConfig(rootDir + configDir + "/" + codeConfig)
+        self.job = Job()
+        self.job.setTasks(64)
+        self.job.setTasksPerNode(32)
+
+    def testTiers(self):
+        """Storage tiers are read in order of preference."""
+        names = [t["name"] for t in self.resource.storageTiers]
+        self.assertEqual(names, ["local", "bb"])
+        self.assertEqual(boltstaging.selectTier(self.resource, self.code)["name"], "local")
+        self.assertEqual(boltstaging.selectTier(self.resource, self.code, "bb")["scope"], "shared")
+
+    def testArgs(self):
+        """Input and output arguments point at the staged copies."""
+        staging = Staging(self.resource.getStorageTier("local"), self.code, ["data/in.inp", "out.log"])
+        self.assertEqual(staging.args, ["${BOLT_STAGE_DIR}/in.inp", "${BOLT_STAGE_DIR}/out.log"])
+        self.assertEqual(staging.inputs, ["*.dat", "data/in.inp"])
+        self.assertEqual(staging.outputs, ["out.log"])
+
+    def testNodeLocal(self):
+        """Node-local tiers are copied once per node."""
+        staging = Staging(self.resource.getStorageTier("local"), self.code, ["in.inp", "out.log"])
+        text = staging.stageInLines(self.job, self.resource)
+        assert "srun --nodes=2 --ntasks-per-node=1 sh -c" in text, "Stage-in should use one copier per node."
+        text = staging.stageOutLines(self.job, self.resource)
+        assert "cmp -s" in text, "Stage-out should verify the copies."
+        assert text.startswith("srun --nodes=1 --ntasks-per-node=1 sh -c 'cd ${BOLT_STAGE_DIR} && for f in out.log;"), \
+            "Stage-out should copy from the first node only."
+        assert " && \\\n    srun --nodes=2 --ntasks-per-node=1 sh -c 'rm -rf ${BOLT_STAGE_DIR}'" in text, \
+            "Staged copies should be removed from every node after the copy."
+
+    def testShared(self):
+        """Shared tiers are copied once and add their script directives."""
+        staging = Staging(self.resource.getStorageTier("bb"), self.code, ["in.inp", "out.log"])
+        text = staging.stageInLines(self.job, self.resource)
+        assert "srun" not in text, "Shared tier should be copied once."
+        self.assertEqual(staging.directives, "#DW jobdw capacity=1TB access_mode=striped type=scratch")
+
+    def testRecordedTimes(self):
+        """Staging time is recorded separately from the runtime."""
+        staging = Staging(self.resource.getStorageTier("local"), self.code, ["in.inp", "out.log"])
+        text = Records("/tmp").recordLines(self.job, self.resource, self.code, "srun a.out",
+                                           staging.stageInLines(self.job, self.resource),
+                                           staging.stageOutLines(self.job, self.resource))
+        assert "stagein=$((BOLT_START - BOLT_STAGE_START))" in text, "Stage-in time not recorded."
+        assert text.index("cp -p") < text.index("BOLT_START=") < text.index("srun a.out"), "Stage-in must precede the timed run."
+
+def suite():
+    suite = unittest.makeSuite(StagingTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
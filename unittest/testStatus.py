@@ -0,0 +1,142 @@
+import unittest
+import json
+import os
+import re
+import stat
+import tempfile
+import boltstatus
+from boltstatus import BoltStatus as Status
+from boltbatch import BoltBatch as Batch
+from boltjob import BoltJob as Job
+
+# Output of the Slurm and PBS Pro status commands
+SACCT = """101|RUNNING|120|4|0:0
+102|COMPLETED|3600|2|0:0
+103|PENDING|0|0|0:0
+104|CANCELLED by 1234|60|1|0:15
+"""
+QSTAT = """Job Id: 7.pbs01|Job_Name = test|job_state = F|resources_used.walltime = 01:30:00|Resource_List.nodect = 2|Exit_status = 0
+Job Id: 8.pbs01|Job_Name = test|job_state = F|resources_used.walltime = 00:00:10|Resource_List.nodect = 1|Exit_status = 271
+Job Id: 9.pbs01|Job_Name = test|job_state = Q|Resource_List.nodect = 4
+"""
+
+def readBatch(name):
+    batch = Batch()
+    batch.readConfig(os.path.join(os.environ['BOLT_DIR'], "configuration", "batch", name + ".batch"))
+    return batch
+
+class FakeResource(object):
+    name = "test"
+
+class StatusTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # A status command that logs its arguments and prints the
+        # canned sacct output
+        self.command = os.path.join(self.directory, "fakesacct")
+        self.log = os.path.join(self.directory, "log")
+        with open(self.command, "w") as commandFile:
+            commandFile.write("#!/bin/bash\necho \"$@\" >> {0}\ncat <<EOF\n{1}EOF\n".format(self.log, SACCT))
+        os.chmod(self.command, stat.S_IRWXU)
+        # Slurm with the fake status command
+        with open(os.path.join(os.environ['BOLT_DIR'], "configuration", "batch", "Slurm.batch"), "r") as batchFile:
+            config = re.sub(r"(?m)^status command:.*$", "status command: {0} -j {{jobs}}".format(self.command), batchFile.read())
+        with open(os.path.join(self.directory, "Slurm.batch"), "w") as batchFile:
+            batchFile.write(config)
+        self.batch = Batch()
+        self.batch.readConfig(os.path.join(self.directory, "Slurm.batch"))
+
+    def queries(self):
+        if not os.path.isfile(self.log): return []
+        with open(self.log, "r") as logFile:
+            return logFile.read().split("\n")[:-1]
+
+    def addJobs(self, tracker, jobIDs):
+        job = Job()
+        job.setTasks(256)
+        job.setTasksPerNode(128)
+        for jobID in jobIDs:
+            tracker.addJob(jobID, job, FakeResource(), self.batch)
+
+    def testSlurmParse(self):
+        """The sacct output is parsed into states, elapsed times and nodes."""
+        status = boltstatus.parseStatus(self.batch, SACCT)
+        self.assertEqual(status["101"], {"state": "running", "elapsed": 120, "nodes": 4})
+        self.assertEqual(status["102"]["state"], "done")
+        self.assertEqual(status["103"]["state"], "queued")
+        self.assertEqual(status["104"]["state"], "failed")
+
+    def testPBSParse(self):
+        """Key-value qstat output is parsed and a non-zero exit status is a failure."""
+        status = boltstatus.parseStatus(readBatch("PBSPro"), QSTAT)
+        self.assertEqual(status["7.pbs01"], {"state": "done", "elapsed": 5400, "nodes": 2})
+        self.assertEqual(status["8.pbs01"]["state"], "failed")
+        self.assertEqual(status["9.pbs01"]["state"], "queued")
+
+    def testSeconds(self):
+        """Elapsed times in the formats used by the batch systems."""
+        self.assertEqual(boltstatus.seconds("1-02:03:04"), 93784)
+        self.assertEqual(boltstatus.seconds("02:03:04"), 7384)
+        self.assertEqual(boltstatus.seconds("03:04"), 184)
+        self.assertEqual(boltstatus.seconds("3600"), 3600)
+        self.assertEqual(boltstatus.seconds("unknown"), 0)
+
+    def testBatchedPoll(self):
+        """All the jobs are queried with one command and the result cached."""
+        tracker = Status(self.directory, 60)
+        self.addJobs(tracker, ["101", "102", "103", "105"])
+        jobs = tracker.readJobs()
+        self.assertEqual([j["id"] for j in jobs], ["101", "102", "103", "105"])
+        status = tracker.poll({"Slurm": self.batch}, jobs)
+        self.assertEqual(self.queries(), ["-j 101,102,103,105"])
+        self.assertEqual(status["105"]["state"], "unknown")
+        # The cache is used until it expires
+        tracker.poll({"Slurm": self.batch}, jobs)
+        self.assertEqual(len(self.queries()), 1)
+        # Finished jobs are not queried again
+        tracker.poll({"Slurm": self.batch}, jobs, force=True)
+        self.assertEqual(self.queries()[1], "-j 101,103,105")
+
+    def testPollPerJob(self):
+        """Each job is polled again when its own cache entry expires."""
+        tracker = Status(self.directory, 60)
+        self.addJobs(tracker, ["101", "103", "105"])
+        jobs = tracker.readJobs()
+        tracker.poll({"Slurm": self.batch}, jobs[:2])
+        # Age the entry of job 101 only
+        with open(tracker.cacheName, "r") as cacheFile:
+            cache = json.load(cacheFile)
+        cache["polled"]["101"] -= 120
+        with open(tracker.cacheName, "w") as cacheFile:
+            json.dump(cache, cacheFile)
+        # The new job and the stale job are queried, the fresh one is not
+        tracker.poll({"Slurm": self.batch}, jobs)
+        self.assertEqual(self.queries(), ["-j 101,103", "-j 101,105"])
+        # All three entries are now fresh
+        tracker.poll({"Slurm": self.batch}, jobs)
+        self.assertEqual(len(self.queries()), 2)
+
+    def testSummary(self):
+        """Progress and node hours used by the jobs."""
+        tracker = Status(self.directory, 60)
+        self.addJobs(tracker, ["101", "102", "103", "104"])
+        jobs = tracker.readJobs()
+        summary = boltstatus.summary(jobs, tracker.poll({"Slurm": self.batch}, jobs))
+        self.assertEqual((summary["queued"], summary["running"], summary["done"], summary["failed"]), (1, 1, 1, 1))
+        self.assertAlmostEqual(summary["finished"], 0.5)
+        self.assertAlmostEqual(summary["nodeHours"], (4*120 + 2*3600 + 60) / 3600.0)
+
+    def testWait(self):
+        """Waiting stops when no job is queued or running."""
+        tracker = Status(self.directory, 0)
+        self.addJobs(tracker, ["102", "104"])
+        status = tracker.wait({"Slurm": self.batch}, tracker.readJobs(), 1)
+        self.assertEqual((status["102"]["state"], status["104"]["state"]), ("done", "failed"))
+
+def suite():
+    suite = unittest.makeSuite(StatusTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import tempfile
+import boltstore
+from boltstore import BoltStore as Store
+from boltjob import BoltJob as Job
+from boltresource import BoltResource as Resource
+from boltbatch import BoltBatch as Batch
+from boltcorespec import BoltCoreSpec as CoreSpec
+
+configDir = "/unittest/configuration"
+resourceConfig = "test.resource"
+batchConfig = "test.batch"
+
+class StoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rootDir = os.environ['BOLT_DIR']
+        self.configFiles = [rootDir + configDir + "/" + resourceConfig, rootDir + configDir + "/" + batchConfig]
+        self.resource = Resource()
+        self.resource.readConfig(self.configFiles[0])
+        self.batch = Batch()
+        self.batch.readConfig(self.configFiles[1])
+        self.store = Store(os.path.join(tempfile.mkdtemp(), "scripts"))
+
+    def makeJob(self, tasks, command):
+        job = Job()
+        job.setIsParallel(True)
+        job.setTasks(tasks)
+        job.setWallTime("1:0:0")
+        job.setJobCommand(command)
+        return job
+
+    def testKey(self):
+        """The hash depends on the job shape and command only."""
+        first, params = boltstore.jobKey(self.makeJob(64, "a.out in1"), self.resource, self.batch, None, self.configFiles, "0.8")
+        second, params = boltstore.jobKey(self.makeJob(64, "a.out in1"), self.resource, self.batch, None, self.configFiles, "0.8")
+        self.assertEqual(first, second)
+        self.assertEqual(params["tasks"], "64")
+        other, params = boltstore.jobKey(self.makeJob(64, "a.out in2"), self.resource, self.batch, None, self.configFiles, "0.8")
+        assert first != other, "Changed arguments should change the hash."
+        other, params = boltstore.jobKey(self.makeJob(64, "a.out in1"), self.resource, self.batch, None, self.configFiles, "0.9")
+        assert first != other, "Changed bolt version should change the hash."
+
+    def testCoreSpec(self):
+        """Jobs that differ only in the reserved cores have different hashes."""
+        first, params = boltstore.jobKey(self.makeJob(64, "a.out in1"), self.resource, self.batch, None, self.configFiles, "0.8")
+        job = self.makeJob(64, "a.out in1")
+        job.setCoreSpec(CoreSpec("8"))
+        other, params = boltstore.jobKey(job, self.resource, self.batch, None, self.configFiles, "0.8")
+        assert first != other, "Reserved cores should change the hash."
+        self.assertEqual(params["corespec"], "8 cores per node")
+
+    def testStore(self):
+        """Saved scripts are found by their hash and listed in the index."""
+        key, params = boltstore.jobKey(self.makeJob(64, "a.out in1"), self.resource, self.batch, None, self.configFiles, "0.8")
+        self.assertEqual(self.store.lookup(key), None)
+        self.store.save(key, "#!/bin/bash\na.out in1\n", params)
+        self.assertEqual(self.store.lookup(key), "#!/bin/bash\na.out in1\n")
+        index = self.store.readIndex()
+        self.assertEqual(index[key]["command"], "a.out in1")
+
+    def testCompleted(self):
+        """Only successful runs that were not stopped at a checkpoint are complete."""
+        records = [{"key": "a", "status": 0}, {"key": "b", "status": 1},
+                   {"key": "c", "status": 0, "checkpointed": "1"}, {"status": 0}]
+        self.assertEqual(boltstore.completedKeys(records), set(["a"]))
+
+def suite():
+    suite = unittest.makeSuite(StoreTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+import os
+import boltstriping
+from boltstriping import BoltStriping as Striping
+from boltresource import BoltResource as Resource
+from boltcode import BoltCode as Code
+
+configDir = "/unittest/configuration"
+resourceConfig = "test.resource"
+codeConfig = "test.code"
+
+class StripingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rootDir = os.environ['BOLT_DIR']
+        self.resource = Resource()
+        self.resource.readConfig(rootDir + configDir + "/" + resourceConfig)
+        self.code = Code()
+        self.code.readConfig(rootDir + configDir + "/" + codeConfig)
+
+    def testStripeCount(self):
+        """Stripe count scales with nodes up to the output size and limit."""
+        for nodes, correct in ((1, 1), (4, 4), (64, 6)):
+            count = Striping(self.resource, self.code, nodes).stripeCount
+            self.assertEqual(count, correct, "Nodes= {0}, Value= '{1}', Expected= '{2}'".format(nodes, count, correct))
+
+    def testHints(self):
+        """The layout command and hints file match the layout."""
+        text = Striping(self.resource, self.code, 4).preambleLines(self.resource)
+        assert "lfs setstripe -c 4 -S 4M results\n" in text, "Layout command not written."
+        assert "cb_nodes 4\n" in text, "Collective buffering nodes not set."
+        assert "striping_unit 4194304\n" in text, "Stripe size not converted."
+        assert "export ROMIO_HINTS=" in text, "Hints file not named."
+        self.assertEqual(boltstriping.sizeInBytes("2k"), 2048)
+
+def suite():
+    suite = unittest.makeSuite(StripingTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
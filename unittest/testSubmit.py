@@ -0,0 +1,33 @@
+import unittest
+import gzip
+import os
+import tempfile
+import boltsubmit
+
+class FakeBatch(object):
+    """Batch system whose submit command echoes the script"""
+    submitCommand = "cat"
+
+class SubmitTestCase(unittest.TestCase):
+
+    def testStream(self):
+        """Streamed scripts reach the submit command on standard input."""
+        output = boltsubmit.submitStream(FakeBatch(), "#!/bin/bash\necho test\n")
+        self.assertEqual(output, "#!/bin/bash\necho test")
+
+    def testArchive(self):
+        """Each submitted script is appended to the archive."""
+        fileName = os.path.join(tempfile.mkdtemp(), "hist", "submitted.gz")
+        boltsubmit.archiveScript(fileName, "script 1\n", "job 1")
+        boltsubmit.archiveScript(fileName, "script 2\n", "job 2")
+        with gzip.open(fileName, "rt") as archive:
+            lines = archive.read().split("\n")
+        self.assertEqual(lines[1], "script 1")
+        assert lines[2].startswith("#### bolt submitted ") and lines[2].endswith(" job 2"), lines[2]
+
+def suite():
+    suite = unittest.makeSuite(SubmitTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
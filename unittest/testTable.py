@@ -0,0 +1,53 @@
+import unittest
+import os
+import bolttable
+from boltjob import BoltJob as Job
+from boltresource import BoltResource as Resource
+from boltbatch import BoltBatch as Batch
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+configDir = "/unittest/configuration"
+resourceConfig = "test.resource"
+batchConfig = "test.batch"
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rootDir = os.environ['BOLT_DIR']
+        self.resource = Resource()
+        self.resource.readConfig(rootDir + configDir + "/" + resourceConfig)
+        self.batch = Batch()
+        self.batch.readConfig(rootDir + configDir + "/" + batchConfig)
+
+    def testDistribution(self):
+        """The table agrees with the distribution computed for each job."""
+        table = bolttable.shapeTable(self.resource, 1, 80, [1, 2])
+        for row in table[::7]:
+            tasks, nodes, tpn, threads, tpd, stride, units, maxHours, status = [int(v) for v in row]
+            job = Job()
+            job.setTasks(tasks)
+            job.setTasksPerNode(tpn)
+            job.setThreads(threads)
+            job.setParallelJobLauncher(self.resource.distribJobLauncher)
+            job.setParallelDistribution(self.resource, self.batch)
+            self.assertEqual(job.numNodes(), nodes)
+            self.assertEqual(job.pStride, stride)
+            self.assertEqual(self.resource.maxJobTimeByNodes(nodes), maxHours)
+
+    def testRows(self):
+        """Every tasks per node that fits is included, with the units charged."""
+        table = bolttable.shapeTable(self.resource, 40, 40, [1])
+        self.assertEqual(table.shape[0], self.resource.numLogicalCoresPerNode())
+        self.assertEqual(list(table[-1]), [40, 2, 32, 1, 8, 1, 64, 12, 0])
+
+def suite():
+    suite = unittest.makeSuite(TableTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()
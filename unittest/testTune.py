@@ -0,0 +1,67 @@
+import unittest
+import os
+import tempfile
+import bolttune
+from bolttune import BoltTune as Tune
+from boltresource import BoltResource as Resource
+from boltrecords import parseRecord
+
+configDir = "/unittest/configuration"
+resourceConfig = "test.resource"
+
+class TuneTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resource = Resource()
+        rootDir = os.environ['BOLT_DIR']
+        self.resource.readConfig(rootDir + configDir + "/" + resourceConfig)
+        line = "time=1 resource=test code=test nodes=2 tasks={0} tpn={1} threads={2} stride={3} tag={4} runtime={5} status=0"
+        self.records = [parseRecord(line.format(64, 32, 1, 1, "tune20240101T120000", 100)),
+                        parseRecord(line.format(32, 16, 2, 2, "tune20240101T120000", 80)),
+                        parseRecord(line.format(32, 16, 2, 2, "tune20240101T120000", 90)),
+                        parseRecord(line.format(32, 16, 2, 2, "tune20240201T120000", 70)),
+                        parseRecord(line.format(32, 16, 1, 2, "tune20240201T120000", 60)),
+                        parseRecord(line.format(32, 16, 1, 2, "tuned-prod", 50))]
+
+    def testVariants(self):
+        """Layout matrix for a 32-core node."""
+        layouts = bolttune.variants(self.resource, False)
+        correct = [(32, 1, 1), (16, 1, 1), (16, 1, 2)]
+        self.assertEqual(layouts, correct, "Value= '{0}', Expected= '{1}'".format(layouts, correct))
+        for tpn, threads, stride in bolttune.variants(self.resource, True):
+            assert tpn * threads <= self.resource.numCoresPerNode(), "Layout does not fit on a node."
+
+    def testResults(self):
+        """Runtimes are averaged over the runs of each layout."""
+        # User tags that start with 'tune' are not autotune runs
+        self.assertEqual(bolttune.latestTag(self.records), "tune20240201T120000")
+        assert bolttune.isTuneTag(bolttune.newTag()), "New tags should be autotune tags."
+        results = bolttune.tuneResults(self.records, "tune20240101T120000")
+        self.assertEqual(results[(16, 2, 2)], (85.0, 2, 2))
+        self.assertEqual(len(results), 2)
+
+    def testVersions(self):
+        """Each selection adds a new version and is restored from file."""
+        tune = Tune("test", "test")
+        tune.addVersion("tune20240101T120000", self.resource, bolttune.tuneResults(self.records, "tune20240101T120000"))
+        tune.addVersion("tune20240201T120000", self.resource, bolttune.tuneResults(self.records, "tune20240201T120000"))
+        fileName = os.path.join(tempfile.mkdtemp(), "test.test.tuned")
+        tune.writeConfig(fileName)
+        restored = Tune()
+        restored.readConfig(fileName)
+        self.assertEqual(len(restored.versions), 2)
+        self.assertEqual(restored.current["version"], 2)
+        self.assertEqual((restored.current["tpn"], restored.current["threads"], restored.current["stride"]), (16, 1, 2))
+        assert restored.hasTag("tune20240101T120000"), "First autotune should be recorded."
+
+    def testFileName(self):
+        """Tuned layouts are kept with the run records of the user."""
+        fileName = bolttune.tunedFileName("~/.bolt", "cp2k", "ARCHER2")
+        self.assertEqual(fileName, os.path.join(os.path.expanduser("~"), ".bolt", "tuned", "cp2k.ARCHER2.tuned"))
+
+def suite():
+    suite = unittest.makeSuite(TuneTestCase,'test')
+    return suite
+
+if __name__ == "__main__":
+    unittest.main()